@@ -2,35 +2,54 @@ import logging
 import os
 from pathlib import Path
 
-import git
-from rich.logging import RichHandler
-from rich.traceback import install
+from chatbot_template.utils.logs import setup_logging
 
-from chatbot_template.utils.env import load_envs
-
-# Enable pretty tracebacks
-install(show_locals=True)
-
-# Set up Rich logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(message)s",
-    datefmt="[%X]",
-    handlers=[RichHandler(rich_tracebacks=True)],
+# Rich console logging in dev, queued JSON lines with LOG_MODE=prod. Only the
+# process environment is read here: the `.env` file is loaded on the first
+# `get_env`, which sets logging up again if it changes these variables.
+setup_logging(
+    os.environ.get("LOG_MODE") or "dev", os.environ.get("LOG_LEVEL") or "INFO"
 )
 
 logger = logging.getLogger(__name__)
 
-load_envs()
+_project_root: Path | None = None
+
+
+def _find_project_root(start: Path) -> Path:
+    """
+    Finds the root of the repository containing `start`.
+
+    Walks up the parents looking for a `.git` folder (or file, in worktrees and
+    submodules), without importing GitPython nor spawning `git`.
+
+    Parameters
+    ----------
+    start : Path
+        The folder the search starts from.
+
+    Returns
+    -------
+    Path
+        The repository root, `start` itself if it is not inside a repository.
+    """
+    for folder in (start, *start.parents):
+        if (folder / ".git").exists():
+            return folder
+    return start
+
+
+def __getattr__(name: str) -> Path:
+    """Computes `PROJECT_ROOT` on first access instead of at import."""
+    global _project_root
+    if name != "PROJECT_ROOT":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-try:
-    PROJECT_ROOT = Path(
-        git.Repo(Path.cwd(), search_parent_directories=True).working_dir
-    )
-except git.exc.InvalidGitRepositoryError:
-    PROJECT_ROOT = Path.cwd()
+    if _project_root is None:
+        _project_root = _find_project_root(Path.cwd())
+        logger.debug(f"Inferred project root: {_project_root}")
+        os.environ["PROJECT_ROOT"] = str(_project_root)
+    return _project_root
 
-logger.debug(f"Inferred project root: {PROJECT_ROOT}")
-os.environ["PROJECT_ROOT"] = str(PROJECT_ROOT)
 
 __all__ = ["PROJECT_ROOT"]
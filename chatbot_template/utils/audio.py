@@ -0,0 +1,625 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import shutil
+import struct
+import subprocess
+import time
+import wave
+from collections.abc import AsyncIterator, Awaitable, Callable
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import asynccontextmanager, suppress
+from dataclasses import asdict, dataclass
+from typing import Any
+
+import numpy as np
+
+from chatbot_template.utils.env import get_env
+from chatbot_template.utils.local_saver import ResponseJournal, save_response
+from chatbot_template.utils.metrics import audio_files, stage_seconds
+
+pylogger = logging.getLogger(__name__)
+
+# Granule positions of Opus streams always count 48 kHz samples
+OPUS_GRANULE_RATE: int = 48_000
+
+# Ogg page header: capture pattern, version, type, granule, serial, sequence,
+# checksum and number of segments
+_OGG_PAGE = struct.Struct("<4sBBqIIIB")
+
+# Peak of the normalized audio, 1 dB below full scale
+TARGET_PEAK: float = 10 ** (-1 / 20)
+
+# Taps of the low-pass filter applied before downsampling
+_FILTER_TAPS = 63
+
+
+@dataclass(frozen=True, slots=True)
+class AudioInfo:
+    """
+    Properties of an audio file measured from its bytes.
+
+    Parameters
+    ----------
+    path : str
+        Local path of the analysed file.
+    codec : str
+        "pcm", "opus" or "vorbis".
+    sample_rate : int
+        Samples per second of the source.
+    channels : int
+        Channels of the source.
+    duration : float
+        Seconds of audio.
+    peak : float | None
+        Largest absolute sample, from 0 to 1, None if it was not decoded.
+    rms : float | None
+        Root mean square of the samples, None if it was not decoded.
+    output_path : str | None
+        The normalized mono WAV written, None if it was not decoded.
+    """
+
+    path: str
+    codec: str
+    sample_rate: int
+    channels: int
+    duration: float
+    peak: float | None = None
+    rms: float | None = None
+    output_path: str | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class AudioJob:
+    """
+    An audio answer waiting to be processed.
+
+    Parameters
+    ----------
+    user_id : str
+        The unique identifier of the user.
+    media_id : str
+        Identifier of the media on the platform.
+    path : str
+        Local path of the downloaded file.
+    phase : str
+        Phase of the user when answering, e.g. "audio_questions".
+    step : int
+        Step of the user when answering.
+    declared_duration : float | None
+        Seconds announced by the platform, None when it did not say.
+    """
+
+    user_id: str
+    media_id: str
+    path: str
+    phase: str
+    step: int
+    declared_duration: float | None = None
+
+
+def _unsupported(path: str) -> ValueError:
+    message = f"Unsupported audio format: {path}"
+    pylogger.error(message)
+    return ValueError(message)
+
+
+def ogg_info(data: bytes) -> tuple[str, int, int, float]:
+    """
+    Reads the codec, rate, channels and duration of an Ogg Opus or Vorbis file.
+
+    Only the identification header of the first page and the granule position
+    of the last page are read, nothing is decoded.
+
+    Parameters
+    ----------
+    data : bytes
+        The contents of the file.
+
+    Returns
+    -------
+    tuple[str, int, int, float]
+        The codec ("opus" or "vorbis"), the sample rate, the channels and the
+        duration in seconds.
+
+    Raises
+    ------
+    ValueError
+        If the data is not an Ogg Opus or Vorbis stream.
+    """
+    if len(data) < _OGG_PAGE.size or not data.startswith(b"OggS"):
+        raise _unsupported("not an Ogg stream")
+    segments = data[_OGG_PAGE.size - 1]
+    packet = data[_OGG_PAGE.size + segments :]
+
+    # Both identification headers need 16 bytes for the fields read here
+    if len(packet) < 16:
+        raise _unsupported("truncated Ogg identification header")
+    if packet.startswith(b"OpusHead"):
+        channels = packet[9]
+        pre_skip, sample_rate = struct.unpack_from("<HI", packet, 10)
+        codec, granule_rate = "opus", OPUS_GRANULE_RATE
+    elif packet.startswith(b"\x01vorbis"):
+        channels = packet[11]
+        (sample_rate,) = struct.unpack_from("<I", packet, 12)
+        codec, granule_rate, pre_skip = "vorbis", sample_rate, 0
+        if not sample_rate:
+            raise _unsupported("Vorbis stream without a sample rate")
+    else:
+        raise _unsupported("unknown Ogg codec")
+
+    # The granule position of the last page counts every sample of the stream
+    end = len(data)
+    while (start := data.rfind(b"OggS", 0, end)) >= 0:
+        if start + _OGG_PAGE.size <= len(data):
+            granule = _OGG_PAGE.unpack_from(data, start)[3]
+            if granule >= 0:
+                break
+        end = start
+    else:
+        raise _unsupported("Ogg stream without a final page")
+
+    duration = max(granule - pre_skip, 0) / granule_rate
+    return codec, sample_rate or granule_rate, channels, duration
+
+
+def audio_duration(path: str) -> float:
+    """
+    Measures the duration of a WAV or Ogg file from its headers.
+
+    Nothing is decoded, so the duration is known as soon as the file is
+    downloaded, whether or not the worker processes run.
+
+    Parameters
+    ----------
+    path : str
+        Local path of the file.
+
+    Returns
+    -------
+    float
+        Seconds of audio.
+
+    Raises
+    ------
+    ValueError
+        If the file is neither a WAV nor an Ogg Opus or Vorbis file.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+
+    if data.startswith(b"RIFF") and data[8:12] == b"WAVE":
+        try:
+            with wave.open(io.BytesIO(data)) as wav:
+                return wav.getnframes() / wav.getframerate()
+        except (wave.Error, EOFError, ZeroDivisionError):
+            raise _unsupported(path) from None
+    if data.startswith(b"OggS"):
+        return ogg_info(data)[3]
+    raise _unsupported(path)
+
+
+def read_wav(data: bytes) -> tuple[np.ndarray, int]:
+    """
+    Decodes a PCM WAV file.
+
+    Parameters
+    ----------
+    data : bytes
+        The contents of the file.
+
+    Returns
+    -------
+    tuple[np.ndarray, int]
+        The samples as float32 in [-1, 1], one column per channel, and the
+        sample rate.
+    """
+    with wave.open(io.BytesIO(data)) as file:
+        width = file.getsampwidth()
+        channels = file.getnchannels()
+        rate = file.getframerate()
+        frames = file.readframes(file.getnframes())
+
+    if width == 1:
+        samples = (np.frombuffer(frames, np.uint8).astype(np.float32) - 128) / 128
+    elif width in (2, 4):
+        dtype = np.int16 if width == 2 else np.int32
+        samples = np.frombuffer(frames, dtype).astype(np.float32)
+        samples /= float(np.iinfo(dtype).max) + 1
+    else:
+        # 24-bit samples, widened to 32 bits
+        raw = np.frombuffer(frames, np.uint8).reshape(-1, 3)
+        wide = np.zeros((len(raw), 4), np.uint8)
+        wide[:, 1:] = raw
+        samples = wide.view("<i4").ravel().astype(np.float32) / 2**31
+    return samples.reshape(-1, channels), rate
+
+
+def decode_ffmpeg(path: str, sample_rate: int) -> np.ndarray | None:
+    """
+    Decodes any audio file to mono float32 samples with ffmpeg.
+
+    Parameters
+    ----------
+    path : str
+        Local path of the file.
+    sample_rate : int
+        Rate of the decoded samples.
+
+    Returns
+    -------
+    np.ndarray | None
+        The samples, None if ffmpeg is not installed.
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        return None
+    command = [ffmpeg, "-v", "error", "-i", path]
+    command += ["-f", "f32le", "-ac", "1", "-ar", str(sample_rate), "-"]
+    result = subprocess.run(command, capture_output=True, check=True)
+    return np.frombuffer(result.stdout, np.float32)
+
+
+def resample(samples: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    """
+    Resamples mono samples, low-pass filtering them first when downsampling.
+
+    Parameters
+    ----------
+    samples : np.ndarray
+        The mono samples.
+    source_rate : int
+        Rate of `samples`.
+    target_rate : int
+        Rate of the result.
+
+    Returns
+    -------
+    np.ndarray
+        The resampled float32 samples.
+    """
+    if source_rate == target_rate or len(samples) == 0:
+        return samples.astype(np.float32, copy=False)
+
+    if target_rate < source_rate:
+        # Windowed sinc cut at the new Nyquist frequency, against aliasing
+        cutoff = target_rate / source_rate
+        taps = np.arange(_FILTER_TAPS) - (_FILTER_TAPS - 1) / 2
+        kernel = cutoff * np.sinc(cutoff * taps) * np.hamming(_FILTER_TAPS)
+        # Centred like mode="same", which is longer than clips under the kernel
+        offset = (_FILTER_TAPS - 1) // 2
+        filtered = np.convolve(samples, kernel / kernel.sum(), mode="full")
+        samples = filtered[offset : offset + len(samples)]
+
+    length = round(len(samples) * target_rate / source_rate)
+    positions = np.arange(length) * (source_rate / target_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def write_wav(path: str, samples: np.ndarray, sample_rate: int) -> None:
+    """
+    Writes mono float samples as a 16-bit PCM WAV file.
+
+    Parameters
+    ----------
+    path : str
+        Where the file is written.
+    samples : np.ndarray
+        The mono samples in [-1, 1].
+    sample_rate : int
+        Rate of `samples`.
+    """
+    pcm = (np.clip(samples, -1, 1) * 32767).astype("<i2")
+    with wave.open(path, "wb") as file:
+        file.setnchannels(1)
+        file.setsampwidth(2)
+        file.setframerate(sample_rate)
+        file.writeframes(pcm.tobytes())
+
+
+def process_audio(
+    path: str, output_folder: str | None = None, sample_rate: int = 16_000
+) -> AudioInfo:
+    """
+    Decodes, resamples, normalizes and measures an audio file.
+
+    The duration is measured from the file itself: from the samples of a WAV
+    file and from the granule position of an Ogg file, e.g. a WhatsApp voice
+    note. The audio is decoded to mono at `sample_rate`, Ogg files only when
+    ffmpeg is installed, normalized to a peak of -1 dBFS and written as a WAV
+    file to `output_folder`. CPU bound, meant to run in `AudioPipeline`'s
+    worker processes.
+
+    Parameters
+    ----------
+    path : str
+        Local path of the file.
+    output_folder : str | None
+        Folder of the normalized WAV files, next to `path` if None.
+    sample_rate : int
+        Rate of the normalized audio. Default = 16 kHz.
+
+    Returns
+    -------
+    AudioInfo
+        The properties of the audio.
+
+    Raises
+    ------
+    ValueError
+        If the file is neither a WAV nor an Ogg Opus or Vorbis file.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+
+    if data.startswith(b"RIFF") and data[8:12] == b"WAVE":
+        samples, source_rate = read_wav(data)
+        codec, channels = "pcm", samples.shape[1]
+        duration = len(samples) / source_rate
+        mono = resample(samples.mean(axis=1), source_rate, sample_rate)
+    elif data.startswith(b"OggS"):
+        codec, source_rate, channels, duration = ogg_info(data)
+        decoded = decode_ffmpeg(path, sample_rate)
+        if decoded is None:
+            return AudioInfo(path, codec, source_rate, channels, duration)
+        mono = decoded
+    else:
+        raise _unsupported(path)
+
+    peak = float(np.abs(mono).max()) if len(mono) else 0.0
+    rms = (
+        float(np.sqrt(np.mean(np.square(mono, dtype=np.float64)))) if len(mono) else 0.0
+    )
+    if peak > 0:
+        mono = mono * (TARGET_PEAK / peak)
+
+    stem = os.path.splitext(os.path.basename(path))[0]
+    output_path = os.path.join(output_folder or os.path.dirname(path), f"{stem}.wav")
+    if output_path == path:
+        output_path = os.path.join(os.path.dirname(path), f"{stem}.normalized.wav")
+    write_wav(output_path, mono, sample_rate)
+    return AudioInfo(
+        path, codec, source_rate, channels, duration, peak, rms, output_path
+    )
+
+
+AudioHook = Callable[[AudioJob, AudioInfo], Awaitable[None]]
+
+
+def journal_audio(journal: ResponseJournal) -> AudioHook:
+    """
+    Audio hook appending the processed answer to the user's response records.
+
+    Parameters
+    ----------
+    journal : ResponseJournal
+        The journal receiving one `save_response` record per audio.
+
+    Returns
+    -------
+    AudioHook
+        The hook, to be given to `AudioPipeline.add_hook`.
+    """
+
+    async def hook(job: AudioJob, info: AudioInfo) -> None:
+        record = save_response(
+            job.user_id,
+            job.phase,
+            job.step,
+            job.media_id,
+            audio_path=info.output_path or info.path,
+        )
+        record["declared_duration"] = job.declared_duration
+        record["audio"] = asdict(info)
+        journal.write(record)
+
+    return hook
+
+
+class AudioPipeline:
+    """
+    Processes downloaded audio answers in a pool of worker processes.
+
+    Decoding, resampling and normalizing are CPU bound and would stall the
+    event loop, so `process_audio` runs in `workers` processes fed from a
+    queue of at most `max_pending` jobs: `submit` waits while it is full,
+    holding back the downloads instead of piling up files. The result of
+    every job is given to the hooks, e.g. to save it with the user's
+    responses, and counted in `chatbot_audio_files_total`.
+
+    Parameters
+    ----------
+    workers : int
+        Worker processes, 0 disables the pipeline. Default = 1.
+    max_pending : int
+        Maximum jobs queued. Default = 100.
+    output_folder : str | None
+        Folder of the normalized WAV files, next to the downloads if None.
+    sample_rate : int
+        Rate of the normalized audio. Default = 16 kHz.
+    journal : ResponseJournal | None
+        Journal receiving the record of every processed audio, run by the
+        lifespan of the pipeline. Default = None.
+
+    Functions
+    ---------
+    from_env : () -> AudioPipeline
+        Builds the pipeline from the `AUDIO_*` environment variables.
+    add_hook : (AudioHook) -> None
+        Registers a coroutine called with every processed audio.
+    submit : (AudioJob) -> None
+        Queues an audio, waiting while the queue is full.
+    join : () -> None
+        Waits until every queued audio has been processed.
+    start : (Executor | None) -> None
+        Starts the worker processes.
+    aclose : () -> None
+        Processes the queued audios and stops the workers.
+    lifespan : (FastAPI) -> AsyncIterator[None]
+        FastAPI lifespan running the workers.
+    """
+
+    def __init__(
+        self,
+        workers: int = 1,
+        max_pending: int = 100,
+        output_folder: str | None = None,
+        sample_rate: int = 16_000,
+        journal: ResponseJournal | None = None,
+    ):
+        self.workers = workers
+        self.output_folder = output_folder
+        self.sample_rate = sample_rate
+        self.journal = journal
+        self._queue: asyncio.Queue[tuple[AudioJob, float]] = asyncio.Queue(max_pending)
+        self._hooks: list[AudioHook] = []
+        self._executor: Executor | None = None
+        self._tasks: list[asyncio.Task] = []
+        if journal is not None:
+            self.add_hook(journal_audio(journal))
+
+    @classmethod
+    def from_env(cls) -> "AudioPipeline":
+        """
+        Builds the pipeline from the environment.
+
+        `AUDIO_WORKERS` sets the worker processes (0 disables the pipeline),
+        `AUDIO_MAX_PENDING` the queued jobs, `AUDIO_OUTPUT_FOLDER` where the
+        normalized files go and `AUDIO_SAMPLE_RATE` their rate. When
+        `AUDIO_RESULTS_FOLDER` is set, the results are journaled there.
+
+        Returns
+        -------
+        AudioPipeline
+            The configured pipeline.
+        """
+        folder = get_env("AUDIO_RESULTS_FOLDER", "")
+        return cls(
+            workers=int(get_env("AUDIO_WORKERS", "1")),
+            max_pending=int(get_env("AUDIO_MAX_PENDING", "100")),
+            output_folder=get_env("AUDIO_OUTPUT_FOLDER", "") or None,
+            sample_rate=int(get_env("AUDIO_SAMPLE_RATE", "16000")),
+            journal=ResponseJournal(folder, prefix="audios") if folder else None,
+        )
+
+    def add_hook(self, hook: AudioHook) -> None:
+        """
+        Registers a coroutine called with every processed audio.
+
+        Parameters
+        ----------
+        hook : AudioHook
+            Coroutine function receiving the job and its `AudioInfo`.
+        """
+        self._hooks.append(hook)
+
+    async def submit(self, job: AudioJob) -> None:
+        """
+        Queues an audio, waiting while the queue is full.
+
+        Nothing is queued when the pipeline is disabled.
+
+        Parameters
+        ----------
+        job : AudioJob
+            The downloaded audio and the answer it belongs to.
+        """
+        if self.workers > 0:
+            await self._queue.put((job, time.perf_counter()))
+
+    async def join(self) -> None:
+        """Waits until every queued audio has been processed."""
+        await self._queue.join()
+
+    def start(self, executor: Executor | None = None) -> None:
+        """
+        Starts the worker processes.
+
+        Parameters
+        ----------
+        executor : Executor | None
+            Executor running `process_audio`, a new process pool of `workers`
+            processes if None.
+        """
+        if self.workers <= 0 or self._tasks:
+            return
+        if self.output_folder is not None:
+            os.makedirs(self.output_folder, exist_ok=True)
+        # Spawned, a fork would copy the event loop and the logging threads
+        self._executor = executor or ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def aclose(self) -> None:
+        """Processes the queued audios and stops the workers."""
+        if self._tasks:
+            await self.join()
+            for task in self._tasks:
+                task.cancel()
+            for task in self._tasks:
+                with suppress(asyncio.CancelledError):
+                    await task
+            self._tasks = []
+        if self._executor is not None:
+            await asyncio.to_thread(self._executor.shutdown)
+            self._executor = None
+
+    async def _run(self) -> None:
+        """Hands the queued jobs to the executor one at a time."""
+        loop = asyncio.get_running_loop()
+        while True:
+            job, queued_at = await self._queue.get()
+            try:
+                start = time.perf_counter()
+                stage_seconds.observe(start - queued_at, "audio_queue")
+                info = await loop.run_in_executor(
+                    self._executor,
+                    process_audio,
+                    job.path,
+                    self.output_folder,
+                    self.sample_rate,
+                )
+                stage_seconds.observe(time.perf_counter() - start, "audio")
+            except ValueError as error:
+                # Already logged by the worker, e.g. a file that is not audio
+                audio_files.labels("failed").inc()
+                pylogger.warning(f"Skipped the audio {job.path}: {error}")
+            except Exception:
+                audio_files.labels("failed").inc()
+                pylogger.exception(f"Failed to process the audio {job.path}")
+            else:
+                audio_files.labels("ok").inc()
+                await self._notify(job, info)
+            finally:
+                self._queue.task_done()
+
+    async def _notify(self, job: AudioJob, info: AudioInfo) -> None:
+        """Gives a processed audio to the hooks, logging the failing ones."""
+        for hook in self._hooks:
+            try:
+                await hook(job, info)
+            except Exception:
+                pylogger.exception(f"Audio hook {hook!r} failed")
+
+    @asynccontextmanager
+    async def lifespan(self, app: Any) -> AsyncIterator[None]:
+        """
+        FastAPI lifespan running the workers and the journal.
+
+        Parameters
+        ----------
+        app : FastAPI
+            The application being served.
+        """
+        if self.journal is not None:
+            self.journal.start()
+        self.start()
+        try:
+            yield
+        finally:
+            await self.aclose()
+            if self.journal is not None:
+                await self.journal.aclose()
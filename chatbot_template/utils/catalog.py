@@ -0,0 +1,216 @@
+import logging
+import sys
+from dataclasses import dataclass
+
+from chatbot_template.utils.enums import Phase, WorkflowError
+
+pylogger = logging.getLogger(__name__)
+
+# Language whose messages stand in for the missing translations
+FALLBACK_LANG: str = "es"
+
+# Position of every error within the errors of a language
+_ERROR_INDEX: dict[WorkflowError, int] = {
+    error: index for index, error in enumerate(WorkflowError)
+}
+_ERROR_KEYS: tuple[str, ...] = tuple(error.name for error in WorkflowError)
+_ERRORS_PER_LANG = len(_ERROR_KEYS)
+_PHASES_PER_LANG = len(Phase)
+
+
+def prompt_of(item: dict) -> str | None:
+    """
+    Extracts and interns the message of a YAML step.
+
+    Parameters
+    ----------
+    item : dict
+        The step as defined in the YAML file.
+
+    Returns
+    -------
+    str | None
+        The `text` or `question` of the step, None if it has neither.
+    """
+    if "text" in item:
+        return sys.intern(item["text"])
+    if "question" in item:
+        return sys.intern(item["question"])
+    return None
+
+
+@dataclass(frozen=True, slots=True)
+class MessageCatalog:
+    """
+    Every prompt and error message of the workflow, resolved at load time.
+
+    Messages are stored in flat tuples: the errors of a language take one
+    row of `len(WorkflowError)` entries, and the steps of each
+    `(lang, phase)` a contiguous slice of the prompts. Missing translations
+    are filled in when the catalog is built, with the message of
+    `FALLBACK_LANG`, then the `UNKNOWN_STATE` error, so a lookup never falls
+    through at runtime.
+
+    Parameters
+    ----------
+    languages : tuple[str, ...]
+        The languages of the catalog, the fallback one first.
+    rows : dict[str, int]
+        Offset of the row of every language, in errors and in slices.
+    errors : tuple[str, ...]
+        The error messages, `rows[lang] * len(WorkflowError)` + error.
+    slices : tuple[tuple[int, int], ...]
+        Start and number of steps of every `(lang, phase)` in `prompts`, at
+        `rows[lang] * len(Phase) + phase`.
+    prompts : tuple[str | None, ...]
+        The interned prompts, None for a step without message.
+    missing : tuple[str, ...]
+        The `lang.key` of every message filled in by a fallback.
+
+    Functions
+    ---------
+    build : (dict, dict, tuple[str, ...]) -> MessageCatalog
+        Resolves the questions and errors of every language.
+    error : (str, WorkflowError) -> str
+        The message of an error in a language.
+    prompt : (str, Phase, int) -> str | None
+        The prompt of a step in a language.
+    steps : (str, Phase) -> tuple[str | None, ...]
+        The prompts of every step of a phase in a language.
+    """
+
+    languages: tuple[str, ...]
+    rows: dict[str, int]
+    errors: tuple[str, ...]
+    slices: tuple[tuple[int, int], ...]
+    prompts: tuple[str | None, ...]
+    missing: tuple[str, ...]
+
+    @classmethod
+    def build(
+        cls, questions: dict, errors: dict, languages: tuple[str, ...] = ()
+    ) -> "MessageCatalog":
+        """
+        Resolves the questions and errors of every language.
+
+        Parameters
+        ----------
+        questions : dict
+            The `QUESTIONS` per language, as in the workflow YAML.
+        errors : dict
+            The merged `ERRORS` per language.
+        languages : tuple[str, ...]
+            Languages to include even without messages of their own.
+
+        Returns
+        -------
+        MessageCatalog
+            The catalog, every missing translation filled in.
+        """
+        ordered = dict.fromkeys((FALLBACK_LANG, *questions, *errors, *languages))
+        langs = tuple(ordered)
+        base_errors = errors.get(FALLBACK_LANG) or {}
+        base_phases = questions.get(FALLBACK_LANG) or {}
+        missing: list[str] = []
+
+        resolved_errors: list[str] = []
+        for lang in langs:
+            own = errors.get(lang) or {}
+            default = (
+                own.get(WorkflowError.UNKNOWN_STATE.name)
+                or base_errors.get(WorkflowError.UNKNOWN_STATE.name)
+                or WorkflowError.UNKNOWN_STATE.value
+            )
+            for key in _ERROR_KEYS:
+                message = own.get(key) or base_errors.get(key)
+                if not own.get(key):
+                    missing.append(f"{lang}.{key}")
+                resolved_errors.append(sys.intern(message or default))
+            unknown = set(own) - set(_ERROR_KEYS)
+            if unknown:
+                pylogger.warning(f"Unknown errors in {lang}: {sorted(unknown)}")
+
+        slices: list[tuple[int, int]] = []
+        prompts: list[str | None] = []
+        for lang in langs:
+            phases = questions.get(lang) or {}
+            for phase in Phase:
+                own = [prompt_of(item) for item in phases.get(phase.label) or []]
+                base = [prompt_of(item) for item in base_phases.get(phase.label) or []]
+                section: list[str | None] = []
+                for step in range(max(len(own), len(base))):
+                    prompt = own[step] if step < len(own) else None
+                    if prompt is None and step < len(base) and base[step] is not None:
+                        missing.append(f"{lang}.{phase.label}.{step}")
+                        prompt = base[step]
+                    section.append(prompt)
+                slices.append((len(prompts), len(section)))
+                prompts.extend(section)
+
+        return cls(
+            langs,
+            {lang: row for row, lang in enumerate(langs)},
+            tuple(resolved_errors),
+            tuple(slices),
+            tuple(prompts),
+            tuple(missing),
+        )
+
+    def error(self, lang: str, error: WorkflowError) -> str:
+        """
+        The message of an error in a language.
+
+        Parameters
+        ----------
+        lang : str
+            The language code, those outside the catalog get the fallback one.
+        error : WorkflowError
+            The type of error.
+
+        Returns
+        -------
+        str
+            The message, resolved when the catalog was built.
+        """
+        row = self.rows.get(lang, 0)
+        return self.errors[row * _ERRORS_PER_LANG + _ERROR_INDEX[error]]
+
+    def steps(self, lang: str, phase: Phase) -> tuple[str | None, ...]:
+        """
+        The prompts of every step of a phase in a language.
+
+        Parameters
+        ----------
+        lang : str
+            The language code, those outside the catalog get the fallback one.
+        phase : Phase
+            The phase.
+
+        Returns
+        -------
+        tuple[str | None, ...]
+            The prompt of every step, empty when the phase has none.
+        """
+        start, count = self.slices[self.rows.get(lang, 0) * _PHASES_PER_LANG + phase]
+        return self.prompts[start : start + count]
+
+    def prompt(self, lang: str, phase: Phase, step: int) -> str | None:
+        """
+        The prompt of a step in a language.
+
+        Parameters
+        ----------
+        lang : str
+            The language code, those outside the catalog get the fallback one.
+        phase : Phase
+            The phase of the step.
+        step : int
+            The index of the step within the phase.
+
+        Returns
+        -------
+        str | None
+            The prompt, None if the step does not exist or has no message.
+        """
+        start, count = self.slices[self.rows.get(lang, 0) * _PHASES_PER_LANG + phase]
+        return self.prompts[start + step] if 0 <= step < count else None
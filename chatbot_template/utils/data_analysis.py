@@ -1,31 +1,187 @@
-import pandas as pd
+from collections.abc import Sequence
+from functools import partial
+
 import numpy as np
+import pandas as pd
+
+from chatbot_template.utils.data_cache import load_table
+from chatbot_template.utils.determinism import make_generator
+
 # import openai
 
 # from Huggingface import transformers
 
+USER_DTYPES: dict[str, str] = {
+    "user_id": "string",
+    "user_name": "string",
+    "password": "string",
+    "favourite_animal": "category",
+    "loves_maths": "Int8",
+}
+
+RANDOM_FACTS_DTYPES: dict[str, str] = {
+    "animal": "category",
+    "maths_level": "Int8",
+    "fact": "string",
+}
+
 
 class DataAnalysis:
     """
     It loads the information and has all the functions to work with the workflow.
 
+    The tables are loaded with compact dtypes (categoricals for day, moment and
+    animal) and the per-request lookups are prebuilt into hash indexes, so each
+    query is a single dictionary access instead of a chained `.loc`.
+
+    Unlike the `.csv`, `bb_dd_info` is in long form: one row per day and moment
+    with an action, in `day`, `moment` and `action` columns. Empty cells have
+    no row, so asking for them raises like an unknown day or moment.
+
     Parameters
     ----------
     bbdd_path : str
-        The path to the `.csv` file.
+        The path to the `.csv` file, one row per day and one column per moment.
     user_path : str
         The path to the `.csv`of information gotten from the user.
+    random_facts_path : str
+        The path to the `.csv` of random facts per animal and maths level.
+    cache_dir : str | None
+        When set, the tables are memory-mapped from a columnar cache kept in
+        this folder (see `data_cache.load_table`) instead of parsing the `.csv`.
+    rng : np.random.Generator | None
+        Generator used to sample the random facts.
+        Default = `make_generator()`, seeded by `seed_everything`.
 
     Functions
     ---------
-
+    get_what_am_i_doing : (str, str) -> str
+        Gets the information of the day and moment desired by the user.
+    get_animal_random_fact : (str, bool) -> str | None
+        Gets a random fact of the favourite animal of the user.
+    get_animal_random_facts : (Sequence[str]) -> list[str | None]
+        Gets a random fact for each of many users at once.
+    memory_usage : () -> dict[str, int]
+        Bytes used by each table.
     """
 
-    def __init__(self, bbdd_path: str, user_path: str, random_facts_path: str):
-        self.bb_dd_info = pd.read_csv(bbdd_path)
-        self.bb_dd_user_actions = pd.read_csv(user_path)
-        self.bb_dd_random_facts = pd.read_csv(random_facts_path)
-    
+    def __init__(
+        self,
+        bbdd_path: str,
+        user_path: str,
+        random_facts_path: str,
+        cache_dir: str | None = None,
+        rng: np.random.Generator | None = None,
+    ):
+        self.rng = rng if rng is not None else make_generator()
+
+        read = pd.read_csv
+        if cache_dir is not None:
+            read = partial(load_table, cache_dir=cache_dir)
+
+        info = read(bbdd_path, index_col=0, dtype="string")
+        info.index.name = "day"
+        self.bb_dd_info = (
+            info.reset_index()
+            .melt(id_vars="day", var_name="moment", value_name="action")
+            .dropna(subset=["action"])
+            .reset_index(drop=True)
+        )
+        self.bb_dd_info = self.bb_dd_info.astype(
+            {"day": "category", "moment": "category", "action": "string"}
+        )
+
+        self.bb_dd_user_actions = read(user_path, dtype=USER_DTYPES)
+        self.bb_dd_random_facts = read(random_facts_path, dtype=RANDOM_FACTS_DTYPES)
+
+        self._build_indexes()
+
+    def _build_indexes(self) -> None:
+        """Builds the hash indexes used by the per-request lookups."""
+        self._actions: dict[tuple[str, str], str] = dict(
+            zip(
+                zip(
+                    self.bb_dd_info["day"].astype(str),
+                    self.bb_dd_info["moment"].astype(str),
+                    strict=True,
+                ),
+                self.bb_dd_info["action"].astype(str),
+                strict=True,
+            )
+        )
+        self._animals: dict[str, str] = dict(
+            zip(
+                self.bb_dd_user_actions["user_id"].astype(str),
+                self.bb_dd_user_actions["favourite_animal"].astype(str),
+                strict=True,
+            )
+        )
+        self._build_fact_pools()
+
+    def _build_fact_pools(self) -> None:
+        """
+        Groups the random facts once into pools per (animal, maths level).
+
+        All the facts are laid out in a single array, sorted by pool, so a pool
+        is just an `(offset, size)` slice of it. Each user is mapped to the pool
+        of its animal and maths level, falling back to every fact of its animal
+        when there are none for its level, or to -1 when there are none at all.
+        """
+        facts = self.bb_dd_random_facts.dropna(subset=["animal", "fact"])
+        animals = facts["animal"].astype(str).to_numpy()
+        values = facts["fact"].astype(str).to_numpy(dtype=object)
+
+        pools: dict[tuple[str, int | None], np.ndarray] = {
+            (str(animal), int(level)): positions
+            for (animal, level), positions in facts.groupby(
+                ["animal", "maths_level"], observed=True
+            ).indices.items()
+        }
+        for animal in np.unique(animals):
+            pools[(str(animal), None)] = np.flatnonzero(animals == animal)
+
+        self._pool_ids: dict[tuple[str, int | None], int] = {
+            key: pool_id for pool_id, key in enumerate(pools)
+        }
+        sizes = [len(positions) for positions in pools.values()]
+        ordered = list(pools.values())
+        offsets: np.ndarray = (
+            np.cumsum([0, *sizes[:-1]]) if sizes else np.empty(0, dtype=np.int64)
+        )
+
+        order = np.concatenate(ordered) if ordered else np.empty(0, dtype=np.intp)
+        self._fact_values: np.ndarray = values[order]
+        self._pool_offsets = np.asarray(offsets, dtype=np.int64)
+        self._pool_sizes = np.asarray(sizes, dtype=np.int64)
+
+        users = self.bb_dd_user_actions
+        self._user_pools: dict[str, int] = {}
+        for user_id, animal, level in zip(
+            users["user_id"].astype(str),
+            users["favourite_animal"].astype(str),
+            users["loves_maths"].fillna(-1).astype(int),
+            strict=True,
+        ):
+            pool_id = self._pool_ids.get((animal, int(level)))
+            if pool_id is None:
+                pool_id = self._pool_ids.get((animal, None), -1)
+            self._user_pools[user_id] = pool_id
+
+    def memory_usage(self) -> dict[str, int]:
+        """
+        Bytes used by each table, including the contents of string columns.
+
+        Returns
+        -------
+        dict[str, int]
+            Deep memory usage of each DataFrame.
+        """
+        return {
+            "info": int(self.bb_dd_info.memory_usage(deep=True).sum()),
+            "user_actions": int(self.bb_dd_user_actions.memory_usage(deep=True).sum()),
+            "random_facts": int(self.bb_dd_random_facts.memory_usage(deep=True).sum()),
+        }
+
     def get_what_am_i_doing(self, day: str = "Never", moment: str = "Vas tarde") -> str:
         """
         Gets the information of the day and moment desired by the user.
@@ -41,36 +197,79 @@ class DataAnalysis:
         -------
         action : str
             The action to perform by the user that day.
-        """
-        action: str = self.bb_dd_info.loc[day][moment]
 
-        return action
-    
+        Raises
+        ------
+        KeyError
+            If the day or the moment are not in the database.
+        """
+        return self._actions[(day, moment)]
 
     def _get_animal(self, user_id: str) -> str:
         """
-        El animal del xaval
+        El animal del xaval.
 
         Returns
         -------
         el_animal : str
             El animal del xaval.
         """
-        return self.bb_dd_user_actions.loc[user_id]["favourite_animal"]
+        return self._animals[user_id]
 
-    def get_animal_random_fact(self, wants_random_fact: bool = True) -> str:
+    def get_animal_random_fact(
+        self, user_id: str, wants_random_fact: bool = True
+    ) -> str | None:
         """
         Function that understands different animals and maths levels
         to get an answer.
 
         Parameters
         ----------
+        user_id : str
+            The unique identifier of the user.
         wants_random_fact : bool
             The binary answer from the user.
-        
+
         Returns
         -------
-        random_fact : str
-            The random fact specified for the user.
+        random_fact : str | None
+            The random fact specified for the user. None if the user does not
+            want one or there are no facts of its animal.
         """
-        if wants_random_fact:
+        if not wants_random_fact:
+            return None
+
+        pool_id = self._user_pools[user_id]
+        if pool_id < 0:
+            return None
+        offset = self._pool_offsets[pool_id]
+        return self._fact_values[offset + self.rng.integers(self._pool_sizes[pool_id])]
+
+    def get_animal_random_facts(self, user_ids: Sequence[str]) -> list[str | None]:
+        """
+        Gets a random fact for each of many users at once.
+
+        The facts of every user are drawn with a single vectorized sample.
+
+        Parameters
+        ----------
+        user_ids : Sequence[str]
+            The unique identifiers of the users.
+
+        Returns
+        -------
+        list[str | None]
+            The random fact of each user, None for those without facts.
+        """
+        pool_ids = np.fromiter(
+            (self._user_pools[user_id] for user_id in user_ids),
+            dtype=np.int64,
+            count=len(user_ids),
+        )
+        found = pool_ids >= 0
+        pools = pool_ids[found]
+        draws = (self.rng.random(len(pools)) * self._pool_sizes[pools]).astype(np.int64)
+
+        facts: np.ndarray = np.full(len(user_ids), None, dtype=object)
+        facts[found] = self._fact_values[self._pool_offsets[pools] + draws]
+        return facts.tolist()
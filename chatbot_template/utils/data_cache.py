@@ -0,0 +1,283 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+pylogger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+CACHE_VERSION = 2
+
+# Folders of the builds in progress, never removed as stale by other builds
+_BUILDING_PREFIX = ".building-"
+
+_MASKED_ARRAYS: dict[str, type] = {
+    "b": pd.arrays.BooleanArray,
+    "i": pd.arrays.IntegerArray,
+    "u": pd.arrays.IntegerArray,
+    "f": pd.arrays.FloatingArray,
+}
+
+
+def _sha256(path: Path) -> str:
+    """Hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _layout(dtype: dict[str, str] | str | None, index_col: int | None) -> str:
+    """Short key of the read options, which decide the columns of the cache."""
+    dtypes = sorted(dtype.items()) if isinstance(dtype, dict) else dtype
+    return hashlib.sha256(f"{dtypes!r}:{index_col!r}".encode()).hexdigest()[:16]
+
+
+def _cache_folder(csv_path: Path, cache_dir: str | Path | None, layout: str) -> Path:
+    """
+    Folder holding the cache of `csv_path` read with a layout.
+
+    Each layout has its own folder and manifest, so the same file loaded with
+    other read options never gets the columns built for the first ones.
+    """
+    root = Path(cache_dir) if cache_dir is not None else csv_path.parent / ".cache"
+    return root / csv_path.stem / layout
+
+
+def _read_manifest(folder: Path) -> dict | None:
+    """Reads the manifest of a cache, None if missing or from another version."""
+    try:
+        with open(folder / MANIFEST_NAME, encoding="utf-8") as file:
+            manifest: dict = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return manifest if manifest.get("version") == CACHE_VERSION else None
+
+
+def _write_manifest(folder: Path, manifest: dict) -> None:
+    """Publishes a manifest atomically."""
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as file:
+        json.dump(manifest, file)
+    os.replace(tmp_path, folder / MANIFEST_NAME)
+
+
+def _is_fresh(folder: Path, manifest: dict | None, csv_path: Path, layout: str) -> bool:
+    """
+    Checks that a cache still matches its source and read options.
+
+    The mtime and size are compared first; only when they differ is the
+    source hashed, so touching a file does not trigger a rebuild.
+    """
+    if (
+        manifest is None
+        or manifest.get("layout") != layout
+        or not (folder / manifest["data"]).is_dir()
+    ):
+        return False
+    stat = csv_path.stat()
+    if manifest["mtime_ns"] == stat.st_mtime_ns and manifest["size"] == stat.st_size:
+        return True
+    if manifest["sha256"] != _sha256(csv_path):
+        return False
+
+    # Same contents, remember the new mtime so the next start skips the hash.
+    manifest.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+    _write_manifest(folder, manifest)
+    return True
+
+
+def _write_column(folder: Path, position: int, series: pd.Series) -> dict:
+    """
+    Writes a column as `.npy` files and returns its description.
+
+    Plain numeric columns are stored as is, nullable ones as values plus mask
+    and everything else dictionary-encoded as integer codes plus categories.
+    """
+    name = f"c{position}"
+    dtype = series.dtype
+
+    if isinstance(dtype, np.dtype) and dtype.kind in "biufM":
+        np.save(folder / f"{name}.npy", series.to_numpy())
+        return {"kind": "numeric", "file": name}
+
+    if isinstance(dtype, pd.api.extensions.ExtensionDtype) and dtype.kind in "biuf":
+        values = series.to_numpy(dtype=dtype.numpy_dtype, na_value=0)
+        np.save(folder / f"{name}.npy", values)
+        np.save(folder / f"{name}.mask.npy", series.isna().to_numpy())
+        return {"kind": "nullable", "file": name, "dtype_kind": dtype.kind}
+
+    categorical = series.astype("category").cat
+    np.save(folder / f"{name}.npy", categorical.codes.to_numpy())
+    np.save(
+        folder / f"{name}.categories.npy",
+        categorical.categories.astype(str).to_numpy(dtype=str),
+    )
+    return {"kind": "dictionary", "file": name}
+
+
+def _read_column(
+    folder: Path, column: dict
+) -> np.ndarray | pd.api.extensions.ExtensionArray:
+    """Memory-maps a column written by `_write_column`."""
+    values = np.load(folder / f"{column['file']}.npy", mmap_mode="r")
+    if column["kind"] == "numeric":
+        return values
+    if column["kind"] == "nullable":
+        mask = np.load(folder / f"{column['file']}.mask.npy", mmap_mode="r")
+        return _MASKED_ARRAYS[column["dtype_kind"]](values, mask)
+    categories = np.load(folder / f"{column['file']}.categories.npy")
+    return pd.Categorical.from_codes(values, categories=categories, validate=False)
+
+
+def build_cache(
+    csv_path: str | Path,
+    cache_dir: str | Path | None = None,
+    dtype: dict[str, str] | str | None = None,
+    index_col: int | None = None,
+) -> Path:
+    """
+    Converts a `.csv` into a columnar cache of `.npy` files.
+
+    The columns are written to a private temporary folder, renamed into the
+    folder named after the source hash, within the folder of the read
+    options, then published by
+    atomically replacing the manifest. Files are never rewritten in place:
+    when another worker already published the same contents, its folder is
+    kept and this build is discarded, so a cache memory-mapped by a running
+    worker is never truncated under it.
+
+    Parameters
+    ----------
+    csv_path : str | Path
+        The path to the `.csv` file.
+    cache_dir : str | Path | None
+        Root folder of the caches. Default = a `.cache` folder next to the file.
+    dtype : dict[str, str] | str | None
+        The dtypes passed to `pd.read_csv`.
+    index_col : int | None
+        The index column passed to `pd.read_csv`.
+
+    Returns
+    -------
+    Path
+        The folder holding the cache.
+    """
+    csv_path = Path(csv_path)
+    layout = _layout(dtype, index_col)
+    folder = _cache_folder(csv_path, cache_dir, layout)
+    folder.mkdir(parents=True, exist_ok=True)
+
+    stat = csv_path.stat()
+    sha256 = _sha256(csv_path)
+    table = pd.read_csv(csv_path, dtype=dtype, index_col=index_col)
+    index_name = None
+    if index_col is not None:
+        index_name = table.index.name or "index"
+        table = table.reset_index(names=index_name)
+
+    data_folder = folder / sha256[:16]
+    building = Path(tempfile.mkdtemp(dir=folder, prefix=_BUILDING_PREFIX))
+    columns = []
+    try:
+        for position, name in enumerate(table.columns):
+            column = _write_column(building, position, table[name])
+            columns.append({"name": name, **column})
+        os.rename(building, data_folder)
+    except OSError:
+        if not data_folder.is_dir():
+            raise
+        pylogger.info(f"Cache of {csv_path} already published in {data_folder}")
+    finally:
+        shutil.rmtree(building, ignore_errors=True)
+
+    manifest = {
+        "version": CACHE_VERSION,
+        "source": str(csv_path),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": sha256,
+        "layout": layout,
+        "data": data_folder.name,
+        "index": index_name,
+        "rows": len(table),
+        "columns": columns,
+    }
+    _write_manifest(folder, manifest)
+
+    for stale in folder.iterdir():
+        if (
+            stale.is_dir()
+            and stale.name != data_folder.name
+            and not stale.name.startswith(_BUILDING_PREFIX)
+        ):
+            shutil.rmtree(stale, ignore_errors=True)
+
+    pylogger.info(f"Built columnar cache of {csv_path} in {data_folder}")
+    return folder
+
+
+def load_table(
+    csv_path: str | Path,
+    cache_dir: str | Path | None = None,
+    dtype: dict[str, str] | str | None = None,
+    index_col: int | None = None,
+) -> pd.DataFrame:
+    """
+    Loads a `.csv` through its columnar cache, rebuilding it when stale.
+
+    The columns are memory-mapped, so every worker reading the same cache
+    shares the pages of the OS page cache instead of parsing its own copy.
+    Text columns come back as categoricals.
+
+    Parameters
+    ----------
+    csv_path : str | Path
+        The path to the `.csv` file.
+    cache_dir : str | Path | None
+        Root folder of the caches. Default = a `.cache` folder next to the file.
+    dtype : dict[str, str] | str | None
+        The dtypes passed to `pd.read_csv` when the cache is (re)built.
+    index_col : int | None
+        The index column passed to `pd.read_csv` when the cache is (re)built.
+
+    Returns
+    -------
+    pd.DataFrame
+        The table, backed by read-only memory maps.
+
+    Raises
+    ------
+    RuntimeError
+        If the manifest still cannot be read once the cache is rebuilt.
+    """
+    csv_path = Path(csv_path)
+    layout = _layout(dtype, index_col)
+    folder = _cache_folder(csv_path, cache_dir, layout)
+    manifest = _read_manifest(folder)
+    if not _is_fresh(folder, manifest, csv_path, layout):
+        build_cache(csv_path, cache_dir, dtype=dtype, index_col=index_col)
+        manifest = _read_manifest(folder)
+    if manifest is None:
+        message = f"The cache of {csv_path} in {folder} has no readable manifest"
+        pylogger.error(message)
+        raise RuntimeError(message)
+
+    data_folder = folder / manifest["data"]
+    table = pd.DataFrame(
+        {
+            column["name"]: _read_column(data_folder, column)
+            for column in manifest["columns"]
+        },
+        copy=False,
+    )
+    if manifest["index"] is not None:
+        table = table.set_index(manifest["index"])
+    return table
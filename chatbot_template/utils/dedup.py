@@ -0,0 +1,153 @@
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+
+from chatbot_template.utils.env import get_env
+from chatbot_template.utils.state_store import StateStore
+
+pylogger = logging.getLogger(__name__)
+
+
+class DedupCache:
+    """
+    TTL record of the message ids already processed.
+
+    WhatsApp and Telegram redeliver a webhook when its acknowledgement is slow,
+    and a redelivered message must not advance the conversation twice. Ids are
+    remembered for `ttl` seconds in the `StateStore` holding the conversation
+    states, so a redelivery reaching another worker, or another node with a
+    shared backend, is recognized too.
+
+    An id is only marked once the state it produced is committed: a worker
+    dying before that leaves the message to be processed by its redelivery
+    instead of dropping it. The hooks check the ids in the lane of the user,
+    so a redelivery queued behind its original sees it marked.
+
+    The ids marked by this process are also kept in an LRU of at most
+    `max_recent` entries, checked by `recent` before a message is queued, so a
+    redelivery reaching the worker of its original needs no store round trip.
+    The SQLite and Redis backends bound the ids by `ttl` only, not by size.
+
+    Parameters
+    ----------
+    store : StateStore
+        The store keeping the ids.
+    ttl : float
+        Seconds an id is remembered. Default = 86_400 (one day).
+    max_recent : int
+        Maximum number of ids kept in the LRU of the process. Default = 10_000.
+
+    Functions
+    ---------
+    from_env : (StateStore) -> DedupCache
+        Builds the record from the `DEDUP_*` environment variables.
+    recent : (str) -> bool
+        Whether an id was marked by this process, without awaiting the store.
+    seen_many : (Iterable[str]) -> set[str]
+        The ids already processed.
+    mark : (Iterable[str]) -> None
+        Records ids as processed.
+    """
+
+    def __init__(
+        self, store: StateStore, ttl: float = 86_400.0, max_recent: int = 10_000
+    ):
+        self.store = store
+        self.ttl = ttl
+        self.max_recent = max_recent
+        self._recent: OrderedDict[str, float] = OrderedDict()
+
+    @classmethod
+    def from_env(cls, store: StateStore) -> "DedupCache":
+        """
+        Builds the record from the environment.
+
+        `DEDUP_TTL` sets the seconds the ids are remembered and
+        `DEDUP_LOCAL_ENTRIES` the size of the LRU of the process. The
+        in-memory store tracks at most `DEDUP_MAX_ENTRIES` of them.
+
+        Parameters
+        ----------
+        store : StateStore
+            The store keeping the ids.
+
+        Returns
+        -------
+        DedupCache
+            The configured record.
+        """
+        return cls(
+            store,
+            ttl=float(get_env("DEDUP_TTL", "86400")),
+            max_recent=int(get_env("DEDUP_LOCAL_ENTRIES", "10000")),
+        )
+
+    def recent(self, message_id: str) -> bool:
+        """
+        Whether an id was marked by this process less than `ttl` seconds ago.
+
+        Parameters
+        ----------
+        message_id : str
+            The WhatsApp message id or the Telegram update id.
+
+        Returns
+        -------
+        bool
+            True if the id is in the LRU of the process and not expired.
+        """
+        expiry = self._recent.get(message_id)
+        if expiry is None:
+            return False
+        if expiry <= time.monotonic():
+            del self._recent[message_id]
+            return False
+        self._recent.move_to_end(message_id)
+        return True
+
+    async def seen_many(self, message_ids: Iterable[str]) -> set[str]:
+        """
+        The ids already processed less than `ttl` seconds ago.
+
+        Ids found in the LRU of the process are not looked up in the store.
+
+        Parameters
+        ----------
+        message_ids : Iterable[str]
+            WhatsApp message ids or Telegram update ids.
+
+        Returns
+        -------
+        set[str]
+            The ids of `message_ids` marked by `mark` and not expired.
+        """
+        seen: set[str] = set()
+        missing: list[str] = []
+        for message_id in message_ids:
+            if self.recent(message_id):
+                seen.add(message_id)
+            else:
+                missing.append(message_id)
+        if missing:
+            seen.update(await self.store.seen_many(missing))
+        return seen
+
+    async def mark(self, message_ids: Iterable[str]) -> None:
+        """
+        Records ids as processed, once the state they produced is committed.
+
+        Parameters
+        ----------
+        message_ids : Iterable[str]
+            WhatsApp message ids or Telegram update ids.
+        """
+        message_ids = list(message_ids)
+        await self.store.mark_seen(message_ids, self.ttl)
+        expiry = time.monotonic() + self.ttl
+        recent = self._recent
+        for message_id in message_ids:
+            recent[message_id] = expiry
+            recent.move_to_end(message_id)
+        while len(recent) > self.max_recent:
+            recent.popitem(last=False)
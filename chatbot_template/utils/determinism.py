@@ -99,3 +99,29 @@ def seed_everything(
     pylogger.info(f"Seed set to {seed}")
 
     return seed
+
+
+def make_generator(seed: int | None = None) -> np.random.Generator:
+    """
+    Build a NumPy `Generator` following the seed set by `seed_everything`.
+
+    Parameters
+    ----------
+    seed : int, optional
+        The seed of the generator. If `None`, it is read from the
+        `PL_GLOBAL_SEED` env variable when set and left unseeded otherwise.
+
+    Returns
+    -------
+    np.random.Generator
+        The new generator.
+    """
+    if seed is None:
+        env_seed = os.environ.get("PL_GLOBAL_SEED")
+        if env_seed is not None:
+            try:
+                seed = int(env_seed)
+            except ValueError:
+                pylogger.warning(f"Invalid seed found: {env_seed!r}, not seeding")
+
+    return np.random.default_rng(seed)
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any
+
+pylogger = logging.getLogger(__name__)
+
+MessageHandler = Callable[[str, Any], Awaitable[None]]
+
+
+@dataclass(slots=True)
+class _UserLane:
+    """Messages of a single user waiting to be handled, in arrival order."""
+
+    queue: deque = field(default_factory=deque)
+    task: asyncio.Task | None = None
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class UserDispatcher:
+    """
+    Dispatches messages to a handler, sharded by user.
+
+    Messages of the same user are handled strictly in order by a dedicated
+    task, while different users are handled concurrently. A user's task only
+    lives while it has pending messages, so idle conversations cost nothing.
+
+    Queues are bounded: `submit` waits before queueing once a user has
+    `max_pending_per_user` messages queued or the whole dispatcher has
+    `max_pending` messages, which propagates backpressure to the webhook.
+
+    Parameters
+    ----------
+    handler : MessageHandler
+        Coroutine called as `handler(user_id, message)` for every message.
+    max_pending_per_user : int
+        Maximum queued messages for a single user. Default = 32.
+    max_pending : int
+        Maximum queued messages across every user. Default = 10_000.
+
+    Functions
+    ---------
+    submit : (str, Any) -> None
+        Queues a message of a user, waiting if the queues are full.
+    join : () -> None
+        Waits until every queued message has been handled.
+    lifespan : (FastAPI) -> AsyncIterator[None]
+        FastAPI lifespan draining the queues at shutdown.
+    """
+
+    def __init__(
+        self,
+        handler: MessageHandler,
+        max_pending_per_user: int = 32,
+        max_pending: int = 10_000,
+    ):
+        self.handler = handler
+        self.max_pending_per_user = max_pending_per_user
+        self.max_pending = max_pending
+        self._lanes: dict[str, _UserLane] = {}
+        self._pending = 0
+        self._held_back = 0
+        # Tokens of the held back submissions of every user, in arrival order
+        self._waiting: dict[str, deque[object]] = {}
+        self._room = asyncio.Condition()
+
+    @property
+    def active_users(self) -> int:
+        """Number of users with messages being handled or queued."""
+        return len(self._lanes)
+
+    def _has_room(self, user_id: str) -> bool:
+        """Whether a message of `user_id` can be queued without exceeding a bound."""
+        lane = self._lanes.get(user_id)
+        queued = len(lane.queue) if lane is not None else 0
+        return self._pending < self.max_pending and queued < self.max_pending_per_user
+
+    def _enqueue(self, user_id: str, message: Any) -> None:
+        """Appends a message to the user's queue, starting its task if idle."""
+        lane = self._lanes.get(user_id)
+        if lane is None:
+            lane = _UserLane()
+            lane.task = asyncio.create_task(self._run_lane(user_id, lane))
+            self._lanes[user_id] = lane
+        lane.queue.append(message)
+        self._pending += 1
+
+    async def _wake(self) -> None:
+        """Lets the held back submissions check for room again."""
+        async with self._room:
+            self._room.notify_all()
+
+    async def submit(self, user_id: str, message: Any) -> None:
+        """
+        Queues a message of a user, waiting if the queues are full.
+
+        The message is only queued once there is room, so held back messages
+        stay with their submitters and the bounds hold. The held back
+        submissions of a user are queued in arrival order, and later ones
+        wait behind them.
+
+        Parameters
+        ----------
+        user_id : str
+            The unique identifier of the user, used as shard key.
+        message : Any
+            The message passed to the handler.
+        """
+        waiting = self._waiting.get(user_id)
+        if waiting or not self._has_room(user_id):
+            if waiting is None:
+                waiting = self._waiting[user_id] = deque()
+            token = object()
+            waiting.append(token)
+            self._held_back += 1
+            try:
+                async with self._room:
+                    await self._room.wait_for(
+                        lambda: waiting[0] is token and self._has_room(user_id)
+                    )
+            except BaseException:
+                self._held_back -= 1
+                waiting.remove(token)
+                if not waiting:
+                    del self._waiting[user_id]
+                else:
+                    # The next submission of the user may be first in line now
+                    await self._wake()
+                raise
+
+            self._held_back -= 1
+            waiting.popleft()
+            if not waiting:
+                del self._waiting[user_id]
+            self._enqueue(user_id, message)
+            if waiting:
+                await self._wake()
+            return
+
+        self._enqueue(user_id, message)
+
+    async def _run_lane(self, user_id: str, lane: _UserLane) -> None:
+        """Handles the messages of a user one by one until none are queued."""
+        try:
+            while lane.queue:
+                message = lane.queue.popleft()
+                try:
+                    await self.handler(user_id, message)
+                except Exception:
+                    pylogger.exception(f"Failed to handle a message of {user_id}")
+                finally:
+                    self._pending -= 1
+                    if self._held_back:
+                        await self._wake()
+        finally:
+            del self._lanes[user_id]
+            lane.done.set()
+
+    async def join(self) -> None:
+        """Waits until every queued message has been handled."""
+        while self._lanes:
+            await asyncio.gather(*(lane.done.wait() for lane in self._lanes.values()))
+
+    @asynccontextmanager
+    async def lifespan(self, app: Any) -> AsyncIterator[None]:
+        """
+        FastAPI lifespan draining the queues at shutdown.
+
+        Parameters
+        ----------
+        app : FastAPI
+            The application being served.
+        """
+        try:
+            yield
+        finally:
+            await self.join()
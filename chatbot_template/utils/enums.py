@@ -1,4 +1,4 @@
-from enum import StrEnum, auto
+from enum import IntEnum, StrEnum, auto
 
 
 class WorkflowError(StrEnum):
@@ -13,3 +13,35 @@ class WorkflowError(StrEnum):
     NOT_AUDIO = auto()
     UNKNOWN_STATE = auto()
     AUDIO_TOO_SHORT = auto()
+    LANG_NOT_SUPPORTED = auto()
+
+
+class Phase(IntEnum):
+    """Phases of the workflow, in the order a conversation goes through them."""
+
+    PRESENTATION = 0
+    FORMULAIRES = 1
+    AUDIO_QUESTIONS = 2
+    CONCLUSION = 3
+
+    @property
+    def label(self) -> str:
+        """Name of the phase in the workflow YAML, e.g. "audio_questions"."""
+        return self.name.lower()
+
+
+class AnswerType(StrEnum):
+    """Types of answer a question of the workflow YAML can declare."""
+
+    CHOICE = auto()
+    INTEGER = auto()
+    YES_NO = auto()
+    TEXT = auto()
+    AUDIO = auto()
+
+
+class SendPriority(IntEnum):
+    """Lanes of the outbound scheduler, lower values are sent first."""
+
+    ERROR = 0
+    PROMPT = 1
@@ -2,15 +2,23 @@ import logging
 import os
 from contextlib import contextmanager
 
-import dotenv
-
 pylogger = logging.getLogger(__name__)
 
+# Whether the `.env` file has been loaded, it is read once, on first use.
+_envs_loaded = False
+
+# Variables read by the logging set up at import, before the `.env` file
+_LOGGING_ENVS = ("LOG_MODE", "LOG_LEVEL")
+
 
 def get_env(env_name: str, default: str | None = None) -> str:
     """
     Safely retrieves the value of an environment variable.
 
+    The `.env` file of the project is loaded on the first call, unless
+    `load_envs` was called before. That load does not override the variables
+    already set in the process environment.
+
     If the environment variable is not defined or is empty, raises an error unless
     a default value is provided.
 
@@ -34,6 +42,9 @@ def get_env(env_name: str, default: str | None = None) -> str:
     ValueError
         If the environment variable is empty and no default value is provided.
     """
+    if not _envs_loaded:
+        load_envs(override=False)
+
     if env_name not in os.environ:
         if default is None:
             message = f"{env_name} not defined and no default value is present!"
@@ -54,23 +65,37 @@ def get_env(env_name: str, default: str | None = None) -> str:
     return env_value
 
 
-def load_envs(env_file: str | None = None) -> None:
+def load_envs(env_file: str | None = None, override: bool = True) -> None:
     """
     Load environment variables from a file.
 
     This is equivalent to sourcing the file in a shell.
 
     It is possible to define all the system specific variables in the `env_file`.
+    Logging is set up again when the file changes `LOG_MODE` or `LOG_LEVEL`,
+    as the package configures it at import from the process environment only.
 
     Parameters
     ----------
     env_file : str, optional
         The file that defines the environment variables to use.
         If None, it searches for a `.env` file in the project.
+    override : bool
+        Whether the file overrides the variables already set. Default = True.
     """
+    global _envs_loaded
+    import dotenv
+
+    logging_envs = [os.environ.get(name) for name in _LOGGING_ENVS]
     if env_file is None:
         env_file = dotenv.find_dotenv(usecwd=True)
-    dotenv.load_dotenv(dotenv_path=env_file, override=True)
+    dotenv.load_dotenv(dotenv_path=env_file, override=override)
+    _envs_loaded = True
+
+    if logging_envs != [os.environ.get(name) for name in _LOGGING_ENVS]:
+        from chatbot_template.utils.logs import setup_logging
+
+        setup_logging()
 
 
 @contextmanager
@@ -0,0 +1,179 @@
+import logging
+
+import msgspec
+
+pylogger = logging.getLogger(__name__)
+
+
+class MessageEvent(msgspec.Struct, frozen=True, gc=False):
+    """
+    A message received from any platform, as consumed by `WorkflowEngine`.
+
+    Parameters
+    ----------
+    id : str
+        Identifier of the message on its platform, used to drop redeliveries.
+    user_id : str
+        Identifier of the sender, the address of the replies.
+    type : str
+        "text", "audio" or the platform type of any other message.
+    text : str | None
+        The body of a text message.
+    media_id : str | None
+        Identifier of the media of an audio message.
+    duration : float | None
+        Seconds of an audio message, None when the platform does not say, as
+        for WhatsApp, whose audio objects carry no duration.
+    """
+
+    id: str
+    user_id: str
+    type: str
+    text: str | None = None
+    media_id: str | None = None
+    duration: float | None = None
+
+
+# WhatsApp Cloud API notifications. Only the declared fields are decoded, the
+# statuses, contacts, metadata and the rest of the payload are skipped.
+
+
+class _WhatsAppText(msgspec.Struct, gc=False):
+    body: str
+
+
+class _WhatsAppMedia(msgspec.Struct, gc=False):
+    id: str
+    duration: float | None = None
+
+
+class _WhatsAppMessage(msgspec.Struct, gc=False):
+    id: str
+    sender: str = msgspec.field(name="from")
+    type: str = "unsupported"
+    text: _WhatsAppText | None = None
+    audio: _WhatsAppMedia | None = None
+
+    def event(self) -> MessageEvent:
+        """The message as a platform-independent event."""
+        if self.type == "text" and self.text is not None:
+            return MessageEvent(self.id, self.sender, "text", text=self.text.body)
+        if self.type == "audio" and self.audio is not None:
+            return MessageEvent(
+                self.id,
+                self.sender,
+                "audio",
+                media_id=self.audio.id,
+                duration=self.audio.duration,
+            )
+        return MessageEvent(self.id, self.sender, self.type)
+
+
+class _WhatsAppValue(msgspec.Struct):
+    messages: list[_WhatsAppMessage] = []
+
+
+class _WhatsAppChange(msgspec.Struct):
+    value: _WhatsAppValue
+
+
+class _WhatsAppEntry(msgspec.Struct):
+    changes: list[_WhatsAppChange] = []
+
+
+class _WhatsAppNotification(msgspec.Struct):
+    entry: list[_WhatsAppEntry] = []
+
+
+# Telegram Bot API updates.
+
+
+class _TelegramUser(msgspec.Struct, gc=False):
+    id: int
+
+
+class _TelegramVoice(msgspec.Struct, gc=False):
+    file_id: str
+    duration: float | None = None
+
+
+class _TelegramMessage(msgspec.Struct):
+    sender: _TelegramUser | None = msgspec.field(default=None, name="from")
+    text: str | None = None
+    voice: _TelegramVoice | None = None
+
+
+class _TelegramUpdate(msgspec.Struct):
+    update_id: int
+    message: _TelegramMessage | None = None
+
+
+_WHATSAPP_DECODER = msgspec.json.Decoder(_WhatsAppNotification)
+_TELEGRAM_DECODER = msgspec.json.Decoder(_TelegramUpdate)
+
+
+def whatsapp_events(body: bytes) -> list[MessageEvent]:
+    """
+    Decodes every message of a WhatsApp Cloud API notification.
+
+    Parameters
+    ----------
+    body : bytes
+        The JSON body posted to the webhook.
+
+    Returns
+    -------
+    list[MessageEvent]
+        The messages of every entry and change, in order.
+
+    Raises
+    ------
+    msgspec.DecodeError
+        If the body is not JSON or does not have the notification layout.
+    """
+    notification = _WHATSAPP_DECODER.decode(body)
+    return [
+        message.event()
+        for entry in notification.entry
+        for change in entry.changes
+        for message in change.value.messages
+    ]
+
+
+def telegram_event(body: bytes) -> MessageEvent | None:
+    """
+    Decodes the message of a Telegram Bot API update.
+
+    Parameters
+    ----------
+    body : bytes
+        The JSON body posted to the webhook.
+
+    Returns
+    -------
+    MessageEvent | None
+        The message, None for updates that are not a message from a user.
+
+    Raises
+    ------
+    msgspec.DecodeError
+        If the body is not JSON or does not have the update layout.
+    """
+    update = _TELEGRAM_DECODER.decode(body)
+    message = update.message
+    if message is None or message.sender is None:
+        return None
+
+    update_id = str(update.update_id)
+    user_id = str(message.sender.id)
+    if message.text is not None:
+        return MessageEvent(update_id, user_id, "text", text=message.text)
+    if message.voice is not None:
+        return MessageEvent(
+            update_id,
+            user_id,
+            "audio",
+            media_id=message.voice.file_id,
+            duration=message.voice.duration,
+        )
+    return MessageEvent(update_id, user_id, "unsupported")
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+import httpx
+
+from chatbot_template.utils.env import get_env
+
+pylogger = logging.getLogger(__name__)
+
+
+def mock_transport(latency: float = 0.0) -> httpx.MockTransport:
+    """
+    Builds a local transport answering every request without touching the network.
+
+    It mimics the Telegram and WhatsApp Cloud APIs closely enough for the hooks:
+    media lookups get a `url` back and everything else an `ok` JSON body.
+
+    Parameters
+    ----------
+    latency : float
+        Seconds each request waits before answering. Default = 0.
+
+    Returns
+    -------
+    httpx.MockTransport
+        The transport to plug into `OutboundClient`.
+    """
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if latency:
+            await asyncio.sleep(latency)
+        if request.method == "GET" and "/v20.0/" in request.url.path:
+            body: dict[str, Any] = {
+                "url": f"https://mock.local/media{request.url.path}"
+            }
+        else:
+            body = {"ok": True}
+        return httpx.Response(200, content=json.dumps(body).encode())
+
+    return httpx.MockTransport(handler)
+
+
+class OutboundClient:
+    """
+    Process-wide pooled `httpx.AsyncClient` used for every outbound call.
+
+    A single client keeps TCP+TLS connections alive between replies instead of
+    opening a new one per message. It is opened and closed by the FastAPI
+    `lifespan`, and lazily opened on first use otherwise.
+
+    Parameters
+    ----------
+    timeout : float
+        Seconds before connect/read/write/pool operations time out. Default = 10.
+    max_connections : int
+        Maximum number of concurrent connections. Default = 100.
+    max_keepalive_connections : int
+        Maximum number of idle connections kept alive. Default = 20.
+    keepalive_expiry : float
+        Seconds an idle connection is kept in the pool. Default = 30.
+    transport : httpx.AsyncBaseTransport | None
+        Transport to use instead of the network, e.g. `mock_transport()`.
+
+    Functions
+    ---------
+    from_env : () -> OutboundClient
+        Builds the client from the `OUTBOUND_*` environment variables.
+    start : () -> httpx.AsyncClient
+        Opens the pooled client if it is not opened yet.
+    aclose : () -> None
+        Closes the pooled client and its connections.
+    lifespan : (FastAPI) -> AsyncIterator[None]
+        FastAPI lifespan opening the client at startup and closing it at shutdown.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 10.0,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.timeout = httpx.Timeout(timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.transport = transport
+        self._client: httpx.AsyncClient | None = None
+
+    @classmethod
+    def from_env(cls) -> "OutboundClient":
+        """
+        Builds the client from the environment.
+
+        `OUTBOUND_TIMEOUT`, `OUTBOUND_MAX_CONNECTIONS`,
+        `OUTBOUND_MAX_KEEPALIVE` and `OUTBOUND_KEEPALIVE_EXPIRY` tune the pool,
+        and `OUTBOUND_MOCK=1` swaps the network for `mock_transport()`.
+
+        Returns
+        -------
+        OutboundClient
+            The configured, not yet opened, client.
+        """
+        use_mock = get_env("OUTBOUND_MOCK", "0") == "1"
+        return cls(
+            timeout=float(get_env("OUTBOUND_TIMEOUT", "10")),
+            max_connections=int(get_env("OUTBOUND_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(get_env("OUTBOUND_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(get_env("OUTBOUND_KEEPALIVE_EXPIRY", "30")),
+            transport=mock_transport() if use_mock else None,
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The pooled client, opened on first access."""
+        if self._client is None or self._client.is_closed:
+            return self.start()
+        return self._client
+
+    def start(self) -> httpx.AsyncClient:
+        """
+        Opens the pooled client if it is not opened yet.
+
+        Returns
+        -------
+        httpx.AsyncClient
+            The pooled client.
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                transport=self.transport,
+            )
+            pylogger.debug(f"Outbound client opened with {self.limits}")
+        return self._client
+
+    async def aclose(self) -> None:
+        """Closes the pooled client and its connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @asynccontextmanager
+    async def lifespan(self, app: Any) -> AsyncIterator[None]:
+        """
+        FastAPI lifespan opening the client at startup and closing it at shutdown.
+
+        Parameters
+        ----------
+        app : FastAPI
+            The application being served.
+        """
+        self.start()
+        try:
+            yield
+        finally:
+            await self.aclose()
+
+
+outbound = OutboundClient.from_env()
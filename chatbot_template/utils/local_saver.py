@@ -1,6 +1,17 @@
+import asyncio
 import json
+import logging
 import os
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from datetime import datetime
+from typing import Any, TextIO
+
+pylogger = logging.getLogger(__name__)
+
+# Queued by `ResponseJournal.aclose` to stop the writer once the queue is flushed
+_STOP: Any = object()
 
 
 def save_response(
@@ -38,9 +49,12 @@ def save_response(
     return record
 
 
-def save_response_to_file(user_id: str, record: dict):
+def save_response_to_file(user_id: str, record: dict, folder: str = "/temp"):
     """
-    Saves the user's response record to a local JSON file.
+    Appends the user's response record to the daily JSON Lines journal.
+
+    Synchronous single-record variant of `ResponseJournal`, which should be
+    preferred when saving from the webhooks.
 
     Parameters
     ----------
@@ -48,18 +62,265 @@ def save_response_to_file(user_id: str, record: dict):
         The unique identifier of the user.
     record : dict
         The response record to save.
+    folder : str
+        The folder of the journal files. Default = /temp.
 
     Returns
     -------
     None
     """
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-    filename = f"/temp/{user_id}_{timestamp}.json"
-    if os.path.exists(filename):
-        with open(filename, encoding="utf-8") as f:
-            data = json.load(f)
-    else:
-        data = []
-    data.append(record)
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    filename = os.path.join(
+        folder, f"responses-{datetime.now().strftime('%Y%m%d')}.jsonl"
+    )
+    line = json.dumps({"user_id": user_id, **record}, ensure_ascii=False)
+    with open(filename, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+class ResponseJournal:
+    """
+    Append-only JSON Lines journal of response records with a background writer.
+
+    `write` only queues the record; a background task batches the queue and
+    appends it to disk when `batch_size` records are waiting or every
+    `flush_interval` seconds, whichever comes first. Files are rotated when the
+    day changes or they grow past `max_file_bytes`.
+
+    Each process appends to its own files, named
+    `{prefix}-{day}-{pid}-{sequence}.jsonl`, so the workers of a server
+    sharing `folder` neither interleave their records nor miscount the size
+    of a file another one also writes.
+
+    At most `max_pending` records wait in the queue, later ones are dropped
+    while the disk cannot keep up. A record that cannot be serialized is
+    logged and dropped on its own, the rest of its batch is still written.
+
+    Parameters
+    ----------
+    folder : str
+        The folder of the journal files, created if missing. Default = /temp.
+    prefix : str
+        Prefix of the journal file names. Default = "responses".
+    batch_size : int
+        Records that trigger a flush. Default = 512.
+    flush_interval : float
+        Maximum seconds a record waits before being flushed. Default = 1.
+    max_file_bytes : int
+        Size that triggers a rotation. Default = 64 MiB.
+    fsync : bool
+        Whether each flush is fsync-ed to survive a power loss. Default = False.
+    max_pending : int
+        Records queued at most before new ones are dropped. Default = 100_000.
+
+    Functions
+    ---------
+    write : (dict) -> None
+        Queues a record to be appended to the journal.
+    start : () -> None
+        Starts the background writer.
+    aclose : () -> None
+        Flushes the pending records and stops the background writer.
+    stats : () -> dict[str, float]
+        Records written and dropped, and the throughput achieved.
+    """
+
+    def __init__(
+        self,
+        folder: str = "/temp",
+        prefix: str = "responses",
+        batch_size: int = 512,
+        flush_interval: float = 1.0,
+        max_file_bytes: int = 64 * 1024 * 1024,
+        fsync: bool = False,
+        max_pending: int = 100_000,
+    ):
+        self.folder = folder
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_file_bytes = max_file_bytes
+        self.fsync = fsync
+
+        self._queue: asyncio.Queue[dict] = asyncio.Queue(max_pending)
+        self._task: asyncio.Task | None = None
+        self._file: TextIO | None = None
+        self._file_day = ""
+        self._file_pid = 0
+        self._file_bytes = 0
+        self._records = 0
+        self._dropped = 0
+        self._write_seconds = 0.0
+
+    def write(self, record: dict) -> None:
+        """
+        Queues a record to be appended to the journal.
+
+        Parameters
+        ----------
+        record : dict
+            The response record, e.g. built with `save_response`.
+        """
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self._dropped += 1
+            if self._dropped == 1 or self._dropped % 10_000 == 0:
+                pylogger.warning(
+                    f"Journal queue full, {self._dropped} records dropped so far"
+                )
+
+    def start(self) -> None:
+        """Starts the background writer."""
+        if self._task is None:
+            os.makedirs(self.folder, exist_ok=True)
+            self._task = asyncio.create_task(self._run())
+
+    async def aclose(self) -> None:
+        """Flushes the pending records and stops the background writer."""
+        if self._task is not None:
+            await self._queue.put(_STOP)
+            await self._task
+            self._task = None
+        else:
+            pending = []
+            while not self._queue.empty():
+                pending.append(self._queue.get_nowait())
+            if pending:
+                await asyncio.to_thread(self._append, pending)
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        stats = self.stats()
+        pylogger.info(
+            f"Journal wrote {stats['records']:.0f} records "
+            f"at {stats['records_per_second']:,.0f} records/s"
+        )
+
+    def stats(self) -> dict[str, float]:
+        """
+        Records written and dropped, and the throughput achieved.
+
+        Returns
+        -------
+        dict[str, float]
+            `records`, `dropped`, `write_seconds` and `records_per_second`.
+        """
+        return {
+            "records": self._records,
+            "dropped": self._dropped,
+            "write_seconds": self._write_seconds,
+            "records_per_second": (
+                self._records / self._write_seconds if self._write_seconds else 0.0
+            ),
+        }
+
+    async def _run(self) -> None:
+        """Batches the queued records and appends them in a worker thread."""
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch: list[dict] = []
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                if self._queue.empty() and batch:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        async with asyncio.timeout(timeout):
+                            record = await self._queue.get()
+                    except TimeoutError:
+                        break
+                elif self._queue.empty():
+                    record = await self._queue.get()
+                    deadline = loop.time() + self.flush_interval
+                else:
+                    record = self._queue.get_nowait()
+
+                if record is _STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+
+            if batch:
+                try:
+                    await asyncio.to_thread(self._append, batch)
+                except Exception:
+                    # The writer must survive, or the queue would only grow
+                    pylogger.exception(f"Failed to append {len(batch)} records")
+
+    def _append(self, batch: list[dict]) -> None:
+        """Appends a batch to the current file, rotating it if needed."""
+        start = time.perf_counter()
+        lines = []
+        for record in batch:
+            try:
+                lines.append(
+                    json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+                )
+            except (TypeError, ValueError):
+                self._dropped += 1
+                pylogger.exception(f"Dropped a record that is not JSON: {record!r}")
+        if not lines:
+            return
+        data = "\n".join(lines) + "\n"
+
+        day = datetime.now().strftime("%Y%m%d")
+        file = self._file
+        if (
+            file is None
+            or day != self._file_day
+            or self._file_bytes >= self.max_file_bytes
+            # A forked worker must not share the files of its parent
+            or os.getpid() != self._file_pid
+        ):
+            file = self._rotate(day)
+
+        file.write(data)
+        file.flush()
+        if self.fsync:
+            os.fsync(file.fileno())
+        self._file_bytes += len(data.encode("utf-8"))
+
+        self._records += len(lines)
+        self._write_seconds += time.perf_counter() - start
+
+    def _rotate(self, day: str) -> TextIO:
+        """Opens the first journal file of `day` of this process with room left."""
+        if self._file is not None:
+            self._file.close()
+
+        pid = os.getpid()
+        sequence = 0
+        while True:
+            path = os.path.join(
+                self.folder, f"{self.prefix}-{day}-{pid}-{sequence:03d}.jsonl"
+            )
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if size < self.max_file_bytes:
+                break
+            sequence += 1
+
+        self._file = open(path, "a", encoding="utf-8")
+        self._file_day = day
+        self._file_pid = pid
+        self._file_bytes = size
+        return self._file
+
+    @asynccontextmanager
+    async def lifespan(self, app: Any) -> AsyncIterator[None]:
+        """
+        FastAPI lifespan running the writer and flushing it at shutdown.
+
+        Parameters
+        ----------
+        app : FastAPI
+            The application being served.
+        """
+        self.start()
+        try:
+            yield
+        finally:
+            await self.aclose()
@@ -0,0 +1,325 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import UTC, datetime
+from types import TracebackType
+from typing import TYPE_CHECKING, Any, TextIO
+
+if TYPE_CHECKING:
+    import logging.handlers
+
+from chatbot_template.utils.env import get_env
+
+pylogger = logging.getLogger(__name__)
+
+# The background writer of the last `prod` setup, stopped when it is replaced.
+_listener: "logging.handlers.QueueListener | None" = None
+
+# Attributes every `LogRecord` has, anything else was passed through `extra`.
+_RECORD_ATTRIBUTES = frozenset(
+    logging.LogRecord("", 0, "", 0, "", None, None).__dict__
+) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats each record as a single JSON line.
+
+    The line holds the UTC time, level, logger and message, the traceback if
+    any, and every field passed through `extra`.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        """
+        Formats a record as a JSON line.
+
+        Parameters
+        ----------
+        record : logging.LogRecord
+            The record to format.
+
+        Returns
+        -------
+        str
+            The JSON object, without the trailing newline.
+        """
+        line: dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, UTC).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            line["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            line["exc_info"] = record.exc_text
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                line[key] = value
+        return json.dumps(line, ensure_ascii=False, default=str)
+
+
+class _RecordQueueHandler(logging.Handler):
+    """
+    Queues records with their message and traceback rendered, but unformatted.
+
+    Same contract as `logging.handlers.QueueHandler`, without importing
+    `logging.handlers` until production logging is set up.
+
+    Parameters
+    ----------
+    records : queue.SimpleQueue
+        The queue read by the writer thread.
+    """
+
+    def __init__(self, records: queue.SimpleQueue):
+        super().__init__()
+        self.records = records
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Renders what cannot cross threads and leaves the formatting to the writer.
+
+        Parameters
+        ----------
+        record : logging.LogRecord
+            The record being logged.
+
+        Returns
+        -------
+        logging.LogRecord
+            A copy safe to hand over to the writer thread.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Puts the prepared record on the queue."""
+        try:
+            self.records.put_nowait(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+
+class _LazyRichHandler(logging.Handler):
+    """Console handler importing Rich when the first record is emitted."""
+
+    def __init__(self, level: int = logging.NOTSET):
+        super().__init__(level)
+        self._rich: logging.Handler | None = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Builds the Rich handler on first use and hands the record over."""
+        if self._rich is None:
+            from rich.logging import RichHandler
+
+            self._rich = RichHandler(rich_tracebacks=True)
+            self._rich.setFormatter(self.formatter)
+        self._rich.handle(record)
+
+
+def _rich_excepthook(
+    exc_type: type[BaseException],
+    exc_value: BaseException,
+    traceback: TracebackType | None,
+) -> None:
+    """Installs Rich tracebacks on the first uncaught exception and prints it."""
+    from rich.traceback import install
+
+    install(show_locals=True)
+    sys.excepthook(exc_type, exc_value, traceback)
+
+
+def _setup_dev(level: int) -> None:
+    """Pretty tracebacks and Rich console logging, for local development."""
+    # Rich costs about a tenth of a second to import, only paid when used.
+    sys.excepthook = _rich_excepthook
+    logging.basicConfig(
+        level=level,
+        format="%(message)s",
+        datefmt="[%X]",
+        handlers=[_LazyRichHandler()],
+        force=True,
+    )
+
+
+def _setup_prod(level: int, stream: TextIO) -> "logging.handlers.QueueListener":
+    """JSON lines written by a background thread, for production."""
+    import logging.handlers
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    writer = logging.StreamHandler(stream)
+    writer.setFormatter(JsonFormatter())
+    listener = logging.handlers.QueueListener(
+        records, writer, respect_handler_level=True
+    )
+    logging.basicConfig(
+        level=level, handlers=[_RecordQueueHandler(records)], force=True
+    )
+    listener.start()
+    # Flush the records still queued when the interpreter exits.
+    atexit.register(listener.stop)
+    return listener
+
+
+def _stop_listener() -> None:
+    """Stops the writer of the last `prod` setup, flushing its queued records."""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is None:
+        return
+    atexit.unregister(listener.stop)
+    # Its caller may have stopped it already, stopping twice would fail
+    if listener._thread is not None:
+        listener.stop()
+
+
+def setup_logging(
+    mode: str | None = None, level: str | None = None, stream: TextIO | None = None
+) -> "logging.handlers.QueueListener | None":
+    """
+    Configures the root logger for development or production.
+
+    In `dev` mode records go to the console through Rich, with pretty
+    tracebacks. In `prod` mode they are only put on a queue by the caller and
+    a background thread writes them as JSON lines, so a slow terminal or pipe
+    never stalls the event loop.
+
+    Parameters
+    ----------
+    mode : str | None
+        "dev" or "prod". Default = the `LOG_MODE` environment variable, "dev".
+    level : str | None
+        Name of the root level. Default = the `LOG_LEVEL` environment
+        variable, "INFO".
+    stream : TextIO | None
+        Where `prod` mode writes, the standard error by default.
+
+    Returns
+    -------
+    logging.handlers.QueueListener | None
+        The background writer in `prod` mode, None in `dev` mode.
+
+    Raises
+    ------
+    ValueError
+        If the mode is not supported.
+    """
+    global _listener
+    mode = mode or get_env("LOG_MODE", "dev")
+    numeric_level = logging.getLevelName(
+        (level or get_env("LOG_LEVEL", "INFO")).upper()
+    )
+
+    if mode == "dev":
+        _stop_listener()
+        _setup_dev(numeric_level)
+        return None
+    if mode == "prod":
+        # The handler feeding the previous writer is replaced, stop its thread
+        _stop_listener()
+        _listener = _setup_prod(numeric_level, stream or sys.stderr)
+        return _listener
+
+    message = f"Unsupported LOG_MODE: {mode!r}, use 'dev' or 'prod'"
+    pylogger.error(message)
+    raise ValueError(message)
+
+
+class PayloadLogger:
+    """
+    Logs a sample of the webhook payloads, truncated.
+
+    Payloads are only serialized when they are sampled and the logger is
+    enabled for the level, so unlogged payloads cost a random draw.
+
+    Parameters
+    ----------
+    logger : logging.Logger
+        The logger the payloads are written to.
+    sample_rate : float
+        Fraction of the payloads logged, between 0 and 1. Default = 1.
+    max_chars : int
+        Characters of the serialized payload kept. Default = 2_000.
+    level : int
+        Level of the records. Default = logging.INFO.
+
+    Functions
+    ---------
+    from_env : (logging.Logger) -> PayloadLogger
+        Builds the payload logger from the `LOG_PAYLOAD_*` environment variables.
+    log : (str, Any) -> None
+        Logs a payload, or its JSON text, if it is sampled.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        sample_rate: float = 1.0,
+        max_chars: int = 2_000,
+        level: int = logging.INFO,
+    ):
+        self.logger = logger
+        self.sample_rate = sample_rate
+        self.max_chars = max_chars
+        self.level = level
+
+    @classmethod
+    def from_env(cls, logger: logging.Logger) -> "PayloadLogger":
+        """
+        Builds the payload logger from the environment.
+
+        `LOG_PAYLOAD_SAMPLE` sets the fraction of payloads logged and
+        `LOG_PAYLOAD_MAX_CHARS` their maximum length.
+
+        Parameters
+        ----------
+        logger : logging.Logger
+            The logger the payloads are written to.
+
+        Returns
+        -------
+        PayloadLogger
+            The configured payload logger.
+        """
+        return cls(
+            logger,
+            sample_rate=float(get_env("LOG_PAYLOAD_SAMPLE", "1")),
+            max_chars=int(get_env("LOG_PAYLOAD_MAX_CHARS", "2000")),
+        )
+
+    def log(self, message: str, payload: Any) -> None:
+        """
+        Logs a payload if it is sampled.
+
+        Parameters
+        ----------
+        message : str
+            The message of the record.
+        payload : Any
+            The JSON-serializable payload, or its JSON text as `str` or `bytes`,
+            appended to the message.
+        """
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+        if not self.logger.isEnabledFor(self.level):
+            return
+
+        if isinstance(payload, bytes):
+            text = payload.decode(errors="replace")
+        elif isinstance(payload, str):
+            text = payload
+        else:
+            text = json.dumps(payload, ensure_ascii=False, default=str)
+        if len(text) > self.max_chars:
+            text = f"{text[: self.max_chars]}... ({len(text)} chars)"
+        self.logger.log(self.level, "%s: %s", message, text)
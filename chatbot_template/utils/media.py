@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import logging
+import os
+from collections.abc import AsyncIterator, Coroutine
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, NoReturn
+
+import aiofiles
+
+from chatbot_template.utils.http_client import OutboundClient, outbound
+
+pylogger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class MediaFile:
+    """
+    A media file stored on disk.
+
+    Parameters
+    ----------
+    path : str
+        Local path of the file.
+    size : int
+        Size of the file in bytes.
+    sha256 : str
+        Hex digest of the file contents, computed while downloading.
+    """
+
+    path: str
+    size: int
+    sha256: str
+
+
+class MediaDownloader:
+    """
+    Streams media files to disk chunk by chunk.
+
+    The body is never held in memory: each chunk is hashed and written as it
+    arrives to a `.part` file, renamed once complete. Downloads share a
+    concurrency limit and can run as background tasks.
+
+    Parameters
+    ----------
+    client : OutboundClient
+        The pooled client used for the downloads. Default = `outbound`.
+    max_concurrent : int
+        Maximum simultaneous downloads. Default = 8.
+    max_bytes : int
+        Downloads larger than this are aborted. Default = 16 MiB.
+    chunk_size : int
+        Size of the chunks read from the network. Default = 64 KiB.
+
+    Functions
+    ---------
+    download : (str, str, dict | None) -> MediaFile
+        Streams `url` into `dest_path`.
+    spawn : (Coroutine) -> asyncio.Task
+        Runs a download coroutine in the background.
+    join : () -> None
+        Waits for the background downloads to finish.
+    """
+
+    def __init__(
+        self,
+        client: OutboundClient = outbound,
+        max_concurrent: int = 8,
+        max_bytes: int = 16 * 1024 * 1024,
+        chunk_size: int = 64 * 1024,
+    ):
+        self.outbound = client
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._background: set[asyncio.Task] = set()
+
+    async def download(
+        self, url: str, dest_path: str, headers: dict | None = None
+    ) -> MediaFile:
+        """
+        Streams `url` into `dest_path`.
+
+        Parameters
+        ----------
+        url : str
+            The URL of the media.
+        dest_path : str
+            The local path where the media is written.
+        headers : dict | None
+            Extra headers of the request, e.g. the authorization.
+
+        Returns
+        -------
+        MediaFile
+            The stored file with its size and checksum.
+
+        Raises
+        ------
+        ValueError
+            If the media is larger than `max_bytes`.
+        httpx.HTTPStatusError
+            If the server does not answer with a success status.
+        """
+        part_path = f"{dest_path}.part"
+        digest = hashlib.sha256()
+        size = 0
+
+        async with self._slots:
+            try:
+                async with self.outbound.client.stream(
+                    "GET", url, headers=headers
+                ) as response:
+                    response.raise_for_status()
+                    declared = int(response.headers.get("content-length", 0))
+                    if declared > self.max_bytes:
+                        self._too_large(url, declared)
+
+                    async with aiofiles.open(part_path, "wb") as file:
+                        async for chunk in response.aiter_bytes(self.chunk_size):
+                            size += len(chunk)
+                            if size > self.max_bytes:
+                                self._too_large(url, size)
+                            digest.update(chunk)
+                            await file.write(chunk)
+
+                os.replace(part_path, dest_path)
+            except BaseException:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+                raise
+
+        return MediaFile(dest_path, size, digest.hexdigest())
+
+    def _too_large(self, url: str, size: int) -> NoReturn:
+        message = f"Media {url} exceeds {self.max_bytes} bytes ({size} bytes)"
+        pylogger.error(message)
+        raise ValueError(message)
+
+    def spawn(self, download: Coroutine[Any, Any, Any]) -> asyncio.Task:
+        """
+        Runs a download coroutine in the background.
+
+        Parameters
+        ----------
+        download : Coroutine
+            The coroutine fetching the media, e.g. a call to `download`.
+
+        Returns
+        -------
+        asyncio.Task
+            The background task, whose failures are logged.
+        """
+        task = asyncio.create_task(download)
+        self._background.add(task)
+        task.add_done_callback(self._finished)
+        return task
+
+    def _finished(self, task: asyncio.Task) -> None:
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            pylogger.error(f"Media download failed: {task.exception()!r}")
+
+    async def join(self) -> None:
+        """Waits for the background downloads to finish."""
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+
+    @asynccontextmanager
+    async def lifespan(self, app: Any) -> AsyncIterator[None]:
+        """
+        FastAPI lifespan waiting for the background downloads at shutdown.
+
+        Parameters
+        ----------
+        app : FastAPI
+            The application being served.
+        """
+        try:
+            yield
+        finally:
+            await self.join()
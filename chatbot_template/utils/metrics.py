@@ -0,0 +1,557 @@
+import logging
+import time
+from bisect import bisect_left
+from collections.abc import Iterable
+
+pylogger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, from a dictionary lookup to a slow outbound call.
+LATENCY_BUCKETS: tuple[float, ...] = (
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value: str) -> str:
+    """Escapes a label value for the Prometheus text format."""
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _format_labels(names: tuple[str, ...], values: Iterable[str]) -> str:
+    """Formats `{name="value",...}`, empty when there are no labels."""
+    pairs = ",".join(
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)
+    )
+    return f"{{{pairs}}}" if pairs else ""
+
+
+class _CounterChild:
+    """Value of a counter for one combination of label values."""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Adds `amount` to the counter."""
+        self.value += amount
+
+
+class Counter:
+    """
+    Monotonic counter, one series per combination of label values.
+
+    Updates are plain attribute additions meant to be made from the event
+    loop; they are not synchronized across threads. Hot paths should bind the
+    series once with `labels` and call `inc` on it.
+
+    Parameters
+    ----------
+    name : str
+        The metric name.
+    documentation : str
+        The `# HELP` text.
+    labelnames : tuple[str, ...]
+        Names of the labels. Default = ().
+
+    Functions
+    ---------
+    labels : (*str) -> _CounterChild
+        The series of the given label values, created on first use.
+    inc : (*str, float) -> None
+        Adds `amount` to the series of the given label values.
+    render : () -> list[str]
+        The lines of the metric in the Prometheus text format.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._children: dict[tuple[str, ...], _CounterChild] = {}
+
+    def labels(self, *labels: str) -> _CounterChild:
+        """
+        The series of the given label values, created on first use.
+
+        Parameters
+        ----------
+        *labels : str
+            One value per label name, in order.
+
+        Returns
+        -------
+        _CounterChild
+            The series, with an `inc(amount)` method.
+        """
+        child = self._children.get(labels)
+        if child is None:
+            child = self._children[labels] = _CounterChild()
+        return child
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        """
+        Adds `amount` to the series of the given label values.
+
+        Parameters
+        ----------
+        *labels : str
+            One value per label name, in order.
+        amount : float
+            Increment of the counter. Default = 1.
+        """
+        self.labels(*labels).value += amount
+
+    def render(self) -> list[str]:
+        """The lines of the metric in the Prometheus text format."""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        for labels, child in list(self._children.items()):
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}{label_text} {child.value:g}")
+        return lines
+
+
+class _GaugeChild:
+    """Value of a gauge for one combination of label values."""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        """Sets the gauge to `value`."""
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Adds `amount` to the gauge."""
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        """Subtracts `amount` from the gauge."""
+        self.value -= amount
+
+
+class Gauge:
+    """
+    Value that goes up and down, one series per combination of label values.
+
+    Like `Counter`, updates are plain attribute writes meant to be made from
+    the event loop.
+
+    Parameters
+    ----------
+    name : str
+        The metric name.
+    documentation : str
+        The `# HELP` text.
+    labelnames : tuple[str, ...]
+        Names of the labels. Default = ().
+
+    Functions
+    ---------
+    labels : (*str) -> _GaugeChild
+        The series of the given label values, created on first use.
+    set : (float, *str) -> None
+        Sets the series of the given label values to `value`.
+    render : () -> list[str]
+        The lines of the metric in the Prometheus text format.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._children: dict[tuple[str, ...], _GaugeChild] = {}
+
+    def labels(self, *labels: str) -> _GaugeChild:
+        """
+        The series of the given label values, created on first use.
+
+        Parameters
+        ----------
+        *labels : str
+            One value per label name, in order.
+
+        Returns
+        -------
+        _GaugeChild
+            The series, with `set(value)`, `inc(amount)` and `dec(amount)`.
+        """
+        child = self._children.get(labels)
+        if child is None:
+            child = self._children[labels] = _GaugeChild()
+        return child
+
+    def set(self, value: float, *labels: str) -> None:
+        """
+        Sets the series of the given label values to `value`.
+
+        Parameters
+        ----------
+        value : float
+            The new value of the gauge.
+        *labels : str
+            One value per label name, in order.
+        """
+        self.labels(*labels).value = value
+
+    def render(self) -> list[str]:
+        """The lines of the metric in the Prometheus text format."""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+        ]
+        for labels, child in list(self._children.items()):
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}{label_text} {child.value:g}")
+        return lines
+
+
+class _HistogramChild:
+    """Observations of a histogram for one combination of label values."""
+
+    __slots__ = ("buckets", "counts", "total")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        """Records a value."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+    def time(self) -> "_Timer":
+        """Context manager observing the seconds spent inside it."""
+        return _Timer(self)
+
+
+class _Timer:
+    """Context manager observing the seconds spent inside it."""
+
+    __slots__ = ("child", "start")
+
+    def __init__(self, child: _HistogramChild):
+        self.child = child
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram, one series per combination of label values.
+
+    An observation costs a binary search and two additions: counts are kept
+    per bucket and only made cumulative when the metrics are scraped.
+
+    Parameters
+    ----------
+    name : str
+        The metric name.
+    documentation : str
+        The `# HELP` text.
+    labelnames : tuple[str, ...]
+        Names of the labels. Default = ().
+    buckets : tuple[float, ...]
+        Sorted upper bounds of the buckets. Default = LATENCY_BUCKETS.
+
+    Functions
+    ---------
+    labels : (*str) -> _HistogramChild
+        The series of the given label values, created on first use.
+    observe : (float, *str) -> None
+        Records a value in the series of the given label values.
+    time : (*str) -> _Timer
+        Context manager observing the seconds spent inside it.
+    render : () -> list[str]
+        The lines of the metric in the Prometheus text format.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._children: dict[tuple[str, ...], _HistogramChild] = {}
+
+    def labels(self, *labels: str) -> _HistogramChild:
+        """
+        The series of the given label values, created on first use.
+
+        Parameters
+        ----------
+        *labels : str
+            One value per label name, in order.
+
+        Returns
+        -------
+        _HistogramChild
+            The series, with `observe(value)` and `time()` methods.
+        """
+        child = self._children.get(labels)
+        if child is None:
+            child = self._children[labels] = _HistogramChild(self.buckets)
+        return child
+
+    def observe(self, value: float, *labels: str) -> None:
+        """
+        Records a value in the series of the given label values.
+
+        Parameters
+        ----------
+        value : float
+            The observed value, e.g. seconds.
+        *labels : str
+            One value per label name, in order.
+        """
+        self.labels(*labels).observe(value)
+
+    def time(self, *labels: str) -> _Timer:
+        """
+        Context manager observing the seconds spent inside it.
+
+        Parameters
+        ----------
+        *labels : str
+            One value per label name, in order.
+
+        Returns
+        -------
+        _Timer
+            The context manager.
+        """
+        return _Timer(self.labels(*labels))
+
+    def render(self) -> list[str]:
+        """The lines of the metric in the Prometheus text format."""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        bounds = [f"{bound:g}" for bound in self.buckets] + ["+Inf"]
+        names = (*self.labelnames, "le")
+        for labels, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, child.counts, strict=True):
+                cumulative += count
+                label_text = _format_labels(names, (*labels, bound))
+                lines.append(f"{self.name}_bucket{label_text} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {child.total:g}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Collection of metrics rendered together on the `/metrics` endpoint.
+
+    Functions
+    ---------
+    counter : (str, str, tuple[str, ...]) -> Counter
+        Creates and registers a counter.
+    gauge : (str, str, tuple[str, ...]) -> Gauge
+        Creates and registers a gauge.
+    histogram : (str, str, tuple[str, ...], tuple[float, ...]) -> Histogram
+        Creates and registers a histogram.
+    render : () -> str
+        Every registered metric in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, Counter | Gauge | Histogram] = {}
+
+    def _register(self, metric: Counter | Gauge | Histogram) -> None:
+        if metric.name in self._metrics:
+            message = f"Metric {metric.name!r} is already registered"
+            pylogger.error(message)
+            raise ValueError(message)
+        self._metrics[metric.name] = metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        """
+        Creates and registers a counter.
+
+        Parameters
+        ----------
+        name : str
+            The metric name.
+        documentation : str
+            The `# HELP` text.
+        labelnames : tuple[str, ...]
+            Names of the labels. Default = ().
+
+        Returns
+        -------
+        Counter
+            The registered counter.
+
+        Raises
+        ------
+        ValueError
+            If a metric with the same name is already registered.
+        """
+        counter = Counter(name, documentation, labelnames)
+        self._register(counter)
+        return counter
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        """
+        Creates and registers a gauge.
+
+        Parameters
+        ----------
+        name : str
+            The metric name.
+        documentation : str
+            The `# HELP` text.
+        labelnames : tuple[str, ...]
+            Names of the labels. Default = ().
+
+        Returns
+        -------
+        Gauge
+            The registered gauge.
+
+        Raises
+        ------
+        ValueError
+            If a metric with the same name is already registered.
+        """
+        gauge = Gauge(name, documentation, labelnames)
+        self._register(gauge)
+        return gauge
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        """
+        Creates and registers a histogram.
+
+        Parameters
+        ----------
+        name : str
+            The metric name.
+        documentation : str
+            The `# HELP` text.
+        labelnames : tuple[str, ...]
+            Names of the labels. Default = ().
+        buckets : tuple[float, ...]
+            Sorted upper bounds of the buckets. Default = LATENCY_BUCKETS.
+
+        Returns
+        -------
+        Histogram
+            The registered histogram.
+
+        Raises
+        ------
+        ValueError
+            If a metric with the same name is already registered.
+        """
+        histogram = Histogram(name, documentation, labelnames, buckets)
+        self._register(histogram)
+        return histogram
+
+    def render(self) -> str:
+        """
+        Every registered metric in the Prometheus text format.
+
+        Returns
+        -------
+        str
+            The body of the `/metrics` response.
+        """
+        lines: list[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+stage_seconds = registry.histogram(
+    "chatbot_stage_seconds",
+    "Seconds spent in each stage of handling a webhook message.",
+    ("stage",),
+)
+messages_by_phase = registry.counter(
+    "chatbot_messages_total",
+    "Messages processed by the workflow, by the phase of the user.",
+    ("phase",),
+)
+workflow_errors = registry.counter(
+    "chatbot_workflow_errors_total",
+    "Error replies of the workflow, by WorkflowError.",
+    ("error",),
+)
+state_conflicts = registry.counter(
+    "chatbot_state_conflicts_total",
+    "Messages redone because another worker changed the state of the user.",
+)
+duplicate_messages = registry.counter(
+    "chatbot_duplicate_messages_total",
+    "Redelivered webhook messages acknowledged without being processed.",
+)
+live_sessions = registry.gauge(
+    "chatbot_live_sessions",
+    "Conversation states held by the state store, as of the last sweep.",
+)
+evicted_sessions = registry.counter(
+    "chatbot_evicted_sessions_total",
+    "Conversation states removed by the store, by reason (ttl or capacity).",
+    ("reason",),
+)
+outbound_messages = registry.counter(
+    "chatbot_outbound_messages_total",
+    "Replies handled by the outbound scheduler, by outcome (sent, retried, dropped).",
+    ("outcome",),
+)
+outbound_requests = registry.counter(
+    "chatbot_outbound_requests_total",
+    "Requests of the outbound scheduler, by result (ok, rate_limited, failed).",
+    ("result",),
+)
+audio_files = registry.counter(
+    "chatbot_audio_files_total",
+    "Audio answers processed by the audio pipeline, by result (ok, failed).",
+    ("result",),
+)
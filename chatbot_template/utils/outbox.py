@@ -0,0 +1,522 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager, suppress
+from dataclasses import dataclass, field
+from typing import Any
+
+import httpx
+
+from chatbot_template.utils.enums import SendPriority
+from chatbot_template.utils.env import get_env
+from chatbot_template.utils.metrics import (
+    outbound_messages,
+    outbound_requests,
+    stage_seconds,
+)
+
+pylogger = logging.getLogger(__name__)
+
+Sender = Callable[[str, str], Awaitable[httpx.Response]]
+
+# Seconds before the first retry of a failed send, doubled on each following one
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 60.0
+
+# Series bound once, a delivery only adds to them
+_OUTCOMES = {
+    outcome: outbound_messages.labels(outcome)
+    for outcome in ("sent", "retried", "dropped")
+}
+_REQUESTS_OK = outbound_requests.labels("ok")
+_REQUESTS_RATE_LIMITED = outbound_requests.labels("rate_limited")
+_REQUESTS_FAILED = outbound_requests.labels("failed")
+
+
+class TokenBucket:
+    """
+    Allows `rate` events per second on average, in bursts of up to `burst`.
+
+    A rate of 0 or less means no limit.
+
+    Parameters
+    ----------
+    rate : float
+        Tokens added per second.
+    burst : float
+        Maximum number of tokens held, the bucket starts full.
+    now : float
+        `time.monotonic()` at creation.
+
+    Functions
+    ---------
+    delay : (float) -> float
+        Seconds until a token is available, 0 if one is.
+    take : (float) -> None
+        Uses a token, possibly going into debt.
+    empty : (float) -> None
+        Drops the tokens left.
+    full_at : (float) -> float
+        When the bucket will be full again.
+    """
+
+    __slots__ = ("burst", "rate", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available, 0 if one is."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        """Uses a token, possibly going into debt."""
+        if self.rate > 0:
+            self._refill(now)
+            self.tokens -= 1
+
+    def empty(self, now: float) -> None:
+        """Drops the tokens left, e.g. after the API throttled us."""
+        if self.rate > 0:
+            self._refill(now)
+            self.tokens = min(self.tokens, 0.0)
+
+    def full_at(self, now: float) -> float:
+        """When the bucket will be full again."""
+        if self.rate <= 0:
+            return now
+        self._refill(now)
+        return now + (self.burst - self.tokens) / self.rate
+
+
+@dataclass(slots=True)
+class _Reply:
+    """A reply waiting to be sent."""
+
+    text: str
+    priority: SendPriority
+    queued_at: float
+
+
+@dataclass(slots=True)
+class _Chat:
+    """The replies waiting for a chat and its pacing."""
+
+    bucket: TokenBucket
+    queue: deque[_Reply] = field(default_factory=deque)
+    sending: bool = False
+    scheduled: bool = False
+    attempts: int = 0
+    not_before: float = 0.0
+
+
+def _retry_after(response: httpx.Response) -> float | None:
+    """
+    Seconds a throttled request asks to wait.
+
+    Parameters
+    ----------
+    response : httpx.Response
+        A 429 response.
+
+    Returns
+    -------
+    float | None
+        The `Retry-After` header, or the `retry_after` of a Telegram error body,
+        None if the response gives neither.
+    """
+    header = response.headers.get("Retry-After")
+    if header is not None:
+        with suppress(ValueError):
+            return float(header)
+    with suppress(ValueError, AttributeError, TypeError):
+        return float(response.json()["parameters"]["retry_after"])
+    return None
+
+
+class OutboundScheduler:
+    """
+    Paces the replies sent to the messaging APIs.
+
+    Replies are queued per chat and sent in order by a background task that
+    takes a token from a global bucket (the API throughput) and from the
+    bucket of the chat (the per-recipient limit) for every request. A chat
+    has at most one request in flight; the replies queued behind it meanwhile
+    are coalesced into a single message, joined by a blank line, up to
+    `max_chars`. WhatsApp and Telegram both accept 4096 characters of text.
+
+    Chats are served in two lanes: error replies before prompts, first come
+    first served within a lane. A request throttled with a 429 drops the
+    tokens of the global bucket and retries the chat after its `Retry-After`;
+    5xx answers and transport errors are retried with exponential backoff,
+    and replies still failing after `max_retries` retries are dropped. Other
+    errors drop the replies right away. Every outcome is counted in
+    `chatbot_outbound_messages_total` and `chatbot_outbound_requests_total`.
+
+    Parameters
+    ----------
+    send : Sender
+        Coroutine function sending `text` to `chat_id` and returning the API
+        response.
+    rate : float
+        Requests per second across every chat, 0 for no limit. Default = 30.
+    burst : float
+        Requests allowed at once across every chat. Default = 30.
+    chat_rate : float
+        Requests per second to the same chat, 0 for no limit. Default = 1.
+    chat_burst : float
+        Requests allowed at once to the same chat. Default = 3.
+    max_retries : int
+        Retries of a failed request before its replies are dropped. Default = 5.
+    coalesce : bool
+        Whether the replies queued for a chat are merged. Default = True.
+    max_chars : int
+        Maximum length of a coalesced message. Default = 4096.
+    max_pending : int
+        Replies queued across every chat before `submit` waits.
+        Default = 10_000.
+
+    Functions
+    ---------
+    from_env : (Sender, float, float, float) -> OutboundScheduler
+        Builds the scheduler from the `OUTBOX_*` environment variables.
+    submit : (str, str, SendPriority) -> None
+        Queues a reply, waiting if too many are queued.
+    start : () -> None
+        Starts the background task.
+    join : () -> None
+        Waits until every queued reply was sent or dropped.
+    aclose : (float) -> None
+        Sends the queued replies and stops the background task.
+    lifespan : (FastAPI) -> AsyncIterator[None]
+        FastAPI lifespan sending the queued replies at shutdown.
+    """
+
+    def __init__(
+        self,
+        send: Sender,
+        rate: float = 30.0,
+        burst: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        max_retries: int = 5,
+        coalesce: bool = True,
+        max_chars: int = 4096,
+        max_pending: int = 10_000,
+    ):
+        self.send = send
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.coalesce = coalesce
+        self.max_chars = max_chars
+        self.max_pending = max_pending
+
+        self._bucket = TokenBucket(rate, burst, time.monotonic())
+        self._chats: dict[str, _Chat] = {}
+        # Chats with nothing queued, until their bucket is full again
+        self._idle: OrderedDict[str, float] = OrderedDict()
+        self._ready: list[tuple[int, int, str]] = []
+        self._delayed: list[tuple[float, int, str]] = []
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._room = asyncio.Semaphore(max_pending)
+        self._pending = 0
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._task: asyncio.Task | None = None
+        self._sending: set[asyncio.Task] = set()
+
+    @classmethod
+    def from_env(
+        cls,
+        send: Sender,
+        rate: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+    ) -> "OutboundScheduler":
+        """
+        Builds the scheduler from the environment.
+
+        `OUTBOX_RATE`, `OUTBOX_BURST`, `OUTBOX_CHAT_RATE` and
+        `OUTBOX_CHAT_BURST` override the limits of the platform given as
+        arguments, `OUTBOX_MAX_RETRIES` the retries and `OUTBOX_COALESCE=0`
+        turns coalescing off.
+
+        Parameters
+        ----------
+        send : Sender
+            Coroutine function sending a reply.
+        rate : float
+            Default requests per second across every chat. Default = 30.
+        chat_rate : float
+            Default requests per second to the same chat. Default = 1.
+        chat_burst : float
+            Default requests allowed at once to the same chat. Default = 3.
+
+        Returns
+        -------
+        OutboundScheduler
+            The configured scheduler.
+        """
+        rate = float(get_env("OUTBOX_RATE", str(rate)))
+        return cls(
+            send,
+            rate=rate,
+            burst=float(get_env("OUTBOX_BURST", str(rate))),
+            chat_rate=float(get_env("OUTBOX_CHAT_RATE", str(chat_rate))),
+            chat_burst=float(get_env("OUTBOX_CHAT_BURST", str(chat_burst))),
+            max_retries=int(get_env("OUTBOX_MAX_RETRIES", "5")),
+            coalesce=get_env("OUTBOX_COALESCE", "1") == "1",
+        )
+
+    @property
+    def pending(self) -> int:
+        """Number of replies queued or being sent."""
+        return self._pending
+
+    async def submit(
+        self, chat_id: str, text: str, priority: SendPriority = SendPriority.PROMPT
+    ) -> None:
+        """
+        Queues a reply, waiting if too many are queued.
+
+        Parameters
+        ----------
+        chat_id : str
+            The recipient, replies to the same one are sent in order.
+        text : str
+            The reply.
+        priority : SendPriority
+            The lane of the reply. Default = SendPriority.PROMPT.
+        """
+        await self._room.acquire()
+        now = time.monotonic()
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst, now)
+            chat = self._chats[chat_id] = _Chat(bucket)
+        else:
+            self._idle.pop(chat_id, None)
+        chat.queue.append(_Reply(text, priority, now))
+        self._pending += 1
+        self._drained.clear()
+        self._schedule(chat_id, chat, now)
+        self.start()
+
+    def _schedule(self, chat_id: str, chat: _Chat, now: float) -> None:
+        """Puts a chat with queued replies in line for its next request."""
+        if chat.sending or chat.scheduled or not chat.queue:
+            return
+        chat.scheduled = True
+        ready_at = max(chat.not_before, now + chat.bucket.delay(now))
+        if ready_at <= now:
+            entry = (chat.queue[0].priority, next(self._sequence), chat_id)
+            heapq.heappush(self._ready, entry)
+        else:
+            heapq.heappush(self._delayed, (ready_at, next(self._sequence), chat_id))
+        self._wakeup.set()
+
+    def _forget_idle(self, now: float) -> None:
+        """Forgets the idle chats whose bucket is full, as a new chat's would be."""
+        idle = self._idle
+        while idle:
+            chat_id, full_at = next(iter(idle.items()))
+            if full_at > now:
+                return
+            del idle[chat_id]
+            del self._chats[chat_id]
+
+    def _take_batch(self, chat: _Chat) -> list[_Reply]:
+        """The next reply of a chat and those coalesced with it."""
+        batch = [chat.queue.popleft()]
+        if self.coalesce:
+            size = len(batch[0].text)
+            queue = chat.queue
+            while queue and size + 2 + len(queue[0].text) <= self.max_chars:
+                size += 2 + len(queue[0].text)
+                batch.append(queue.popleft())
+        return batch
+
+    def start(self) -> None:
+        """Starts the background task."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        """Sends the next chat in line whenever both buckets allow it."""
+        while True:
+            now = time.monotonic()
+            while self._delayed and self._delayed[0][0] <= now:
+                _, _, chat_id = heapq.heappop(self._delayed)
+                chat = self._chats[chat_id]
+                entry = (chat.queue[0].priority, next(self._sequence), chat_id)
+                heapq.heappush(self._ready, entry)
+            self._forget_idle(now)
+
+            if not self._ready:
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                self._wakeup.clear()
+                with suppress(TimeoutError):
+                    async with asyncio.timeout(timeout):
+                        await self._wakeup.wait()
+                continue
+
+            wait = self._bucket.delay(now)
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            _, _, chat_id = heapq.heappop(self._ready)
+            chat = self._chats[chat_id]
+            chat.scheduled = False
+            chat.sending = True
+            self._bucket.take(now)
+            chat.bucket.take(now)
+            task = asyncio.create_task(
+                self._deliver(chat_id, chat, self._take_batch(chat))
+            )
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _deliver(self, chat_id: str, chat: _Chat, batch: list[_Reply]) -> None:
+        """Sends a batch of replies and handles the answer of the API."""
+        now = time.monotonic()
+        for reply in batch:
+            stage_seconds.observe(now - reply.queued_at, "outbox")
+
+        try:
+            response = await self.send(chat_id, "\n\n".join(r.text for r in batch))
+        except httpx.TransportError as error:
+            pylogger.warning(f"Sending to {chat_id} failed: {error!r}")
+            self._retry(chat_id, chat, batch, None)
+        except Exception:
+            pylogger.exception(f"Sending to {chat_id} failed, dropping the replies")
+            _REQUESTS_FAILED.inc()
+            self._done(batch, "dropped")
+        else:
+            status = response.status_code
+            if status < 400:
+                _REQUESTS_OK.inc()
+                chat.attempts = 0
+                self._done(batch, "sent")
+            elif status == 429 or status >= 500:
+                self._retry(chat_id, chat, batch, response)
+            else:
+                _REQUESTS_FAILED.inc()
+                pylogger.error(
+                    f"Sending to {chat_id} answered {status}, dropping "
+                    f"{len(batch)} replies: {response.text[:200]}"
+                )
+                self._done(batch, "dropped")
+        finally:
+            now = time.monotonic()
+            chat.sending = False
+            if chat.queue:
+                self._schedule(chat_id, chat, now)
+            else:
+                self._idle[chat_id] = max(chat.bucket.full_at(now), chat.not_before)
+                self._idle.move_to_end(chat_id)
+
+    def _retry(
+        self,
+        chat_id: str,
+        chat: _Chat,
+        batch: list[_Reply],
+        response: httpx.Response | None,
+    ) -> None:
+        """Puts a failed batch back at the front of its chat, or drops it."""
+        now = time.monotonic()
+        delay = None
+        if response is not None and response.status_code == 429:
+            _REQUESTS_RATE_LIMITED.inc()
+            self._bucket.empty(now)
+            delay = _retry_after(response)
+        else:
+            _REQUESTS_FAILED.inc()
+
+        chat.attempts += 1
+        if chat.attempts > self.max_retries:
+            pylogger.error(
+                f"Dropping {len(batch)} replies to {chat_id} "
+                f"after {chat.attempts} attempts"
+            )
+            chat.attempts = 0
+            self._done(batch, "dropped")
+            return
+
+        if delay is None:
+            backoff = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (chat.attempts - 1))
+            delay = backoff * random.uniform(0.5, 1.0)
+        chat.not_before = now + delay
+        # Put back one by one, they are coalesced again with any newer reply
+        chat.queue.extendleft(reversed(batch))
+        _OUTCOMES["retried"].inc(len(batch))
+
+    def _done(self, batch: list[_Reply], outcome: str) -> None:
+        """Accounts for replies leaving the scheduler as "sent" or "dropped"."""
+        _OUTCOMES[outcome].inc(len(batch))
+        self._pending -= len(batch)
+        for _ in batch:
+            self._room.release()
+        if not self._pending:
+            self._drained.set()
+
+    async def join(self) -> None:
+        """Waits until every queued reply was sent or dropped."""
+        await self._drained.wait()
+
+    async def aclose(self, timeout: float = 30.0) -> None:
+        """
+        Sends the queued replies and stops the background task.
+
+        Parameters
+        ----------
+        timeout : float
+            Seconds given to the queued replies, those left are dropped.
+            Default = 30.
+        """
+        try:
+            async with asyncio.timeout(timeout):
+                await self.join()
+        except TimeoutError:
+            pylogger.warning(f"Dropping {self._pending} replies not sent in time")
+
+        tasks = [*self._sending, *([self._task] if self._task else [])]
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        self._task = None
+
+    @asynccontextmanager
+    async def lifespan(self, app: Any) -> AsyncIterator[None]:
+        """
+        FastAPI lifespan sending the queued replies at shutdown.
+
+        Parameters
+        ----------
+        app : FastAPI
+            The application being served.
+        """
+        self.start()
+        try:
+            yield
+        finally:
+            await self.aclose()
@@ -0,0 +1,154 @@
+import logging
+import sys
+import threading
+from collections import Counter
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from types import FrameType
+from typing import Any
+
+from chatbot_template.utils.env import get_env
+
+pylogger = logging.getLogger(__name__)
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler sampling the stack of the event loop thread.
+
+    A background thread takes a snapshot of the stack every `interval` seconds,
+    so the profiled code is never instrumented and the overhead only depends
+    on the sampling rate. Samples are aggregated in the folded format read by
+    `flamegraph.pl`, speedscope and most flame graph viewers.
+
+    Parameters
+    ----------
+    interval : float | None
+        Seconds between samples. None disables the profiler. Default = 0.01.
+    max_depth : int
+        Frames kept per sample, from the innermost. Default = 64.
+
+    Functions
+    ---------
+    from_env : () -> SamplingProfiler
+        Builds the profiler from the `PROFILING_*` environment variables.
+    start : (int | None) -> None
+        Starts sampling a thread, the calling one by default.
+    stop : () -> None
+        Stops sampling, keeping the samples taken.
+    render : () -> str
+        The samples in the folded format, one stack per line.
+    lifespan : (FastAPI) -> AsyncIterator[None]
+        FastAPI lifespan sampling the event loop while the app runs.
+    """
+
+    def __init__(self, interval: float | None = 0.01, max_depth: int = 64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples: Counter[str] = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @classmethod
+    def from_env(cls) -> "SamplingProfiler":
+        """
+        Builds the profiler from the environment.
+
+        The profiler and its `/debug/profile` route are off unless
+        `PROFILING_ENABLED=1`, the route being unauthenticated. `PROFILER_INTERVAL`
+        sets the seconds between samples, 0.01 by default.
+
+        Returns
+        -------
+        SamplingProfiler
+            The configured, not yet started, profiler.
+        """
+        if get_env("PROFILING_ENABLED", "0") != "1":
+            return cls(interval=None)
+        interval = float(get_env("PROFILER_INTERVAL", "0.01"))
+        return cls(interval=interval if interval > 0 else None)
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the profiler samples when started."""
+        return self.interval is not None
+
+    def _fold(self, frame: FrameType | None) -> str:
+        """Folds a stack as `outer;...;inner`, one `function (file:line)` each."""
+        names: list[str] = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _run(self, thread_id: int) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                return
+            stack = self._fold(frame)
+            with self._lock:
+                self.samples[stack] += 1
+
+    def start(self, thread_id: int | None = None) -> None:
+        """
+        Starts sampling a thread.
+
+        Parameters
+        ----------
+        thread_id : int | None
+            Identifier of the sampled thread, the calling one if None.
+        """
+        if not self.enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(thread_id or threading.get_ident(),),
+            name="sampling-profiler",
+            daemon=True,
+        )
+        self._thread.start()
+        pylogger.info(f"Sampling profiler started every {self.interval}s")
+
+    def stop(self) -> None:
+        """Stops sampling, keeping the samples taken."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        pylogger.info(f"Sampling profiler stopped, {self.samples.total()} samples")
+
+    def render(self) -> str:
+        """
+        The samples in the folded format, one stack per line.
+
+        Returns
+        -------
+        str
+            `outer;...;inner count` lines, the most sampled first.
+        """
+        with self._lock:
+            samples = self.samples.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in samples)
+
+    @asynccontextmanager
+    async def lifespan(self, app: Any) -> AsyncIterator[None]:
+        """
+        FastAPI lifespan sampling the event loop while the app runs.
+
+        Nothing is started when the profiler is disabled.
+
+        Parameters
+        ----------
+        app : FastAPI
+            The application being served.
+        """
+        self.start()
+        try:
+            yield
+        finally:
+            self.stop()
@@ -0,0 +1,466 @@
+import asyncio
+import logging
+import time
+import tracemalloc
+from collections import Counter
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+import numpy as np
+
+from chatbot_template.utils.conversation import ConversationState
+from chatbot_template.utils.determinism import seed_everything
+from chatbot_template.utils.enums import Phase, WorkflowError
+from chatbot_template.utils.events import MessageEvent
+from chatbot_template.utils.validators import (
+    AudioValidator,
+    ChoiceValidator,
+    IntegerValidator,
+    TextValidator,
+    Validator,
+)
+from chatbot_template.utils.workflow import WorkflowEngine
+
+pylogger = logging.getLogger(__name__)
+
+# Words the simulated users type as free text or as a wrong answer
+_WORDS: tuple[str, ...] = (
+    "hola",
+    "no sé",
+    "quizás",
+    "gato",
+    "perro",
+    "mañana",
+    "adéu",
+    "???",
+    "ok",
+    "3.5",
+)
+
+
+@dataclass(frozen=True, slots=True)
+class SimulatedConversation:
+    """
+    A generated conversation of a user, from the presentation to the goodbye.
+
+    Parameters
+    ----------
+    user_id : str
+        The identifier of the simulated user.
+    events : tuple[MessageEvent, ...]
+        The messages of the user, in order.
+    replies : tuple[str, ...]
+        The reply of the engine to every message when it was generated.
+    phases : tuple[Phase, ...]
+        The phase the user was in when sending every message.
+    rejected : tuple[WorkflowError | None, ...]
+        The error of every invalid answer, None for the valid ones.
+    """
+
+    user_id: str
+    events: tuple[MessageEvent, ...]
+    replies: tuple[str, ...]
+    phases: tuple[Phase, ...]
+    rejected: tuple[WorkflowError | None, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class SimulationReport:
+    """
+    Throughput of `WorkflowEngine` replaying simulated conversations.
+
+    Parameters
+    ----------
+    users : int
+        Conversations replayed.
+    concurrency : int
+        Users answered concurrently.
+    messages : int
+        Messages processed.
+    elapsed : float
+        Wall seconds of the replay, scheduling of the users included.
+    engine_seconds : float
+        Seconds spent inside `process_message`.
+    phases : dict[str, int]
+        Messages per phase.
+    rejected : dict[str, int]
+        Invalid answers per `WorkflowError`.
+    diverged : int
+        Replies differing from those recorded when the conversations were
+        generated, e.g. after the workflow changed.
+
+    Functions
+    ---------
+    messages_per_second : float
+        Messages processed per wall second.
+    engine_messages_per_second : float
+        Messages processed per second spent in the engine.
+    """
+
+    users: int
+    concurrency: int
+    messages: int
+    elapsed: float
+    engine_seconds: float
+    phases: dict[str, int]
+    rejected: dict[str, int]
+    diverged: int
+
+    @property
+    def messages_per_second(self) -> float:
+        """Messages processed per wall second."""
+        return self.messages / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def engine_messages_per_second(self) -> float:
+        """Messages processed per second spent in the engine."""
+        return self.messages / self.engine_seconds if self.engine_seconds else 0.0
+
+
+@dataclass(frozen=True, slots=True)
+class AllocationProfile:
+    """
+    Memory allocated by `WorkflowEngine` per message, measured with tracemalloc.
+
+    Parameters
+    ----------
+    messages : int
+        Messages profiled.
+    peak_bytes : dict[str, float]
+        Mean bytes allocated at the peak of a message, per phase.
+    retained_bytes : float
+        Mean bytes still held after each message.
+    sites : tuple[tuple[str, float, float], ...]
+        The lines holding the most memory after the replay, with the bytes
+        and blocks per message.
+    """
+
+    messages: int
+    peak_bytes: dict[str, float]
+    retained_bytes: float
+    sites: tuple[tuple[str, float, float], ...]
+
+
+class ConversationSimulator:
+    """
+    Generates seeded conversations and replays them against a `WorkflowEngine`.
+
+    Every simulated user answers the question it is asked with the validator
+    of that question: a valid answer, or with probability `invalid_rate` an
+    invalid one (an unknown choice, a number out of range, a blank text, an
+    audio too short or a text instead of an audio). A conversation runs until
+    the user says goodbye, so it goes through every phase of the workflow.
+
+    Conversations are generated once, recording the replies of the engine,
+    so the replay only times the engine and can check it answers the same.
+
+    Parameters
+    ----------
+    engine : WorkflowEngine
+        The engine answering the simulated users.
+    seed : int | None
+        The seed given to `seed_everything`, each user draws its answers from
+        its own generator derived from it.
+    invalid_rate : float
+        Probability of an invalid answer to each question.
+    max_messages : int
+        Messages after which a conversation that never ends is cut.
+
+    Functions
+    ---------
+    answer : (np.random.Generator, Validator, str, int) -> MessageEvent
+        A random answer of a user to the question of `validator`.
+    generate : (int) -> SimulatedConversation
+        Generates the conversation of the `index`-th user.
+    generate_many : (int) -> list[SimulatedConversation]
+        Generates the conversations of `users` users.
+    replay : (Iterable[SimulatedConversation], int) -> SimulationReport
+        Replays conversations with `concurrency` users at a time.
+    profile : (Iterable[SimulatedConversation], int) -> AllocationProfile
+        Replays conversations one at a time under tracemalloc.
+    """
+
+    def __init__(
+        self,
+        engine: WorkflowEngine,
+        seed: int | None = None,
+        invalid_rate: float = 0.2,
+        max_messages: int = 100,
+    ) -> None:
+        if not 0 <= invalid_rate < 1:
+            msg = f"invalid_rate must be in [0, 1), got {invalid_rate}"
+            pylogger.error(msg)
+            raise ValueError(msg)
+
+        self.engine = engine
+        self.seed = seed_everything(seed)
+        self.invalid_rate = invalid_rate
+        self.max_messages = max_messages
+
+    def answer(
+        self, rng: np.random.Generator, validator: Validator, user_id: str, index: int
+    ) -> MessageEvent:
+        """
+        A random answer of a user to the question of `validator`.
+
+        Parameters
+        ----------
+        rng : np.random.Generator
+            The generator of the user.
+        validator : Validator
+            The validator of the question.
+        user_id : str
+            The identifier of the user.
+        index : int
+            The index of the message within the conversation.
+
+        Returns
+        -------
+        MessageEvent
+            The answer, invalid with probability `invalid_rate`.
+        """
+        message_id = f"{user_id}-{index}"
+        valid = rng.random() >= self.invalid_rate
+
+        def text(value: str) -> MessageEvent:
+            return MessageEvent(message_id, user_id, "text", text=value)
+
+        def audio(duration: float) -> MessageEvent:
+            return MessageEvent(
+                message_id,
+                user_id,
+                "audio",
+                media_id=f"audio-{message_id}",
+                duration=round(duration, 1),
+            )
+
+        def word() -> str:
+            return _WORDS[rng.integers(len(_WORDS))]
+
+        if isinstance(validator, ChoiceValidator):
+            if valid:
+                aliases = list(validator.verdicts)
+                alias = aliases[rng.integers(len(aliases))]
+                # Users type the choices in any case, with stray spaces
+                alias = (alias, alias.lower(), alias.title())[rng.integers(3)]
+                return text(f" {alias}" if rng.random() < 0.2 else alias)
+            answer = word()
+            return text(answer if answer.upper() not in validator.verdicts else "???")
+
+        if isinstance(validator, IntegerValidator):
+            if valid:
+                return text(str(rng.integers(validator.low, validator.high + 1)))
+            if rng.random() < 0.5:
+                return text(word())
+            return text(str(validator.high + 1 + rng.integers(10)))
+
+        if isinstance(validator, TextValidator):
+            if valid:
+                return text(word())
+            return text("  ") if rng.random() < 0.5 else audio(rng.uniform(1, 60))
+
+        if isinstance(validator, AudioValidator):
+            if valid:
+                return audio(validator.min_duration + rng.uniform(0, 60))
+            if validator.min_duration > 0 and rng.random() < 0.5:
+                return audio(rng.uniform(0, validator.min_duration))
+            return text(word())
+
+        # Anything is accepted, e.g. the goodbye of the conclusion
+        return text(word())
+
+    async def generate(self, index: int) -> SimulatedConversation:
+        """
+        Generates the conversation of the `index`-th user.
+
+        Parameters
+        ----------
+        index : int
+            The index of the user, the same index always gives the same
+            conversation for a given seed and workflow.
+
+        Returns
+        -------
+        SimulatedConversation
+            The conversation, with the replies of the engine.
+        """
+        rng = np.random.default_rng([self.seed, index])
+        user_id = f"sim-{index}"
+        state = ConversationState()
+        events: list[MessageEvent] = []
+        replies: list[str] = []
+        phases: list[Phase] = []
+        rejected: list[WorkflowError | None] = []
+        concluded = False
+
+        while len(events) < self.max_messages:
+            phase: Phase = state.phase  # type: ignore[assignment]
+            validator = self.engine.validator(state)
+            if validator is None:
+                msg = f"User {user_id} reached an unknown phase: {state}"
+                pylogger.error(msg)
+                raise ValueError(msg)
+
+            event = self.answer(rng, validator, user_id, len(events))
+            _, error = validator.validate(event)
+            state, reply = await self.engine.process_message(user_id, event, state)
+
+            events.append(event)
+            replies.append(reply)
+            phases.append(phase)
+            rejected.append(error)
+
+            concluded = concluded or phase == Phase.CONCLUSION
+            if concluded and state.phase == Phase.PRESENTATION:
+                break
+        else:
+            pylogger.warning(f"Conversation of {user_id} cut at {self.max_messages}")
+
+        return SimulatedConversation(
+            user_id, tuple(events), tuple(replies), tuple(phases), tuple(rejected)
+        )
+
+    async def generate_many(self, users: int) -> list[SimulatedConversation]:
+        """
+        Generates the conversations of `users` users.
+
+        Parameters
+        ----------
+        users : int
+            How many conversations to generate.
+
+        Returns
+        -------
+        list[SimulatedConversation]
+            The conversations, ordered by user.
+        """
+        return [await self.generate(index) for index in range(users)]
+
+    async def replay(
+        self, conversations: Iterable[SimulatedConversation], concurrency: int = 100
+    ) -> SimulationReport:
+        """
+        Replays conversations with `concurrency` users at a time.
+
+        Each user yields to the event loop after every message, so the
+        messages of concurrent users interleave as they would on a hook.
+
+        Parameters
+        ----------
+        conversations : Iterable[SimulatedConversation]
+            The conversations, each replayed from a fresh state.
+        concurrency : int
+            Users answered concurrently.
+
+        Returns
+        -------
+        SimulationReport
+            The throughput, and how many replies differ from the recorded ones.
+        """
+        conversations = list(conversations)
+        pending = iter(conversations)
+        process = self.engine.process_message
+        clock = time.perf_counter
+
+        async def user() -> tuple[float, int]:
+            spent, diverged = 0.0, 0
+            for conversation in pending:
+                state = ConversationState()
+                user_id = conversation.user_id
+                for event, expected in zip(
+                    conversation.events, conversation.replies, strict=True
+                ):
+                    start = clock()
+                    state, reply = await process(user_id, event, state)
+                    spent += clock() - start
+                    diverged += reply != expected
+                    await asyncio.sleep(0)
+            return spent, diverged
+
+        concurrency = max(1, min(concurrency, len(conversations)))
+        start = time.perf_counter()
+        results = await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+        phases: Counter[str] = Counter()
+        rejected: Counter[str] = Counter()
+        for conversation in conversations:
+            phases.update(phase.label for phase in conversation.phases)
+            rejected.update(error.name for error in conversation.rejected if error)
+
+        return SimulationReport(
+            len(conversations),
+            concurrency,
+            sum(len(conversation.events) for conversation in conversations),
+            elapsed,
+            sum(spent for spent, _ in results),
+            dict(phases),
+            dict(rejected),
+            sum(diverged for _, diverged in results),
+        )
+
+    async def profile(
+        self, conversations: Iterable[SimulatedConversation], top: int = 10
+    ) -> AllocationProfile:
+        """
+        Replays conversations one at a time under tracemalloc.
+
+        Parameters
+        ----------
+        conversations : Iterable[SimulatedConversation]
+            The conversations, each replayed from a fresh state.
+        top : int
+            How many lines holding memory to report.
+
+        Returns
+        -------
+        AllocationProfile
+            The memory allocated and held per message.
+        """
+        process = self.engine.process_message
+        peaks: Counter[str] = Counter()
+        counts: Counter[str] = Counter()
+        messages = 0
+
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            start_bytes = tracemalloc.get_traced_memory()[0]
+            for conversation in conversations:
+                state = ConversationState()
+                user_id = conversation.user_id
+                for event, phase in zip(
+                    conversation.events, conversation.phases, strict=True
+                ):
+                    current = tracemalloc.get_traced_memory()[0]
+                    tracemalloc.reset_peak()
+                    state, _ = await process(user_id, event, state)
+                    peaks[phase.label] += tracemalloc.get_traced_memory()[1] - current
+                    counts[phase.label] += 1
+                    messages += 1
+            retained = tracemalloc.get_traced_memory()[0] - start_bytes
+            after = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+
+        ignored = (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        )
+        stats = after.filter_traces(ignored).compare_to(
+            before.filter_traces(ignored), "lineno"
+        )
+        per_message = max(messages, 1)
+        return AllocationProfile(
+            messages,
+            {label: peaks[label] / counts[label] for label in counts},
+            retained / per_message,
+            tuple(
+                (
+                    str(stat.traceback[0]),
+                    stat.size_diff / per_message,
+                    stat.count_diff / per_message,
+                )
+                for stat in stats[:top]
+            ),
+        )
@@ -0,0 +1,760 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+from typing import Any
+from urllib.parse import urlparse
+
+from chatbot_template.utils.conversation import ConversationState
+from chatbot_template.utils.env import get_env
+
+pylogger = logging.getLogger(__name__)
+
+SQLITE_MAX_VARIABLES = 500
+
+# `DELETE ... RETURNING` appeared in SQLite 3.35
+_SQLITE_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Sets KEYS[1] to ARGV[2] (PX ARGV[3] if not empty) if it holds ARGV[1], or is
+# missing and ARGV[1] is empty. Returns 1 if the key was set.
+_REDIS_PUT_IF_UNCHANGED = """
+local current = redis.call('GET', KEYS[1])
+if (current or '') ~= ARGV[1] then
+    return 0
+end
+if ARGV[3] == '' then
+    redis.call('SET', KEYS[1], ARGV[2])
+else
+    redis.call('SET', KEYS[1], ARGV[2], 'PX', ARGV[3])
+end
+return 1
+"""
+
+
+def _dumps(state: ConversationState) -> bytes:
+    """Serializes a state for the persistent backends."""
+    return state.to_bytes()
+
+
+def _loads(raw: bytes) -> ConversationState:
+    """Deserializes a state stored by `_dumps`."""
+    return ConversationState.from_bytes(raw)
+
+
+@dataclass(frozen=True, slots=True)
+class Eviction:
+    """
+    A state removed by the store itself rather than deleted by the caller.
+
+    Parameters
+    ----------
+    user_id : str
+        The unique identifier of the user.
+    state : ConversationState
+        The last state of the user.
+    reason : str
+        "ttl" when the state expired, "capacity" when the store was full.
+    """
+
+    user_id: str
+    state: ConversationState
+    reason: str
+
+
+class StateStore(ABC):
+    """
+    Asynchronous key-value store holding the conversation state of each user.
+
+    Backends only need to implement the batched `get_many`, `put_many` and
+    `delete_many`; the single-key helpers are built on top of them. They also
+    keep the ids of the messages already processed, shared by every worker
+    using the store, in `seen_many` and `mark_seen`.
+
+    Parameters
+    ----------
+    ttl : float | None
+        Seconds a state lives after its last write. None keeps it forever.
+
+    Functions
+    ---------
+    get : (str) -> ConversationState | None
+        Retrieves the state of a user.
+    put : (str, ConversationState) -> None
+        Stores the state of a user.
+    delete : (str) -> None
+        Removes the state of a user.
+    get_many : (Iterable[str]) -> dict[str, ConversationState]
+        Retrieves the states of several users in one round trip.
+    put_many : (Mapping[str, ConversationState]) -> None
+        Stores the states of several users in one round trip.
+    delete_many : (Iterable[str]) -> None
+        Removes the states of several users in one round trip.
+    put_if_unchanged : (str, ConversationState | None, ConversationState) -> bool
+        Stores the state of a user only if nobody changed it since it was read.
+    seen_many : (Iterable[str]) -> set[str]
+        The message ids marked as processed and not expired.
+    mark_seen : (Iterable[str], float) -> None
+        Marks message ids as processed for some seconds.
+    sweep : (int) -> list[Eviction]
+        Removes a bounded number of expired states and returns the evictions.
+    count : () -> int | None
+        Number of states held, None if the backend cannot tell cheaply.
+    aclose : () -> None
+        Releases the resources held by the backend.
+    """
+
+    def __init__(self, ttl: float | None = None):
+        self.ttl = ttl
+
+    async def get(self, user_id: str) -> ConversationState | None:
+        """
+        Retrieves the state of a user.
+
+        Parameters
+        ----------
+        user_id : str
+            The unique identifier of the user.
+
+        Returns
+        -------
+        ConversationState | None
+            The stored state, None if the user has no live state.
+        """
+        return (await self.get_many([user_id])).get(user_id)
+
+    async def put(self, user_id: str, state: ConversationState) -> None:
+        """
+        Stores the state of a user.
+
+        Parameters
+        ----------
+        user_id : str
+            The unique identifier of the user.
+        state : ConversationState
+            The state to store.
+        """
+        await self.put_many({user_id: state})
+
+    async def delete(self, user_id: str) -> None:
+        """
+        Removes the state of a user.
+
+        Parameters
+        ----------
+        user_id : str
+            The unique identifier of the user.
+        """
+        await self.delete_many([user_id])
+
+    @abstractmethod
+    async def get_many(self, user_ids: Iterable[str]) -> dict[str, ConversationState]:
+        """Retrieves the live states of `user_ids`, missing users are omitted."""
+
+    @abstractmethod
+    async def put_many(self, states: Mapping[str, ConversationState]) -> None:
+        """Stores every `user_id -> state` of `states`."""
+
+    @abstractmethod
+    async def delete_many(self, user_ids: Iterable[str]) -> None:
+        """Removes the states of `user_ids`."""
+
+    async def put_if_unchanged(
+        self, user_id: str, expected: ConversationState | None, state: ConversationState
+    ) -> bool:
+        """
+        Stores the state of a user only if nobody changed it since it was read.
+
+        Lets several worker processes serve the same user without losing
+        updates: a worker whose write is rejected reads the state again and
+        redoes its work. This default is only atomic within a process, backends
+        shared between processes override it.
+
+        Parameters
+        ----------
+        user_id : str
+            The unique identifier of the user.
+        expected : ConversationState | None
+            The state as it was read, None if the user had no live state.
+        state : ConversationState
+            The state to store.
+
+        Returns
+        -------
+        bool
+            Whether the state was stored.
+        """
+        if await self.get(user_id) != expected:
+            return False
+        await self.put(user_id, state)
+        return True
+
+    @abstractmethod
+    async def seen_many(self, message_ids: Iterable[str]) -> set[str]:
+        """The ids of `message_ids` marked by `mark_seen` and not expired."""
+
+    @abstractmethod
+    async def mark_seen(self, message_ids: Iterable[str], ttl: float) -> None:
+        """Marks `message_ids` as processed for `ttl` seconds."""
+
+    async def sweep(self, limit: int = 1000) -> list[Eviction]:
+        """
+        Removes a bounded number of expired states and returns the evictions.
+
+        Called periodically by `StateSweeper` so expired states do not pile up.
+        This default suits backends expiring states by themselves: it removes
+        and reports nothing.
+
+        Parameters
+        ----------
+        limit : int
+            Maximum number of states removed. Default = 1000.
+
+        Returns
+        -------
+        list[Eviction]
+            The states removed since the last sweep, at most `limit`.
+        """
+        return []
+
+    async def count(self) -> int | None:
+        """
+        Number of states held.
+
+        Returns
+        -------
+        int | None
+            The number of live states, None if the backend cannot tell cheaply.
+        """
+        return None
+
+    async def aclose(self) -> None:  # noqa: B027
+        """Releases the resources held by the backend."""
+
+
+class MemoryStateStore(StateStore):
+    """
+    In-process store with per-entry TTL.
+
+    States are kept in write order, which reads leave alone: as the TTL runs
+    from the last write, that is also expiry order. Expired states are dropped
+    when read or swept, and the least recently written state once
+    `max_entries` are held. Both are kept as evictions until the
+    next `sweep`, up to `max_entries` of them.
+
+    Seen message ids are kept in marking order, which is also expiry order
+    when every id gets the same TTL, so expired ids are dropped from the front
+    in amortized O(1), as are the oldest ones once `max_seen` are tracked.
+
+    Parameters
+    ----------
+    max_entries : int
+        Least recently written users are dropped above this size.
+        Default = 100_000.
+    ttl : float | None
+        Seconds a state lives after its last write. None keeps it forever.
+    max_seen : int
+        Maximum number of seen message ids tracked. Default = 100_000.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 100_000,
+        ttl: float | None = None,
+        max_seen: int = 100_000,
+    ):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self.max_seen = max_seen
+        self._states: OrderedDict[str, tuple[float, ConversationState]] = OrderedDict()
+        self._evicted: deque[Eviction] = deque(maxlen=max_entries)
+        self._seen: OrderedDict[str, float] = OrderedDict()
+
+    def __len__(self) -> int:
+        """Number of states held, expired ones included until next accessed."""
+        return len(self._states)
+
+    async def get(self, user_id: str) -> ConversationState | None:
+        """Retrieves the state of a user without building a batch."""
+        item = self._states.get(user_id)
+        if item is None:
+            return None
+        if item[0] < time.monotonic():
+            del self._states[user_id]
+            self._evicted.append(Eviction(user_id, item[1], "ttl"))
+            return None
+        return item[1]
+
+    async def put(self, user_id: str, state: ConversationState) -> None:
+        """Stores the state of a user without building a batch."""
+        expires_at = time.monotonic() + self.ttl if self.ttl else float("inf")
+        self._states[user_id] = (expires_at, state)
+        self._states.move_to_end(user_id)
+        if len(self._states) > self.max_entries:
+            evicted, (_, last_state) = self._states.popitem(last=False)
+            self._evicted.append(Eviction(evicted, last_state, "capacity"))
+
+    async def get_many(self, user_ids: Iterable[str]) -> dict[str, ConversationState]:
+        """Retrieves the live states of `user_ids`, missing users are omitted."""
+        found: dict[str, ConversationState] = {}
+        for user_id in user_ids:
+            state = await self.get(user_id)
+            if state is not None:
+                found[user_id] = state
+        return found
+
+    async def put_many(self, states: Mapping[str, ConversationState]) -> None:
+        """Stores every `user_id -> state` of `states`."""
+        for user_id, state in states.items():
+            await self.put(user_id, state)
+
+    async def delete_many(self, user_ids: Iterable[str]) -> None:
+        """Removes the states of `user_ids`."""
+        for user_id in user_ids:
+            self._states.pop(user_id, None)
+
+    async def seen_many(self, message_ids: Iterable[str]) -> set[str]:
+        """The ids of `message_ids` marked by `mark_seen` and not expired."""
+        now = time.monotonic()
+        seen = self._seen
+        return {
+            message_id for message_id in message_ids if seen.get(message_id, now) > now
+        }
+
+    async def mark_seen(self, message_ids: Iterable[str], ttl: float) -> None:
+        """Marks `message_ids` as processed for `ttl` seconds."""
+        now = time.monotonic()
+        seen = self._seen
+        for message_id in message_ids:
+            seen[message_id] = now + ttl
+            seen.move_to_end(message_id)
+        while seen and (len(seen) > self.max_seen or next(iter(seen.values())) <= now):
+            seen.popitem(last=False)
+
+    async def sweep(self, limit: int = 1000) -> list[Eviction]:
+        """
+        Removes a bounded number of expired states and returns the evictions.
+
+        Users are scanned from the least recently written and the scan stops
+        at the first live state: as the TTL runs from the last write, the
+        order of the writes is also the order of expiry, so each sweep costs
+        O(limit) however many users are held.
+
+        Parameters
+        ----------
+        limit : int
+            Maximum number of evictions returned. Default = 1000.
+
+        Returns
+        -------
+        list[Eviction]
+            The evictions since the last sweep, capacity ones included.
+        """
+        evicted = self._evicted
+        swept = [evicted.popleft() for _ in range(min(limit, len(evicted)))]
+        now = time.monotonic()
+        states = self._states
+        while len(swept) < limit and states:
+            user_id, (expires_at, state) = next(iter(states.items()))
+            if expires_at >= now:
+                break
+            del states[user_id]
+            swept.append(Eviction(user_id, state, "ttl"))
+        return swept
+
+    async def count(self) -> int | None:
+        """Number of states held, expired ones included until swept."""
+        return len(self._states)
+
+
+class SQLiteStateStore(StateStore):
+    """
+    Single-node persistent store on a SQLite database in WAL mode.
+
+    Queries run in a worker thread so they never block the event loop, and
+    every worker process on the node can open the same file.
+
+    Needs SQLite 3.24 or later for the upserts of `put_if_unchanged`. Before
+    3.35, which added `DELETE ... RETURNING`, `sweep` selects the expired rows
+    and deletes them in a single write transaction instead.
+
+    Parameters
+    ----------
+    path : str
+        Path to the SQLite database, created if missing.
+    ttl : float | None
+        Seconds a state lives after its last write. None keeps it forever.
+    """
+
+    def __init__(self, path: str, ttl: float | None = None):
+        super().__init__(ttl)
+        if sqlite3.sqlite_version_info < (3, 24, 0):
+            message = (
+                f"SQLiteStateStore needs SQLite 3.24 or later, "
+                f"found {sqlite3.sqlite_version}"
+            )
+            pylogger.error(message)
+            raise RuntimeError(message)
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS user_states ("
+            "user_id TEXT PRIMARY KEY, state BLOB NOT NULL, expires_at REAL)"
+        )
+        # Lets `sweep` find the expired rows without scanning the table
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS user_states_expires_at "
+            "ON user_states (expires_at) WHERE expires_at IS NOT NULL"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS seen_messages ("
+            "message_id TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS seen_messages_expires_at "
+            "ON seen_messages (expires_at)"
+        )
+
+    def _get_many(self, user_ids: list[str]) -> dict[str, ConversationState]:
+        found: dict[str, ConversationState] = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(user_ids), SQLITE_MAX_VARIABLES):
+                chunk = user_ids[start : start + SQLITE_MAX_VARIABLES]
+                rows = self._connection.execute(
+                    "SELECT user_id, state FROM user_states WHERE user_id IN "
+                    f"({','.join('?' * len(chunk))}) "
+                    "AND (expires_at IS NULL OR expires_at >= ?)",
+                    (*chunk, now),
+                )
+                for user_id, raw in rows:
+                    found[user_id] = _loads(raw)
+        return found
+
+    def _put_many(self, states: Mapping[str, ConversationState]) -> None:
+        expires_at = time.time() + self.ttl if self.ttl else None
+        rows = [
+            (user_id, _dumps(state), expires_at) for user_id, state in states.items()
+        ]
+        with self._lock:
+            self._connection.execute("BEGIN")
+            try:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO user_states VALUES (?, ?, ?)", rows
+                )
+                self._connection.execute("COMMIT")
+            except sqlite3.Error:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def _delete_many(self, user_ids: list[str]) -> None:
+        with self._lock:
+            self._connection.executemany(
+                "DELETE FROM user_states WHERE user_id = ?",
+                [(user_id,) for user_id in user_ids],
+            )
+
+    def _put_if_unchanged(
+        self, user_id: str, expected: ConversationState | None, state: ConversationState
+    ) -> bool:
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl else None
+        with self._lock:
+            if expected is None:
+                # Only replaces a state that has expired
+                cursor = self._connection.execute(
+                    "INSERT INTO user_states VALUES (?, ?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET "
+                    "state = excluded.state, expires_at = excluded.expires_at "
+                    "WHERE expires_at IS NOT NULL AND expires_at < ?",
+                    (user_id, _dumps(state), expires_at, now),
+                )
+            else:
+                # States are stored as `_dumps` bytes, equal states have equal bytes
+                cursor = self._connection.execute(
+                    "UPDATE user_states SET state = ?, expires_at = ? "
+                    "WHERE user_id = ? AND state = ? "
+                    "AND (expires_at IS NULL OR expires_at >= ?)",
+                    (_dumps(state), expires_at, user_id, _dumps(expected), now),
+                )
+        return cursor.rowcount == 1
+
+    def _seen_many(self, message_ids: list[str]) -> set[str]:
+        seen: set[str] = set()
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(message_ids), SQLITE_MAX_VARIABLES):
+                chunk = message_ids[start : start + SQLITE_MAX_VARIABLES]
+                rows = self._connection.execute(
+                    "SELECT message_id FROM seen_messages WHERE message_id IN "
+                    f"({','.join('?' * len(chunk))}) AND expires_at >= ?",
+                    (*chunk, now),
+                )
+                seen.update(message_id for (message_id,) in rows)
+        return seen
+
+    def _mark_seen(self, message_ids: list[str], ttl: float) -> None:
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO seen_messages VALUES (?, ?)",
+                [(message_id, expires_at) for message_id in message_ids],
+            )
+
+    def _sweep(self, limit: int) -> list[Eviction]:
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM seen_messages WHERE message_id IN ("
+                "SELECT message_id FROM seen_messages WHERE expires_at < ? LIMIT ?)",
+                (time.time(), limit),
+            )
+            if _SQLITE_RETURNING:
+                rows = self._connection.execute(
+                    "DELETE FROM user_states WHERE user_id IN ("
+                    "SELECT user_id FROM user_states "
+                    "WHERE expires_at IS NOT NULL AND expires_at < ? LIMIT ?) "
+                    "RETURNING user_id, state",
+                    (time.time(), limit),
+                ).fetchall()
+            else:
+                rows = self._select_and_delete_expired(limit)
+        return [Eviction(user_id, _loads(raw), "ttl") for user_id, raw in rows]
+
+    def _select_and_delete_expired(self, limit: int) -> list[tuple[str, bytes]]:
+        # The write lock is taken first, so no other worker reports the rows
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self._connection.execute(
+                "SELECT user_id, state FROM user_states "
+                "WHERE expires_at IS NOT NULL AND expires_at < ? LIMIT ?",
+                (time.time(), limit),
+            ).fetchall()
+            self._connection.executemany(
+                "DELETE FROM user_states WHERE user_id = ? AND state = ?", rows
+            )
+            self._connection.execute("COMMIT")
+        except sqlite3.Error:
+            self._connection.execute("ROLLBACK")
+            raise
+        return rows
+
+    def _count(self) -> int:
+        with self._lock:
+            # The total walks the primary key index, the expired rows, few once
+            # swept, are found through the partial index on expires_at
+            (count,) = self._connection.execute(
+                "SELECT (SELECT COUNT(*) FROM user_states) - (SELECT COUNT(*) "
+                "FROM user_states WHERE expires_at IS NOT NULL AND expires_at < ?)",
+                (time.time(),),
+            ).fetchone()
+        return count
+
+    async def get_many(self, user_ids: Iterable[str]) -> dict[str, ConversationState]:
+        """Retrieves the live states of `user_ids`, missing users are omitted."""
+        return await asyncio.to_thread(self._get_many, list(user_ids))
+
+    async def put_many(self, states: Mapping[str, ConversationState]) -> None:
+        """Stores every `user_id -> state` of `states`."""
+        await asyncio.to_thread(self._put_many, dict(states))
+
+    async def delete_many(self, user_ids: Iterable[str]) -> None:
+        """Removes the states of `user_ids`."""
+        await asyncio.to_thread(self._delete_many, list(user_ids))
+
+    async def put_if_unchanged(
+        self, user_id: str, expected: ConversationState | None, state: ConversationState
+    ) -> bool:
+        """Stores the state of a user only if its row still holds `expected`."""
+        return await asyncio.to_thread(self._put_if_unchanged, user_id, expected, state)
+
+    async def seen_many(self, message_ids: Iterable[str]) -> set[str]:
+        """The ids of `message_ids` marked by `mark_seen` and not expired."""
+        return await asyncio.to_thread(self._seen_many, list(message_ids))
+
+    async def mark_seen(self, message_ids: Iterable[str], ttl: float) -> None:
+        """Marks `message_ids` as processed for `ttl` seconds."""
+        await asyncio.to_thread(self._mark_seen, list(message_ids), ttl)
+
+    async def sweep(self, limit: int = 1000) -> list[Eviction]:
+        """
+        Deletes up to `limit` expired rows and returns them as evictions.
+
+        Rows are found through an index on `expires_at` and deleted by a single
+        statement, so each expired row is reported by exactly one worker.
+        Expired rows overwritten by a new conversation before being swept are
+        not reported. Up to `limit` expired seen message ids are deleted too.
+
+        Parameters
+        ----------
+        limit : int
+            Maximum number of rows deleted. Default = 1000.
+
+        Returns
+        -------
+        list[Eviction]
+            The deleted states.
+        """
+        return await asyncio.to_thread(self._sweep, limit)
+
+    async def count(self) -> int | None:
+        """Number of live rows."""
+        return await asyncio.to_thread(self._count)
+
+    async def aclose(self) -> None:
+        """Closes the database connection."""
+        with self._lock:
+            self._connection.close()
+
+
+class RedisStateStore(StateStore):
+    """
+    Multi-node store on any server speaking the Redis protocol.
+
+    Requires the optional `redis` package. The server expires the keys
+    itself, so `sweep` reports no eviction.
+
+    Parameters
+    ----------
+    url : str
+        The server URL, e.g. `redis://localhost:6379/0`.
+    ttl : float | None
+        Seconds a state lives after its last write. None keeps it forever.
+    prefix : str
+        Prefix of the keys of the states. Default = "user_state:".
+    seen_prefix : str
+        Prefix of the keys of the seen message ids. Default = "seen_message:".
+    """
+
+    def __init__(
+        self,
+        url: str,
+        ttl: float | None = None,
+        prefix: str = "user_state:",
+        seen_prefix: str = "seen_message:",
+    ):
+        super().__init__(ttl)
+        try:
+            import redis.asyncio as redis
+        except ImportError as error:
+            message = "The `redis` package is needed to use RedisStateStore."
+            pylogger.error(message)
+            raise ImportError(message) from error
+
+        self.prefix = prefix
+        self.seen_prefix = seen_prefix
+        self._redis: Any = redis.from_url(url)
+
+    async def get_many(self, user_ids: Iterable[str]) -> dict[str, ConversationState]:
+        """Retrieves the live states of `user_ids`, missing users are omitted."""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        raws = await self._redis.mget([self.prefix + user_id for user_id in user_ids])
+        return {
+            user_id: _loads(raw)
+            for user_id, raw in zip(user_ids, raws, strict=True)
+            if raw is not None
+        }
+
+    async def put_many(self, states: Mapping[str, ConversationState]) -> None:
+        """Stores every `user_id -> state` of `states`."""
+        px = int(self.ttl * 1000) if self.ttl else None
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for user_id, state in states.items():
+                pipe.set(self.prefix + user_id, _dumps(state), px=px)
+            await pipe.execute()
+
+    async def delete_many(self, user_ids: Iterable[str]) -> None:
+        """Removes the states of `user_ids`."""
+        keys = [self.prefix + user_id for user_id in user_ids]
+        if keys:
+            await self._redis.delete(*keys)
+
+    async def put_if_unchanged(
+        self, user_id: str, expected: ConversationState | None, state: ConversationState
+    ) -> bool:
+        """Stores the state of a user only if its key still holds `expected`."""
+        px = str(int(self.ttl * 1000)) if self.ttl else ""
+        stored = await self._redis.eval(
+            _REDIS_PUT_IF_UNCHANGED,
+            1,
+            self.prefix + user_id,
+            "" if expected is None else _dumps(expected),
+            _dumps(state),
+            px,
+        )
+        return bool(stored)
+
+    async def seen_many(self, message_ids: Iterable[str]) -> set[str]:
+        """The ids of `message_ids` marked by `mark_seen` and not expired."""
+        message_ids = list(message_ids)
+        if not message_ids:
+            return set()
+        marks = await self._redis.mget(
+            [self.seen_prefix + message_id for message_id in message_ids]
+        )
+        return {
+            message_id
+            for message_id, mark in zip(message_ids, marks, strict=True)
+            if mark is not None
+        }
+
+    async def mark_seen(self, message_ids: Iterable[str], ttl: float) -> None:
+        """Marks `message_ids` as processed for `ttl` seconds."""
+        px = max(1, int(ttl * 1000))
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for message_id in message_ids:
+                pipe.set(self.seen_prefix + message_id, b"1", px=px)
+            await pipe.execute()
+
+    async def aclose(self) -> None:
+        """Closes the connections to the server."""
+        await self._redis.aclose()
+
+
+def state_store_from_env() -> StateStore:
+    """
+    Builds the state store configured by the environment.
+
+    `STATE_STORE_URL` selects the backend: `memory://` (default),
+    `sqlite:///path/to/states.db` or `redis://host:port/db`.
+    `STATE_STORE_TTL` sets the TTL in seconds, and `STATE_STORE_MAX_ENTRIES`
+    and `DEDUP_MAX_ENTRIES` the number of states and of seen message ids held
+    by the in-memory backend.
+
+    Returns
+    -------
+    StateStore
+        The configured backend.
+
+    Raises
+    ------
+    ValueError
+        If the URL scheme is not supported.
+    """
+    url = get_env("STATE_STORE_URL", "memory://")
+    ttl_env = get_env("STATE_STORE_TTL", "0")
+    ttl = float(ttl_env) if float(ttl_env) > 0 else None
+    scheme = urlparse(url).scheme
+
+    if scheme == "memory":
+        max_entries = int(get_env("STATE_STORE_MAX_ENTRIES", "100000"))
+        max_seen = int(get_env("DEDUP_MAX_ENTRIES", "100000"))
+        return MemoryStateStore(max_entries=max_entries, ttl=ttl, max_seen=max_seen)
+    if scheme == "sqlite":
+        return SQLiteStateStore(url.removeprefix("sqlite:///"), ttl=ttl)
+    if scheme in ("redis", "rediss"):
+        return RedisStateStore(url, ttl=ttl)
+
+    message = f"Unsupported STATE_STORE_URL scheme: {scheme!r}"
+    pylogger.error(message)
+    raise ValueError(message)
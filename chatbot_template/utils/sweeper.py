@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager, suppress
+from typing import Any
+
+from chatbot_template.utils.env import get_env
+from chatbot_template.utils.local_saver import ResponseJournal
+from chatbot_template.utils.metrics import evicted_sessions, live_sessions
+from chatbot_template.utils.state_store import Eviction, StateStore
+
+pylogger = logging.getLogger(__name__)
+
+EvictionHook = Callable[[list[Eviction]], Awaitable[None]]
+
+# Series bound once, a sweep only adds to them
+_EVICTION_COUNTERS = {
+    reason: evicted_sessions.labels(reason) for reason in ("ttl", "capacity")
+}
+
+
+def journal_evictions(journal: ResponseJournal) -> EvictionHook:
+    """
+    Eviction hook appending the last state of every evicted user to a journal.
+
+    Parameters
+    ----------
+    journal : ResponseJournal
+        The journal receiving one record per eviction.
+
+    Returns
+    -------
+    EvictionHook
+        The hook, to be given to `StateSweeper.add_hook`.
+    """
+
+    async def hook(evictions: list[Eviction]) -> None:
+        evicted_at = time.time()
+        for eviction in evictions:
+            state = eviction.state
+            journal.write(
+                {
+                    "user_id": eviction.user_id,
+                    "lang": state.lang,
+                    "phase": None if state.phase is None else state.phase.label,
+                    "step": state.step,
+                    "reason": eviction.reason,
+                    "evicted_at": evicted_at,
+                }
+            )
+
+    return hook
+
+
+class StateSweeper:
+    """
+    Background task removing idle conversations from a state store.
+
+    Every `interval` seconds, up to `batch` expired states are removed with
+    `StateStore.sweep`, so a tick does bounded work however many users are
+    held. The evictions are counted in `chatbot_evicted_sessions_total` and
+    given to the hooks, e.g. to persist the abandoned conversations, and
+    `chatbot_live_sessions` is updated with the states left.
+
+    States only expire when the store has a TTL (`STATE_STORE_TTL`), while
+    the in-memory store also evicts its least recently written states
+    above its capacity.
+
+    Parameters
+    ----------
+    store : StateStore
+        The store to sweep.
+    interval : float | None
+        Seconds between sweeps, None disables the task. Default = 1.
+    batch : int
+        Maximum number of states removed per sweep. Default = 1000.
+    journal : ResponseJournal | None
+        Journal receiving the last state of every evicted user, run by the
+        lifespan of the sweeper. Default = None.
+
+    Functions
+    ---------
+    from_env : (StateStore) -> StateSweeper
+        Builds the sweeper from the `STATE_SWEEP_*` environment variables.
+    add_hook : (EvictionHook) -> None
+        Registers a coroutine called with the evictions of every sweep.
+    sweep : () -> int
+        Runs a single sweep, returning the number of evictions.
+    run : () -> None
+        Sweeps every `interval` seconds until cancelled.
+    lifespan : (FastAPI) -> AsyncIterator[None]
+        FastAPI lifespan sweeping in the background.
+    """
+
+    def __init__(
+        self,
+        store: StateStore,
+        interval: float | None = 1.0,
+        batch: int = 1000,
+        journal: ResponseJournal | None = None,
+    ):
+        self.store = store
+        self.interval = interval
+        self.batch = batch
+        self.journal = journal
+        self._hooks: list[EvictionHook] = []
+        if journal is not None:
+            self.add_hook(journal_evictions(journal))
+
+    @classmethod
+    def from_env(cls, store: StateStore) -> "StateSweeper":
+        """
+        Builds the sweeper from the environment.
+
+        `STATE_SWEEP_INTERVAL` sets the seconds between sweeps (0 disables
+        them) and `STATE_SWEEP_BATCH` the states removed per sweep. When
+        `STATE_EVICTION_FOLDER` is set, evicted states are journaled there.
+
+        Parameters
+        ----------
+        store : StateStore
+            The store to sweep.
+
+        Returns
+        -------
+        StateSweeper
+            The configured sweeper.
+        """
+        interval = float(get_env("STATE_SWEEP_INTERVAL", "1"))
+        folder = get_env("STATE_EVICTION_FOLDER", "")
+        return cls(
+            store,
+            interval=interval if interval > 0 else None,
+            batch=int(get_env("STATE_SWEEP_BATCH", "1000")),
+            journal=ResponseJournal(folder, prefix="evicted") if folder else None,
+        )
+
+    def add_hook(self, hook: EvictionHook) -> None:
+        """
+        Registers a coroutine called with the evictions of every sweep.
+
+        Parameters
+        ----------
+        hook : EvictionHook
+            Coroutine function receiving the list of evictions, only called
+            when there is at least one.
+        """
+        self._hooks.append(hook)
+
+    async def sweep(self) -> int:
+        """
+        Runs a single sweep.
+
+        A failing hook is logged without stopping the others.
+
+        Returns
+        -------
+        int
+            The number of evictions.
+        """
+        evictions = await self.store.sweep(self.batch)
+        for eviction in evictions:
+            _EVICTION_COUNTERS[eviction.reason].inc()
+        if evictions:
+            for hook in self._hooks:
+                try:
+                    await hook(evictions)
+                except Exception:
+                    pylogger.exception(f"Eviction hook {hook!r} failed")
+
+        live = await self.store.count()
+        if live is not None:
+            live_sessions.set(live)
+        return len(evictions)
+
+    async def run(self) -> None:
+        """Sweeps every `interval` seconds until cancelled."""
+        interval = self.interval or 1.0
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sweep()
+            except Exception:
+                pylogger.exception("State sweep failed")
+
+    @asynccontextmanager
+    async def lifespan(self, app: Any) -> AsyncIterator[None]:
+        """
+        FastAPI lifespan running `run` and the journal in the background.
+
+        Nothing is started when `interval` is None.
+
+        Parameters
+        ----------
+        app : FastAPI
+            The application being served.
+        """
+        if self.interval is None:
+            yield
+            return
+
+        if self.journal is not None:
+            self.journal.start()
+        task = asyncio.create_task(self.run())
+        try:
+            yield
+        finally:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+            if self.journal is not None:
+                await self.journal.aclose()
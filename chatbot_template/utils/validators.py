@@ -0,0 +1,376 @@
+import logging
+import unicodedata
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from chatbot_template.utils.enums import AnswerType, Phase, WorkflowError
+from chatbot_template.utils.events import MessageEvent
+
+pylogger = logging.getLogger(__name__)
+
+# (Normalized answer, None) when accepted, (None, error to reply) otherwise
+Verdict = tuple[str | None, WorkflowError | None]
+
+LANGUAGE_ALIASES: dict[str, str] = {
+    "ES": "es",
+    "CAST": "es",
+    "CASTELLANO": "es",
+    "ESPAÑOL": "es",
+    "ESP": "es",
+    "CAT": "ca",
+    "CATALAN": "ca",
+    "CATALÀ": "ca",
+}
+
+YES_NO_ALIASES: dict[str, str] = {
+    "SI": "yes",
+    "SÍ": "yes",
+    "S": "yes",
+    "YES": "yes",
+    "Y": "yes",
+    "OK": "yes",
+    "VALE": "yes",
+    "D'ACORD": "yes",
+    "NO": "no",
+    "N": "no",
+}
+
+MIN_AUDIO_DURATION: int = 20
+
+# Integer ranges up to this size are answered from a table instead of `int`
+_MAX_TABLE_SIZE = 1024
+
+
+@dataclass(frozen=True, slots=True)
+class Validator(ABC):
+    """
+    Checks the answers to a question of the workflow.
+
+    Validators are built once when the workflow is loaded, with their alias
+    tables normalized and their verdicts allocated, so validating a message
+    is a lookup.
+
+    Parameters
+    ----------
+    rejected : Verdict
+        The verdict of an invalid answer, `(None, error)`.
+
+    Functions
+    ---------
+    validate : (MessageEvent) -> Verdict
+        Checks an answer, returning its normalized value or the error.
+    validate_many : (Iterable[MessageEvent]) -> list[Verdict]
+        Checks several answers to the question.
+    """
+
+    rejected: Verdict
+
+    @abstractmethod
+    def validate(self, event: MessageEvent) -> Verdict:
+        """
+        Checks an answer, returning its normalized value or the error.
+
+        Parameters
+        ----------
+        event : MessageEvent
+            The answer of the user.
+
+        Returns
+        -------
+        Verdict
+            `(value, None)` if the answer is valid, `(None, error)` otherwise.
+        """
+
+    def validate_many(self, events: Iterable[MessageEvent]) -> list[Verdict]:
+        """
+        Checks several answers to the question, e.g. when replaying a batch.
+
+        Parameters
+        ----------
+        events : Iterable[MessageEvent]
+            The answers.
+
+        Returns
+        -------
+        list[Verdict]
+            The verdict of every answer, in order.
+        """
+        validate = self.validate
+        return [validate(event) for event in events]
+
+
+@dataclass(frozen=True, slots=True)
+class ChoiceValidator(Validator):
+    """
+    Accepts a text among a set of choices, case and spaces ignored.
+
+    Parameters
+    ----------
+    verdicts : dict[str, Verdict]
+        The verdict of every upper case alias, e.g. `{"CAT": ("ca", None)}`.
+    """
+
+    verdicts: dict[str, Verdict]
+
+    def validate(self, event: MessageEvent) -> Verdict:
+        """Looks the answer up in the aliases of the choices."""
+        if event.text is None:
+            return self.rejected
+        return self.verdicts.get(event.text.strip().upper(), self.rejected)
+
+
+@dataclass(frozen=True, slots=True)
+class IntegerValidator(Validator):
+    """
+    Accepts an integer within `[low, high]`.
+
+    Parameters
+    ----------
+    low : int
+        The smallest accepted value.
+    high : int
+        The largest accepted value.
+    verdicts : dict[str, Verdict] | None
+        The verdict of every accepted value written as `str(n)`, None when
+        the range is too large for a table. Other answers made of decimal
+        digits, such as "03" or "٣", are parsed; full-width digits, signs
+        other than a minus below zero and underscores are rejected.
+    """
+
+    low: int
+    high: int
+    verdicts: dict[str, Verdict] | None
+
+    def validate(self, event: MessageEvent) -> Verdict:
+        """Looks the answer up in the accepted values, or parses it."""
+        if event.text is None:
+            return self.rejected
+        text = event.text.strip()
+        if self.verdicts is not None:
+            verdict = self.verdicts.get(text)
+            if verdict is not None:
+                return verdict
+        digits = text[1:] if self.low < 0 and text.startswith("-") else text
+        # Digits a user types, not what int() also parses ("+4", "1_0", "４")
+        if not digits.isdecimal() or not unicodedata.is_normalized("NFKC", digits):
+            return self.rejected
+        number = int(text)
+        return (str(number), None) if self.low <= number <= self.high else self.rejected
+
+
+@dataclass(frozen=True, slots=True)
+class TextValidator(Validator):
+    """Accepts any non-blank text, stripped."""
+
+    def validate(self, event: MessageEvent) -> Verdict:
+        """Accepts the answer if it has text."""
+        text = event.text.strip() if event.text is not None else ""
+        return (text, None) if text else self.rejected
+
+
+@dataclass(frozen=True, slots=True)
+class AudioValidator(Validator):
+    """
+    Accepts an audio lasting at least `min_duration` seconds.
+
+    The duration checked is the one declared by the platform. WhatsApp does
+    not declare any, so its audios are accepted here and their duration is
+    checked once measured from the downloaded file by the hook.
+
+    Parameters
+    ----------
+    min_duration : float
+        The shortest accepted duration.
+    too_short : Verdict
+        The verdict of a shorter audio.
+    """
+
+    min_duration: float
+    too_short: Verdict
+
+    def validate(self, event: MessageEvent) -> Verdict:
+        """Accepts the media id of a long enough audio."""
+        if event.type != "audio":
+            return self.rejected
+        if event.duration is not None and event.duration < self.min_duration:
+            return self.too_short
+        return event.media_id or "", None
+
+
+@dataclass(frozen=True, slots=True)
+class AnyValidator(Validator):
+    """Accepts any message, e.g. the goodbye of the conclusion."""
+
+    def validate(self, event: MessageEvent) -> Verdict:
+        """Accepts the answer as it is."""
+        return event.text or event.media_id or "", None
+
+
+def choices_validator(aliases: dict[str, str], error: WorkflowError) -> ChoiceValidator:
+    """
+    Builds a validator of choices from their aliases.
+
+    Parameters
+    ----------
+    aliases : dict[str, str]
+        The value of every alias, normalized here to upper case.
+    error : WorkflowError
+        The error replied to any other answer.
+
+    Returns
+    -------
+    ChoiceValidator
+        The validator.
+    """
+    return ChoiceValidator(
+        (None, error),
+        {
+            str(alias).strip().upper(): (str(value), None)
+            for alias, value in aliases.items()
+        },
+    )
+
+
+def integer_validator(low: int, high: int, error: WorkflowError) -> IntegerValidator:
+    """
+    Builds a validator of integers within `[low, high]`.
+
+    Parameters
+    ----------
+    low : int
+        The smallest accepted value.
+    high : int
+        The largest accepted value.
+    error : WorkflowError
+        The error replied to any other answer.
+
+    Returns
+    -------
+    IntegerValidator
+        The validator, answering from a table when the range is small.
+    """
+    verdicts: dict[str, Verdict] | None = None
+    if high - low < _MAX_TABLE_SIZE:
+        verdicts = {str(n): (str(n), None) for n in range(low, high + 1)}
+    return IntegerValidator((None, error), low, high, verdicts)
+
+
+# Validators of the questions that declare no `answer`, the former behaviour
+DEFAULT_VALIDATORS: dict[Phase, Validator] = {
+    Phase.PRESENTATION: choices_validator(
+        LANGUAGE_ALIASES, WorkflowError.LANG_NOT_SUPPORTED
+    ),
+    Phase.FORMULAIRES: integer_validator(0, 4, WorkflowError.INVALID_NUMBER),
+    Phase.AUDIO_QUESTIONS: AudioValidator(
+        (None, WorkflowError.NOT_AUDIO),
+        MIN_AUDIO_DURATION,
+        (None, WorkflowError.AUDIO_TOO_SHORT),
+    ),
+    Phase.CONCLUSION: AnyValidator((None, WorkflowError.UNKNOWN_STATE)),
+}
+
+# The errors replied by default to each type of answer
+_DEFAULT_ERRORS: dict[AnswerType, WorkflowError] = {
+    AnswerType.CHOICE: WorkflowError.ANSWER_NON_EXITENT,
+    AnswerType.INTEGER: WorkflowError.INVALID_NUMBER,
+    AnswerType.YES_NO: WorkflowError.LOGIN_ERROR,
+    AnswerType.TEXT: WorkflowError.ANSWER_NON_EXITENT,
+    AnswerType.AUDIO: WorkflowError.NOT_AUDIO,
+}
+
+
+def _invalid_spec(spec: object, reason: str) -> ValueError:
+    message = f"Invalid answer {spec}: {reason}"
+    pylogger.error(message)
+    return ValueError(message)
+
+
+def compile_validator(spec: dict | None, phase: Phase) -> Validator:
+    """
+    Builds the validator of a question from the `answer` it declares.
+
+    The `answer` of a question in the workflow YAML gives its `type` and the
+    settings of that type, with an optional `error` naming the
+    `WorkflowError` replied to an invalid answer:
+
+    - `choice`: `choices`, a list of values or a mapping of each value to
+      its aliases.
+    - `integer`: the accepted range, `min` and `max`.
+    - `yes_no`: answered "yes" or "no", in Spanish, Catalan or English.
+    - `text`: any non-blank text.
+    - `audio`: `min_duration` in seconds, 20 by default.
+
+    Parameters
+    ----------
+    spec : dict | None
+        The `answer` of the question, None for the default of its phase.
+        Anything else than a mapping is rejected.
+    phase : Phase
+        The phase of the question.
+
+    Returns
+    -------
+    Validator
+        The validator of the answers.
+
+    Raises
+    ------
+    ValueError
+        If the `answer` has an unknown type or error, or invalid settings.
+    """
+    if spec is None:
+        return DEFAULT_VALIDATORS[phase]
+    if not isinstance(spec, dict):
+        raise _invalid_spec(spec, "expected a mapping with a type")
+
+    try:
+        kind = AnswerType(str(spec.get("type")))
+    except ValueError:
+        raise _invalid_spec(spec, "unknown type") from None
+    try:
+        error = WorkflowError[spec["error"]] if "error" in spec else None
+    except KeyError:
+        raise _invalid_spec(spec, "unknown error") from None
+    error = error or _DEFAULT_ERRORS[kind]
+
+    if kind is AnswerType.CHOICE:
+        choices = spec.get("choices")
+        if isinstance(choices, list) and choices:
+            aliases = {choice: choice for choice in choices}
+        elif isinstance(choices, dict) and choices:
+            aliases = {value: value for value in choices}
+            for value, names in choices.items():
+                aliases.update({name: value for name in names or []})
+        else:
+            raise _invalid_spec(spec, "choices must be a list or a mapping")
+        return choices_validator(aliases, error)
+
+    if kind is AnswerType.INTEGER:
+        low, high = spec.get("min", 0), spec.get("max")
+        if (
+            not isinstance(low, int)
+            or not isinstance(high, int)
+            or isinstance(low, bool)
+            or isinstance(high, bool)
+            or low > high
+        ):
+            raise _invalid_spec(spec, "min and max must be integers, min <= max")
+        return integer_validator(low, high, error)
+
+    if kind is AnswerType.YES_NO:
+        return choices_validator(YES_NO_ALIASES, error)
+
+    if kind is AnswerType.TEXT:
+        return TextValidator((None, error))
+
+    min_duration = spec.get("min_duration", MIN_AUDIO_DURATION)
+    if (
+        not isinstance(min_duration, int | float)
+        or isinstance(min_duration, bool)
+        or min_duration < 0
+    ):
+        raise _invalid_spec(spec, "min_duration must be a non-negative number")
+    return AudioValidator(
+        (None, error), min_duration, (None, WorkflowError.AUDIO_TOO_SHORT)
+    )
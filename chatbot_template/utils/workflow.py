@@ -1,17 +1,250 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from collections.abc import AsyncIterator, Callable, Iterable
+from contextlib import asynccontextmanager, suppress
+from dataclasses import dataclass
+from typing import Any
+
 import yaml
 
-from chatbot_template.utils.enums import WorkflowError
+from chatbot_template.utils.catalog import FALLBACK_LANG, MessageCatalog, prompt_of
+from chatbot_template.utils.conversation import ConversationState
+from chatbot_template.utils.enums import Phase, WorkflowError
+from chatbot_template.utils.events import MessageEvent
+from chatbot_template.utils.metrics import messages_by_phase, workflow_errors
+from chatbot_template.utils.validators import (
+    DEFAULT_VALIDATORS,
+    LANGUAGE_ALIASES,
+    Validator,
+    Verdict,
+    compile_validator,
+)
+
+pylogger = logging.getLogger(__name__)
+
+# The libyaml parser is an order of magnitude faster when PyYAML was built with it.
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Names of the phases in the YAML, in the order of `Phase`.
+PHASE_ORDER: tuple[str, ...] = tuple(phase.label for phase in Phase)
+
+_NEXT_PHASE: dict[Phase, Phase | None] = {
+    phase: Phase(phase + 1) if phase + 1 < len(Phase) else None for phase in Phase
+}
+
+# Series bound once so that counting a message is a single addition.
+_PHASE_COUNTERS = {phase: messages_by_phase.labels(phase.label) for phase in Phase}
+_UNKNOWN_PHASE_COUNTER = messages_by_phase.labels("unknown")
+_ERROR_COUNTERS = {error: workflow_errors.labels(error) for error in WorkflowError}
+
+# Verdict of the messages of users outside the workflow
+_UNKNOWN_STATE: Verdict = (None, WorkflowError.UNKNOWN_STATE)
+
+
+@dataclass(slots=True, eq=False)
+class WorkflowNode:
+    """
+    A compiled step of the workflow.
+
+    Parameters
+    ----------
+    lang : str
+        The language of the step.
+    phase : Phase
+        The phase the step belongs to.
+    step : int
+        The index of the step within its phase.
+    prompt : str | None
+        The interned message sent when the user reaches this step.
+        None when the YAML does not define the step.
+    validator : Validator
+        Checks the answers to this step, compiled from its `answer`.
+    next : WorkflowNode | None
+        The node of the same phase reached after a valid answer to this step.
+        None when the answer leaves the phase.
+    """
+
+    lang: str
+    phase: Phase
+    step: int
+    prompt: str | None
+    validator: Validator
+    next: "WorkflowNode | None" = None
+
+
+@dataclass(slots=True, frozen=True)
+class CompiledWorkflow:
+    """
+    Immutable snapshot of a loaded configuration.
+
+    The engine holds a single reference to its snapshot and replaces it whole,
+    so a message is always answered with one coherent configuration.
+
+    Parameters
+    ----------
+    questions : dict
+        The `QUESTIONS` of the workflow YAML.
+    errors : dict
+        The `ERRORS` per language, those of the errors YAML taking precedence.
+    nodes : dict[tuple[str, Phase, int], WorkflowNode]
+        The transition table keyed by `(lang, phase, step)`.
+    entries : dict[tuple[str, Phase], WorkflowNode]
+        The first node of every `(lang, phase)`.
+    catalog : MessageCatalog
+        The prompts and errors of every language, translations resolved.
+    error_texts : frozenset[str]
+        Every error message, in any language.
+    """
+
+    questions: dict
+    errors: dict
+    nodes: dict[tuple[str, Phase, int], WorkflowNode]
+    entries: dict[tuple[str, Phase], WorkflowNode]
+    catalog: MessageCatalog
+    error_texts: frozenset[str]
+
+
+Handler = Callable[
+    [CompiledWorkflow, str, str, ConversationState, Phase, "WorkflowNode | None"],
+    tuple[ConversationState, str],
+]
+
+
+def _answer_spec(own: list, base: list, step: int) -> dict | None:
+    """The `answer` declared by a step, or by the same step of the fallback."""
+    for items in (own, base):
+        if step < len(items) and isinstance(items[step], dict):
+            spec = items[step].get("answer")
+            if spec is not None:
+                return spec
+    return None
+
+
+def _merge_errors(workflow_errors: dict, file_errors: dict) -> dict:
+    """Merges the `ERRORS` of both YAML files, the errors file taking precedence."""
+    errors = {lang: dict(messages or {}) for lang, messages in workflow_errors.items()}
+    for lang, messages in file_errors.items():
+        errors.setdefault(lang, {}).update(messages or {})
+    return errors
+
+
+def compile_workflow(
+    questions: dict, errors: dict, previous: CompiledWorkflow | None = None
+) -> tuple[CompiledWorkflow, list[tuple[str, str]]]:
+    """
+    Compiles `QUESTIONS` into the `(lang, phase, step)` transition table.
+
+    The prompts come from the `MessageCatalog`, so a language missing some
+    steps uses those of `FALLBACK_LANG`. Every `Phase` gets at least one node
+    per language, even when no YAML defines it, so that leaving a phase always
+    lands on an entry node whose `prompt` may be None. Nodes only point within
+    their phase, so each `(lang, phase)` compiles independently of the others.
+    Each node checks its answers with the validator compiled from the
+    `answer` of its step, or the default one of its phase.
+
+    When `previous` is given, the nodes of a `(lang, phase)` whose steps are
+    unchanged are reused instead of being rebuilt. Nodes are never modified
+    once published, so the previous snapshot stays valid for the messages
+    still being answered with it.
+
+    Parameters
+    ----------
+    questions : dict
+        The `QUESTIONS` of the workflow YAML.
+    errors : dict
+        The merged `ERRORS` per language.
+    previous : CompiledWorkflow | None
+        The snapshot being replaced, if any.
+
+    Returns
+    -------
+    tuple[CompiledWorkflow, list[tuple[str, str]]]
+        (The new snapshot, The `(lang, phase)` that were recompiled)
+
+    Raises
+    ------
+    ValueError
+        If the `answer` of a step is invalid.
+    """
+    nodes: dict[tuple[str, Phase, int], WorkflowNode] = {}
+    entries: dict[tuple[str, Phase], WorkflowNode] = {}
+    recompiled: list[tuple[str, str]] = []
+    catalog = MessageCatalog.build(
+        questions, errors, tuple(sorted(set(LANGUAGE_ALIASES.values())))
+    )
+
+    base_phases = questions.get(FALLBACK_LANG) or {}
+
+    for lang in catalog.languages:
+        phases = questions.get(lang) or {}
+        for phase, label in zip(Phase, PHASE_ORDER, strict=True):
+            section = catalog.steps(lang, phase)
+            own, base = phases.get(label) or [], base_phases.get(label) or []
+            validators = [
+                compile_validator(_answer_spec(own, base, step), phase)
+                for step in range(max(len(section), 1))
+            ]
+            if (
+                previous is not None
+                and (lang, phase) in previous.entries
+                and section == previous.catalog.steps(lang, phase)
+                and validators
+                == [
+                    previous.nodes[(lang, phase, step)].validator
+                    for step in range(len(validators))
+                ]
+            ):
+                for step in range(max(len(section), 1)):
+                    nodes[(lang, phase, step)] = previous.nodes[(lang, phase, step)]
+                entries[(lang, phase)] = previous.entries[(lang, phase)]
+                continue
+
+            built = [
+                WorkflowNode(lang, phase, step, prompt, validators[step])
+                for step, prompt in enumerate(section)
+            ] or [WorkflowNode(lang, phase, 0, None, validators[0])]
+
+            for step, node in enumerate(built):
+                upcoming = built[step + 1] if step + 1 < len(built) else None
+                node.next = upcoming if upcoming and upcoming.prompt else None
+                nodes[(lang, phase, step)] = node
+
+            entries[(lang, phase)] = built[0]
+            recompiled.append((lang, label))
+
+    error_texts = frozenset(catalog.errors)
+    compiled = CompiledWorkflow(questions, errors, nodes, entries, catalog, error_texts)
+    return compiled, recompiled
 
 
 class WorkflowEngine:
     """
     Defines the workflow engine for managing the chatbot dialogues.
 
+    The `QUESTIONS` of the YAML are compiled at load time into a transition
+    table keyed by `(lang, phase, step)`, so each message is dispatched with
+    a single dictionary lookup.
+
+    The configuration can be reloaded while serving: `reload` reparses the
+    files that changed, recompiles only the `(lang, phase)` whose steps changed
+    and swaps the new snapshot in with a single assignment. Messages already
+    being processed finish with the snapshot they started with.
+
     Parameters
     ----------
     yaml_path : str
         Path to the YAML file defining the workflow.
         Default = /mh_chatbot_dialogue/config/workflow.yaml.
+    errors_path : str | None
+        Path to the YAML file defining the `ERRORS`, merged over those of
+        `yaml_path`. Default = None.
+    reload_interval : float | None
+        Seconds between checks for changes of the files while `lifespan` runs.
+        None disables the watcher. Default = None.
 
     Functions
     ---------
@@ -22,16 +255,252 @@ class WorkflowEngine:
         user input.
     get_error_message : (str, WorkflowError) -> str
         Retrieves the error message corresponding to a specific error type and language.
-    process_message : (str, dict, dict) -> tuple[dict, str]
+    is_error : (str) -> bool
+        Whether a reply is one of the error messages.
+    validator : (ConversationState) -> Validator | None
+        The validator of the question a user is answering.
+    validate_many : (Iterable[tuple[ConversationState, MessageEvent]])
+        -> list[Verdict]
+        Checks many answers without moving the users, e.g. to replay a batch.
+    process_message : (str, MessageEvent, ConversationState)
+        -> tuple[ConversationState, str]
         Processes a single message from a user and updates the state accordingly.
+    changed : () -> bool
+        Whether any configuration file changed since it was last loaded.
+    reload : (bool) -> list[tuple[str, str]]
+        Reparses the changed files and swaps in the recompiled configuration.
+    watch : () -> None
+        Reloads the configuration whenever its files change.
+    lifespan : (FastAPI) -> AsyncIterator[None]
+        FastAPI lifespan running `watch` in the background.
     """
 
-    def __init__(self, yaml_path: str = "/mh_chatbot_dialogue/config/workflow.yaml"):
-        with open(yaml_path) as file:
-            config = yaml.safe_load(file)
+    def __init__(
+        self,
+        yaml_path: str = "/mh_chatbot_dialogue/config/workflow.yaml",
+        errors_path: str | None = None,
+        reload_interval: float | None = None,
+    ):
+        self.yaml_path = yaml_path
+        self.errors_path = errors_path
+        self.reload_interval = reload_interval
+
+        self._handlers: dict[Phase, Handler] = {
+            Phase.PRESENTATION: self._on_presentation,
+            Phase.FORMULAIRES: self._on_answer,
+            Phase.AUDIO_QUESTIONS: self._on_answer,
+            Phase.CONCLUSION: self._on_conclusion,
+        }
+        self._reload_lock = threading.Lock()
+        self._signatures: dict[str, tuple[int, int]] = {}
+        self._sources: dict[str, dict] = {}
+        self._compiled: CompiledWorkflow
+        self.reload(force=True)
+
+    @property
+    def questions(self) -> dict:
+        """The `QUESTIONS` of the current configuration."""
+        return self._compiled.questions
+
+    @property
+    def errors(self) -> dict:
+        """The `ERRORS` of the current configuration."""
+        return self._compiled.errors
+
+    @property
+    def catalog(self) -> MessageCatalog:
+        """The prompts and error messages of the current configuration."""
+        return self._compiled.catalog
+
+    def _paths(self) -> list[str]:
+        """The configuration files, the workflow first."""
+        return [self.yaml_path] + ([self.errors_path] if self.errors_path else [])
+
+    @staticmethod
+    def _signature(path: str) -> tuple[int, int]:
+        """Modification time and size of `path`, cheap to compare between checks."""
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def changed(self) -> bool:
+        """
+        Whether any configuration file changed since it was last loaded.
 
-        self.questions = config.get("QUESTIONS", {})
-        self.errors = config.get("ERRORS", {})
+        Returns
+        -------
+        bool
+            True if a file has a different modification time or size.
+        """
+        return self._on_disk() != self._signatures
+
+    def _on_disk(self) -> dict[str, tuple[int, int]]:
+        """The signature of every configuration file as currently on disk."""
+        return {path: self._signature(path) for path in self._paths()}
+
+    def reload(self, force: bool = False) -> list[tuple[str, str]]:
+        """
+        Reparses the changed files and swaps in the recompiled configuration.
+
+        Only the files whose modification time or size changed are parsed again,
+        and only the `(lang, phase)` whose steps changed are recompiled. If a
+        file cannot be parsed the current configuration is kept.
+
+        Parameters
+        ----------
+        force : bool
+            Reparse and recompile everything. Default = False.
+
+        Returns
+        -------
+        list[tuple[str, str]]
+            The `(lang, phase)` that were recompiled.
+
+        Raises
+        ------
+        OSError, yaml.YAMLError
+            If a file cannot be read or parsed.
+        ValueError
+            If the `answer` of a step is invalid.
+        """
+        with self._reload_lock:
+            start = time.perf_counter()
+            sources = dict(self._sources)
+            signatures = dict(self._signatures)
+
+            for path in self._paths():
+                signature = self._signature(path)
+                if force or signatures.get(path) != signature:
+                    with open(path) as file:
+                        sources[path] = yaml.load(file, Loader=_YAML_LOADER) or {}
+                    signatures[path] = signature
+            parsed = time.perf_counter()
+
+            workflow = sources[self.yaml_path]
+            errors = _merge_errors(
+                workflow.get("ERRORS", {}),
+                sources[self.errors_path].get("ERRORS", {}) if self.errors_path else {},
+            )
+            previous = None if force else self._compiled
+            compiled, recompiled = compile_workflow(
+                workflow.get("QUESTIONS", {}), errors, previous
+            )
+
+            self._compiled = compiled
+            self._sources = sources
+            self._signatures = signatures
+
+        pylogger.info(
+            f"Workflow loaded: parsed in {(parsed - start) * 1000:.2f} ms, "
+            f"recompiled {len(recompiled)} of {len(compiled.entries)} (lang, phase) "
+            f"in {(time.perf_counter() - parsed) * 1000:.2f} ms"
+        )
+        self._report_missing(compiled.catalog)
+        return recompiled
+
+    @staticmethod
+    def _report_missing(catalog: MessageCatalog) -> None:
+        """Logs the messages filled in by a fallback when the catalog was built."""
+        if not catalog.missing:
+            return
+        # Without a message in the fallback language an error gets UNKNOWN_STATE
+        untranslated = [
+            key for key in catalog.missing if key.startswith(f"{FALLBACK_LANG}.")
+        ]
+        if untranslated:
+            pylogger.warning(f"Messages missing in {FALLBACK_LANG}: {untranslated}")
+        per_lang = Counter(key.split(".", 1)[0] for key in catalog.missing)
+        per_lang.pop(FALLBACK_LANG, None)
+        if per_lang:
+            pylogger.info(
+                f"Translations falling back to {FALLBACK_LANG}: "
+                + ", ".join(f"{lang} {count}" for lang, count in per_lang.items())
+            )
+
+    async def watch(self) -> None:
+        """
+        Reloads the configuration whenever its files change.
+
+        Files are polled every `reload_interval` seconds (1 if unset) and parsed
+        in a worker thread, so the event loop keeps answering in the meantime.
+        """
+        interval = self.reload_interval or 1.0
+        # Files that failed to load are not retried until they change again.
+        rejected: dict[str, tuple[int, int]] | None = None
+        while True:
+            await asyncio.sleep(interval)
+            on_disk = None
+            try:
+                on_disk = await asyncio.to_thread(self._on_disk)
+                if on_disk != self._signatures and on_disk != rejected:
+                    await asyncio.to_thread(self.reload)
+            except (OSError, yaml.YAMLError, ValueError):
+                rejected = on_disk
+                pylogger.exception("Workflow reload failed, keeping the current one")
+
+    @asynccontextmanager
+    async def lifespan(self, app: Any) -> AsyncIterator[None]:
+        """
+        FastAPI lifespan running `watch` in the background.
+
+        Nothing is started when `reload_interval` is None.
+
+        Parameters
+        ----------
+        app : FastAPI
+            The application being served.
+        """
+        if self.reload_interval is None:
+            yield
+            return
+
+        watcher = asyncio.create_task(self.watch())
+        try:
+            yield
+        finally:
+            watcher.cancel()
+            with suppress(asyncio.CancelledError):
+                await watcher
+
+    @staticmethod
+    def _successor(
+        compiled: CompiledWorkflow,
+        lang: str,
+        phase: Phase,
+        step: int,
+        node: WorkflowNode | None,
+    ) -> WorkflowNode | None:
+        """
+        Returns the node reached after a valid answer at `(lang, phase, step)`.
+
+        Parameters
+        ----------
+        compiled : CompiledWorkflow
+            The configuration answering the message.
+        lang : str
+            The language of the flux.
+        phase : Phase
+            The current phase of the workflow.
+        step : int
+            The current step within the phase.
+        node : WorkflowNode | None
+            The node of `(lang, phase, step)`, None if it was never compiled.
+
+        Returns
+        -------
+        WorkflowNode | None
+            The next node, None if the language or phase were never compiled.
+        """
+        if node is not None:
+            if node.next is not None:
+                return node.next
+        else:
+            # Steps outside the compiled table skip straight to the next phase.
+            upcoming = compiled.nodes.get((lang, phase, step + 1))
+            if upcoming is not None and upcoming.prompt:
+                return upcoming
+
+        following = _NEXT_PHASE.get(phase)
+        return compiled.entries.get((lang, following)) if following else None
 
     def get_step(
         self, lang: str = "es", phase: str = "presentation", step: int = 1
@@ -54,20 +523,18 @@ class WorkflowEngine:
             The corresponding message to the step needed.
             Returns None if the step does not exist.
         """
-        try:
-            section = self.questions[lang][phase]
-
-            if step < len(section):
-                current = section[step]
-
-                if "text" in current:
-                    return current["text"]
-                if "question" in current:
-                    return current["question"]
+        compiled = self._compiled
+        known = Phase.__members__.get(phase.upper())
+        if known is not None:
+            return compiled.catalog.prompt(lang, known, step)
 
+        # Phases outside `Phase` (e.g. "login") are not compiled.
+        try:
+            section = compiled.questions[lang][phase]
+            if 0 <= step < len(section):
+                return prompt_of(section[step])
             return None
-
-        except KeyError:
+        except (KeyError, TypeError):
             return None
 
     def next_phase(self, phase: str = "presentation") -> str | None:
@@ -85,13 +552,9 @@ class WorkflowEngine:
         str | None
             The next phase in the workflow. Returns None if there is no next phase.
         """
-        order = ["presentation", "formulaires", "audio_questions", "conclusion"]
-
-        try:
-            current_index = order.index(phase)
-            return order[current_index + 1] if current_index + 1 < len(order) else None
-        except ValueError:
-            return None
+        known = Phase.__members__.get(phase.upper())
+        following = _NEXT_PHASE.get(known) if known is not None else None
+        return following.label if following is not None else None
 
     def get_error_message(self, lang: str, error_type: WorkflowError) -> str:
         """
@@ -107,16 +570,124 @@ class WorkflowEngine:
         Returns
         -------
         str
-            The corresponding error message. If the language or error type is not found,
-            returns a default message in English.
+            The corresponding error message. A missing translation falls back to
+            the message of `FALLBACK_LANG`, then to the `UNKNOWN_STATE` error.
         """
-        return self.errors.get(lang, {}).get(
-            error_type.upper(), WorkflowError.UNKNOWNN_STATE
-        )
+        return self._error(self._compiled, lang, error_type)
+
+    def is_error(self, reply: str) -> bool:
+        """
+        Whether a reply is one of the error messages.
+
+        Parameters
+        ----------
+        reply : str
+            A reply of `process_message`.
+
+        Returns
+        -------
+        bool
+            True if the reply is an error message of any language.
+        """
+        return reply in self._compiled.error_texts
+
+    @staticmethod
+    def _error(compiled: CompiledWorkflow, lang: str, error_type: WorkflowError) -> str:
+        """Looks up an error message in the configuration answering the message."""
+        _ERROR_COUNTERS[error_type].inc()
+        return compiled.catalog.error(lang, error_type)
+
+    def _move_to(
+        self,
+        compiled: CompiledWorkflow,
+        state: ConversationState,
+        lang: str,
+        node: WorkflowNode | None,
+        phase: Phase,
+    ) -> tuple[ConversationState, str]:
+        """
+        Moves the user to `node` and answers with its prompt.
+
+        Parameters
+        ----------
+        compiled : CompiledWorkflow
+            The configuration answering the message.
+        state : ConversationState
+            The current state of the user in the workflow.
+        lang : str
+            The language used for the error message if the node has no prompt.
+        node : WorkflowNode | None
+            The node reached by the user.
+        phase : Phase
+            The phase the user leaves, used when `node` was never compiled.
+
+        Returns
+        -------
+        tuple[ConversationState, str]
+            (New state of the user, Response message)
+        """
+        if node is None:
+            state.phase = _NEXT_PHASE[phase]
+            state.step = 0
+            return state, self._error(compiled, lang, WorkflowError.UNKNOWN_STATE)
+
+        state.phase = node.phase
+        state.step = node.step
+        if node.prompt is not None:
+            return state, node.prompt
+        return state, self._error(compiled, lang, WorkflowError.UNKNOWN_STATE)
+
+    def _on_presentation(
+        self,
+        compiled: CompiledWorkflow,
+        lang: str,
+        answer: str,
+        state: ConversationState,
+        phase: Phase,
+        node: WorkflowNode | None,
+    ) -> tuple[ConversationState, str]:
+        """Switches the conversation to the chosen language."""
+        state.lang = answer
+        entry = compiled.entries.get((answer, Phase.FORMULAIRES))
+        return self._move_to(compiled, state, lang, entry, phase)
+
+    def _on_answer(
+        self,
+        compiled: CompiledWorkflow,
+        lang: str,
+        answer: str,
+        state: ConversationState,
+        phase: Phase,
+        node: WorkflowNode | None,
+    ) -> tuple[ConversationState, str]:
+        """Moves past a valid answer of the formulaires or audio questions."""
+        upcoming = node.next if node is not None else None
+        if upcoming is not None and upcoming.prompt is not None:
+            # Next step of the same phase, the common case
+            state.step = upcoming.step
+            return state, upcoming.prompt
+        upcoming = self._successor(compiled, lang, phase, state.step, node)
+        return self._move_to(compiled, state, lang, upcoming, phase)
+
+    def _on_conclusion(
+        self,
+        compiled: CompiledWorkflow,
+        lang: str,
+        answer: str,
+        state: ConversationState,
+        phase: Phase,
+        node: WorkflowNode | None,
+    ) -> tuple[ConversationState, str]:
+        """Says goodbye and resets the state of the user."""
+        entry = compiled.entries.get((lang, Phase.CONCLUSION))
+        state.reset()
+        if entry is not None and entry.prompt is not None:
+            return state, entry.prompt
+        return state, self._error(compiled, lang, WorkflowError.UNKNOWN_STATE)
 
     async def process_message(
-        self, user_id: str, entry: dict, state: dict
-    ) -> tuple[dict, str]:
+        self, user_id: str, event: MessageEvent, state: ConversationState
+    ) -> tuple[ConversationState, str]:
         """
         Processes a single message from a user and updates the state accordingly.
 
@@ -124,110 +695,74 @@ class WorkflowEngine:
         ----------
         user_id : str
             The unique identifier of the user.
-        entry : dict
-            The message entry containing the message type and content.
-        state : dict
-            The current state of the user in the workflow.
+        event : MessageEvent
+            The message, decoded from any platform.
+        state : ConversationState
+            The current state of the user in the workflow, updated in place.
 
         Returns
         -------
-        tuple[dict, str]
+        tuple[ConversationState, str]
             (New state of the user, Response message or action)
         """
-        lang: str = state.get("lang", "es")
-        phase: str = state.get("phase", "presentation")
-        msg_type = entry["type"]
-
-        # ------ PRESENTATION PHASE ------
-        if phase == "presentation":
-            if msg_type == "text":
-                text: str = entry["text"]["body"].strip().upper()
-                if text in ["ES", "CAST", "CASTELLANO", "ESPAÑOL", "ESP"]:
-                    state["lang"] = "es"
-                elif text in ["CAT", "CATALAN", "CATALÀ"]:
-                    state["lang"] = "ca"
-                else:
-                    return state, self.get_error_message(
-                        lang, WorkflowError.LANG_NOT_SUPPORTED
-                    )
-
-                state["phase"] = "formulaires"
-                state["step"] = 0
-                msg = self.get_step(state["lang"], "formulaires", 0)
-                if msg is not None:
-                    return state, msg
-                else:
-                    return state, self.get_error_message(
-                        lang, WorkflowError.UNKNOWNN_STATE
-                    )
-            else:
-                return state, self.get_error_message(
-                    lang, WorkflowError.LANG_NOT_SUPPORTED
-                )
-
-        # ------ FORMULAIRES PHASE ------
-        elif phase == "formulaires":
-            if msg_type == "text":
-                text_formulaire: str = entry["text"]["body"].strip()
-                if text_formulaire.isdigit() and 0 <= int(text_formulaire) <= 4:
-                    state["step"] += 1
-                    next_msg = self.get_step(lang, "formulaires", state["step"])
-
-                    if next_msg:
-                        return state, next_msg
-                    else:
-                        state["phase"] = "audio_questions"
-                        state["step"] = 0
-                        next_msg = self.get_step(lang, "audio_questions", 0)
-                        if next_msg is not None:
-                            return state, next_msg
-                        else:
-                            return state, self.get_error_message(
-                                lang, WorkflowError.UNKNOWNN_STATE
-                            )
-                else:
-                    return state, self.get_error_message(
-                        lang, WorkflowError.INVALID_NUMBER
-                    )
-            else:
-                return state, self.get_error_message(lang, WorkflowError.INVALID_NUMBER)
-
-        # ------ AUDIO QUESTIONS PHASE ------
-        elif phase == "audio_questions":
-            audio_obj = entry.get("audio") or entry.get("voice")
-            if audio_obj:
-                audio_id = audio_obj.get("id") or audio_obj.get("file_id")
-                audio_duration = audio_obj.get("duration", 0)
-
-                if audio_duration < 20:
-                    return state, self.get_error_message(
-                        lang, WorkflowError.AUDIO_TOO_SHORT
-                    )
-
-                print(f"AUDIO:{audio_id}")
-
-                state["step"] += 1
-                next_msg = self.get_step(lang, "audio_questions", state["step"])
-
-                if next_msg:
-                    return state, next_msg
-                else:
-                    state["phase"] = "conclusion"
-                    state["step"] = 0
-                    msg = self.get_step(lang, "conclusion", 0)
-                    return state, msg if msg is not None else self.get_error_message(
-                        lang, WorkflowError.UNKNOWNN_STATE
-                    )
-
-            else:
-                return state, self.get_error_message(lang, WorkflowError.NOT_AUDIO)
-
-        # ------ CONCLUSION PHASE ------
-        elif phase == "conclusion":
-            msg = self.get_step(lang, "conclusion", 0)
-            state.clear()
-            return state, msg if msg is not None else self.get_error_message(
-                lang, WorkflowError.UNKNOWNN_STATE
-            )
+        compiled = self._compiled
+        lang = state.lang
+        phase = state.phase
+        if phase is None:
+            _UNKNOWN_PHASE_COUNTER.inc()
+            return state, self._error(compiled, lang, WorkflowError.UNKNOWN_STATE)
+        _PHASE_COUNTERS[phase].inc()
+
+        node = compiled.nodes.get((lang, phase, state.step))
+        validator = node.validator if node is not None else DEFAULT_VALIDATORS[phase]
+        answer, error = validator.validate(event)
+        if answer is None:
+            error = error or WorkflowError.UNKNOWN_STATE
+            return state, self._error(compiled, lang, error)
+        return self._handlers[phase](compiled, lang, answer, state, phase, node)
+
+    def validator(self, state: ConversationState) -> Validator | None:
+        """
+        The validator of the question a user is answering.
 
-        return state, self.get_error_message(lang, WorkflowError.UNKNOWNN_STATE)
+        Parameters
+        ----------
+        state : ConversationState
+            The current state of the user in the workflow.
+
+        Returns
+        -------
+        Validator | None
+            The validator of the step, or the default one of its phase when
+            the step was never compiled. None if the phase is unknown.
+        """
+        phase = state.phase
+        if phase is None:
+            return None
+        node = self._compiled.nodes.get((state.lang, phase, state.step))
+        return node.validator if node is not None else DEFAULT_VALIDATORS[phase]
+
+    def validate_many(
+        self, answers: Iterable[tuple[ConversationState, MessageEvent]]
+    ) -> list[Verdict]:
+        """
+        Checks many answers without moving the users, e.g. to replay a batch.
+
+        Parameters
+        ----------
+        answers : Iterable[tuple[ConversationState, MessageEvent]]
+            Every message with the state of its user when it was answered.
+
+        Returns
+        -------
+        list[Verdict]
+            `(normalized answer, None)` for every valid answer and
+            `(None, error)` for the others, in order.
+        """
+        verdicts: list[Verdict] = []
+        for state, event in answers:
+            validator = self.validator(state)
+            verdicts.append(
+                validator.validate(event) if validator is not None else _UNKNOWN_STATE
+            )
+        return verdicts
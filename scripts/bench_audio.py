@@ -0,0 +1,145 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import wave
+from functools import partial
+
+import numpy as np
+
+from chatbot_template.utils.audio import (
+    AudioInfo,
+    AudioJob,
+    AudioPipeline,
+    process_audio,
+)
+
+
+def synthetic_voice(seconds: float, rate: int, channels: int, seed: int) -> np.ndarray:
+    """A few seconds of harmonics and noise, standing in for a voice note."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * rate)) / rate
+    pitch = rng.uniform(90, 250)
+    signal = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+    signal = signal * (0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)) * 0.2
+    signal += rng.normal(0, 0.01, len(t))
+    return np.repeat(signal[:, None], channels, axis=1)
+
+
+def write_files(folder: str, count: int, seconds: float, rate: int, channels: int):
+    """Writes `count` WAV files like the ones of the users, returning their paths."""
+    paths = []
+    for index in range(count):
+        path = os.path.join(folder, f"answer-{index}.wav")
+        samples = synthetic_voice(seconds, rate, channels, index)
+        # Interleaved 16-bit PCM, as recorded by most clients
+        pcm = (np.clip(samples, -1, 1) * 32767).astype("<i2")
+        with wave.open(path, "wb") as file:
+            file.setnchannels(channels)
+            file.setsampwidth(2)
+            file.setframerate(rate)
+            file.writeframes(pcm.tobytes())
+        paths.append(path)
+    return paths
+
+
+async def loop_lag(stop: asyncio.Event, lags: list[float]) -> None:
+    """Records how late the event loop runs a 10 ms tick, until `stop` is set."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append(time.perf_counter() - start - 0.01)
+
+
+async def inline(paths: list[str], output: str) -> tuple[float, list[float]]:
+    """Processes every file on the event loop, as a handler awaiting nothing."""
+    stop = asyncio.Event()
+    lags: list[float] = []
+    ticker = asyncio.create_task(loop_lag(stop, lags))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    for path in paths:
+        process_audio(path, output)
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    return elapsed, lags
+
+
+async def pooled(
+    paths: list[str], output: str, workers: int
+) -> tuple[float, list[float]]:
+    """Processes every file through an `AudioPipeline` of `workers` processes."""
+    pipeline = AudioPipeline(workers=workers, output_folder=output)
+    done: list[AudioInfo] = []
+
+    async def collect(job: AudioJob, info: AudioInfo) -> None:
+        done.append(info)
+
+    pipeline.add_hook(collect)
+    async with pipeline.lifespan(None):
+        # The processes are spawned on the first job, keep them out of the timing
+        await pipeline.submit(AudioJob("warmup", "warmup", paths[0], "audio", 0))
+        await pipeline.join()
+
+        stop = asyncio.Event()
+        lags: list[float] = []
+        ticker = asyncio.create_task(loop_lag(stop, lags))
+        start = time.perf_counter()
+        for index, path in enumerate(paths):
+            await pipeline.submit(AudioJob(str(index), str(index), path, "audio", 0))
+        await pipeline.join()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await ticker
+
+    assert len(done) == len(paths) + 1
+    return elapsed, lags
+
+
+def main() -> None:
+    """Audio files processed per second, inline and in worker processes."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--rate", type=int, default=48_000)
+    parser.add_argument("--channels", type=int, default=2)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1]
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{args.files} files of {args.seconds:g} s at {args.rate} Hz, "
+        f"{args.channels} channels, on {os.cpu_count()} cores"
+    )
+    with tempfile.TemporaryDirectory() as folder:
+        paths = write_files(folder, args.files, args.seconds, args.rate, args.channels)
+        output = os.path.join(folder, "normalized")
+        os.makedirs(output)
+
+        # Name, cores busy and coroutine of every run
+        runs = [("inline", 1, partial(inline, paths, output))]
+        for workers in dict.fromkeys(args.workers):
+            runs.append(
+                (
+                    f"{workers} workers",
+                    min(workers, os.cpu_count() or 1),
+                    partial(pooled, paths, output, workers),
+                )
+            )
+
+        for name, cores, run in runs:
+            elapsed, lags = asyncio.run(run())
+            rate = len(paths) / elapsed
+            print(
+                f"{name:>10}: {rate:.1f} files/s, {rate / cores:.1f} files/s per core, "
+                f"{args.seconds * rate:,.0f} s of audio/s, event loop late by "
+                f"{max(lags, default=0) * 1e3:.0f} ms at worst"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import argparse
+import gc
+import os
+import random
+import tempfile
+import timeit
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+import pandas as pd
+
+from chatbot_template.utils.data_analysis import DataAnalysis
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+MOMENTS = ["Mañana", "Mediodía", "Tarde", "Noche", "Vas tarde"]
+ANIMALS = ["gato", "perro", "pulpo", "loro", "delfín", "koala"]
+
+
+def write_tables(folder: str, users: int, facts: int) -> tuple[str, str, str]:
+    """
+    Writes synthetic tables with the layout expected by `DataAnalysis`.
+
+    Parameters
+    ----------
+    folder : str
+        Where the `.csv` files are written.
+    users : int
+        Number of rows of the users table.
+    facts : int
+        Number of rows of the random facts table.
+
+    Returns
+    -------
+    tuple[str, str, str]
+        Paths of the info, users and random facts tables.
+    """
+    rng = random.Random(0)
+    info = pd.DataFrame(
+        {
+            m: [f"{d} {m}: actividad {rng.randint(0, 99)}" for d in DAYS]
+            for m in MOMENTS
+        },
+        index=pd.Index(DAYS, name="day"),
+    )
+    user_actions = pd.DataFrame(
+        {
+            "user_id": [f"user{i}" for i in range(users)],
+            "user_name": [f"name{i}" for i in range(users)],
+            "password": [f"secret{i}" for i in range(users)],
+            "favourite_animal": [rng.choice(ANIMALS) for _ in range(users)],
+            "loves_maths": [rng.randint(0, 10) for _ in range(users)],
+        }
+    )
+    random_facts = pd.DataFrame(
+        {
+            "animal": [rng.choice(ANIMALS) for _ in range(facts)],
+            "maths_level": [rng.randint(0, 10) for _ in range(facts)],
+            "fact": [f"fact number {i}" for i in range(facts)],
+        }
+    )
+
+    paths = tuple(
+        os.path.join(folder, name)
+        for name in ("info.csv", "user_actions.csv", "random_facts.csv")
+    )
+    info.to_csv(paths[0])
+    user_actions.to_csv(paths[1], index=False)
+    random_facts.to_csv(paths[2], index=False)
+    return paths  # type: ignore[return-value]
+
+
+def retained(build: Callable[[], Any]) -> tuple[Any, int]:
+    """
+    Builds an object and measures the memory it holds once built.
+
+    Parameters
+    ----------
+    build : () -> Any
+        Builds the object.
+
+    Returns
+    -------
+    tuple[Any, int]
+        (The object, bytes allocated while building it and still held)
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        built = build()
+        gc.collect()
+        return built, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def main(users: int, facts: int, lookups: int) -> None:
+    """Compares memory and lookup latency of the plain and indexed tables."""
+    with tempfile.TemporaryDirectory() as folder:
+        info_path, user_path, facts_path = write_tables(folder, users, facts)
+
+        # The first read imports the parsers, keep them out of the figures.
+        pd.read_csv(info_path, index_col=0)
+
+        # The access pattern of the previous implementation.
+        (info, user_actions, random_facts), plain_bytes = retained(
+            lambda: (
+                pd.read_csv(info_path, index_col=0),
+                pd.read_csv(user_path).set_index("user_id"),
+                pd.read_csv(facts_path),
+            )
+        )
+
+        # The whole instance: DataFrames, lookup dicts and fact pools.
+        data, indexed_bytes = retained(
+            lambda: DataAnalysis(info_path, user_path, facts_path)
+        )
+        frame_bytes = sum(data.memory_usage().values())
+
+    rng = random.Random(1)
+    days = [rng.choice(DAYS) for _ in range(lookups)]
+    moments = [rng.choice(MOMENTS) for _ in range(lookups)]
+    user_ids = [f"user{rng.randrange(users)}" for _ in range(lookups)]
+    queries = list(zip(days, moments, user_ids, strict=True))
+
+    def plain() -> None:
+        for day, moment, user_id in queries:
+            info.loc[day][moment]
+            user_actions.loc[user_id]["favourite_animal"]
+
+    def indexed() -> None:
+        for day, moment, user_id in queries:
+            data.get_what_am_i_doing(day, moment)
+            data._get_animal(user_id)
+
+    def plain_facts() -> None:
+        for _, _, user_id in queries:
+            animal = user_actions.loc[user_id]["favourite_animal"]
+            random_facts[random_facts["animal"] == animal].sample(1)
+
+    def pooled_facts() -> None:
+        for _, _, user_id in queries:
+            data.get_animal_random_fact(user_id)
+
+    def batched_facts() -> None:
+        data.get_animal_random_facts(user_ids)
+
+    print(f"memory  plain: {plain_bytes / 1024:,.0f} KiB")
+    print(
+        f"memory indexed: {indexed_bytes / 1024:,.0f} KiB "
+        f"({frame_bytes / 1024:,.0f} KiB in DataFrames)"
+    )
+    for name, run in (
+        ("lookup plain", plain),
+        ("lookup indexed", indexed),
+        ("fact plain", plain_facts),
+        ("fact pooled", pooled_facts),
+        ("fact batched", batched_facts),
+    ):
+        seconds = min(timeit.repeat(run, number=1, repeat=3))
+        print(f"{name:>14}: {seconds / lookups * 1e6:,.2f} us/query")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--facts", type=int, default=10_000)
+    parser.add_argument("--lookups", type=int, default=5_000)
+    args = parser.parse_args()
+    main(args.users, args.facts, args.lookups)
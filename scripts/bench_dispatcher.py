@@ -0,0 +1,56 @@
+import argparse
+import asyncio
+import time
+
+from chatbot_template.utils.dispatcher import UserDispatcher
+
+
+async def main(users: int, messages: int, latency: float) -> None:
+    """
+    Floods a `UserDispatcher` with conversations and checks per-user ordering.
+
+    Parameters
+    ----------
+    users : int
+        Number of concurrent conversations.
+    messages : int
+        Messages sent by each user.
+    latency : float
+        Seconds each handled message waits, standing in for the outbound send.
+    """
+    received: dict[str, list[int]] = {}
+    in_flight = 0
+    peak = 0
+
+    async def handler(user_id: str, message: int) -> None:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(latency)
+        received.setdefault(user_id, []).append(message)
+        in_flight -= 1
+
+    dispatcher = UserDispatcher(handler)
+    start = time.perf_counter()
+    for message in range(messages):
+        for user in range(users):
+            await dispatcher.submit(str(user), message)
+    await dispatcher.join()
+    elapsed = time.perf_counter() - start
+
+    ordered = all(received[str(user)] == list(range(messages)) for user in range(users))
+    total = users * messages
+    print(
+        f"{total:,} messages from {users:,} users in {elapsed:.2f}s: "
+        f"{total / elapsed:,.0f} msg/s, peak concurrency {peak:,}, "
+        f"ordered per user: {ordered}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput of UserDispatcher.")
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--messages", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.messages, args.latency))
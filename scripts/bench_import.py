@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BASELINE_FOLDER = ".benchmarks"
+
+
+def import_times(module: str) -> dict[str, tuple[int, int]]:
+    """
+    Imports a module in a fresh interpreter with `-X importtime`.
+
+    Parameters
+    ----------
+    module : str
+        The module imported.
+
+    Returns
+    -------
+    dict[str, tuple[int, int]]
+        Self and cumulative microseconds of every module imported, by name.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: dict[str, tuple[int, int]] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main() -> None:
+    """Measures the cold import time of the package against a JSON baseline."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--module", default="chatbot_template")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--baseline", help=f"Default: {BASELINE_FOLDER}/import.json")
+    parser.add_argument("--save", action="store_true", help="Overwrite the baseline.")
+    parser.add_argument(
+        "--require-baseline",
+        action="store_true",
+        help="Fail when no baseline was saved, e.g. in CI.",
+    )
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    args = parser.parse_args()
+
+    # The fastest run is the least disturbed by the rest of the machine.
+    runs = [import_times(args.module) for _ in range(args.runs)]
+    best = min(runs, key=lambda times: times[args.module][1])
+    import_ms = best[args.module][1] / 1000
+
+    print(f"import {args.module}: {import_ms:.1f} ms (best of {args.runs})")
+    print("Slowest modules by self time:")
+    offenders = sorted(best.items(), key=lambda item: item[1][0], reverse=True)
+    for name, (self_us, cumulative_us) in offenders[: args.top]:
+        print(f"  {self_us / 1000:7.2f} ms self {cumulative_us / 1000:7.2f} ms  {name}")
+
+    metrics = {"module": args.module, "import_ms": round(import_ms, 2)}
+    baseline_path = args.baseline or os.path.join(BASELINE_FOLDER, "import.json")
+    if args.save:
+        os.makedirs(os.path.dirname(baseline_path) or ".", exist_ok=True)
+        with open(baseline_path, "w") as file:
+            json.dump(metrics, file, indent=2)
+        print(f"Baseline saved to {baseline_path}")
+        return
+    if not os.path.exists(baseline_path):
+        print(f"No baseline at {baseline_path}, run with --save to create it")
+        if args.require_baseline:
+            sys.exit(1)
+        return
+
+    with open(baseline_path) as file:
+        reference = json.load(file)["import_ms"]
+    if import_ms > reference * (1 + args.tolerance):
+        print(
+            f"Regression against {baseline_path}: {import_ms:.1f} ms vs {reference} ms"
+        )
+        sys.exit(1)
+    print(f"No regressions against {baseline_path} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from chatbot_template.utils.local_saver import (
+    ResponseJournal,
+    save_response,
+    save_response_to_file,
+)
+
+
+def rewrite_per_record(folder: str, records: list[dict]) -> None:
+    """The previous behaviour: one file per record, read back and rewritten."""
+    for i, record in enumerate(records):
+        filename = os.path.join(folder, f"{record['user_id']}_{i}.json")
+        if os.path.exists(filename):
+            with open(filename, encoding="utf-8") as f:
+                data = json.load(f)
+        else:
+            data = []
+        data.append(record)
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def append_per_record(folder: str, records: list[dict]) -> None:
+    """`save_response_to_file`, one synchronous append per record."""
+    for record in records:
+        save_response_to_file(record["user_id"], record, folder=folder)
+
+
+async def journal(folder: str, records: list[dict], fsync: bool) -> dict:
+    """`ResponseJournal`, batched appends from a background writer."""
+    writer = ResponseJournal(folder=folder, fsync=fsync)
+    writer.start()
+    for record in records:
+        writer.write(record)
+    await writer.aclose()
+    return writer.stats()
+
+
+def main(count: int) -> None:
+    """Records/sec of each way of saving the responses."""
+    records = [
+        save_response(f"user{i % 1000}", "formulaires", i % 4, str(i % 5))
+        for i in range(count)
+    ]
+    runs = {
+        "file per record": lambda folder: rewrite_per_record(folder, records),
+        "append per record": lambda folder: append_per_record(folder, records),
+        "journal": lambda folder: asyncio.run(journal(folder, records, False)),
+        "journal + fsync": lambda folder: asyncio.run(journal(folder, records, True)),
+    }
+    for name, run in runs.items():
+        with tempfile.TemporaryDirectory() as folder:
+            start = time.perf_counter()
+            run(folder)
+            elapsed = time.perf_counter() - start
+        print(f"{name:>17}: {count / elapsed:,.0f} records/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--records", type=int, default=20_000)
+    args = parser.parse_args()
+    main(args.records)
@@ -0,0 +1,103 @@
+import argparse
+import atexit
+import io
+import json
+import logging
+import time
+from collections.abc import Callable
+from contextlib import redirect_stdout
+
+from rich.console import Console
+from rich.logging import RichHandler
+
+from chatbot_template.utils.logs import PayloadLogger, setup_logging
+
+
+class SlowStream(io.StringIO):
+    """In-memory stream where every line blocks, like a busy terminal or pipe."""
+
+    def __init__(self, latency: float):
+        super().__init__()
+        self.latency = latency
+
+    def write(self, text: str) -> int:
+        """Blocks for `latency` seconds per line flushed, then keeps the text."""
+        if "\n" in text:
+            time.sleep(self.latency)
+        return super().write(text)
+
+
+def measure(log: Callable[[dict], None], payload: dict, records: int) -> float:
+    """
+    Returns the records per second the caller can log.
+
+    Parameters
+    ----------
+    log : (dict) -> None
+        Logs a payload.
+    payload : dict
+        The payload logged on every call.
+    records : int
+        Number of calls.
+
+    Returns
+    -------
+    float
+        Calls per second, as seen by the caller.
+    """
+    start = time.perf_counter()
+    for _ in range(records):
+        log(payload)
+    return records / (time.perf_counter() - start)
+
+
+def main() -> None:
+    """Compares the cost of logging webhook payloads for the caller."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--records", type=int, default=5_000)
+    parser.add_argument("--write-latency", type=float, default=0.0001)
+    parser.add_argument("--sample", type=float, default=0.01)
+    args = parser.parse_args()
+
+    with open("chatbot_template/utils/whatsapp_api_call_example.json") as file:
+        payload = json.load(file)
+    logger = logging.getLogger("bench")
+
+    def print_payload(data: dict) -> None:
+        print("Received Payload: ", data)
+
+    stream = SlowStream(args.write_latency)
+    with redirect_stdout(stream):
+        results = {"print": measure(print_payload, payload, args.records)}
+
+    console = Console(file=SlowStream(args.write_latency), force_terminal=True)
+    logging.basicConfig(handlers=[RichHandler(console=console)], force=True)
+    logger.setLevel(logging.INFO)
+    full = PayloadLogger(logger)
+    results["rich"] = measure(
+        lambda data: full.log("Received payload", data), payload, args.records
+    )
+
+    stream = SlowStream(args.write_latency)
+    listener = setup_logging("prod", "INFO", stream)
+    assert listener is not None
+    results["json queue"] = measure(
+        lambda data: full.log("Received payload", data), payload, args.records
+    )
+    sampled = PayloadLogger(logger, sample_rate=args.sample, max_chars=500)
+    results[f"json queue, {args.sample:.0%} sampled"] = measure(
+        lambda data: sampled.log("Received payload", data), payload, args.records
+    )
+    start = time.perf_counter()
+    listener.stop()
+    drain = time.perf_counter() - start
+    atexit.unregister(listener.stop)
+    logging.basicConfig(handlers=[logging.NullHandler()], force=True)
+
+    for name, per_second in results.items():
+        print(f"{name:>24}: {per_second:,.0f} records/s for the caller")
+    print(f"background writer drained the queue {drain:.2f}s after the last record")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import argparse
+import asyncio
+import logging
+import time
+
+import httpx
+
+from chatbot_template.utils.http_client import OutboundClient, mock_transport
+
+PATH = "/botTOKEN/sendMessage"
+
+
+class KeepAliveServer:
+    """
+    Local HTTP/1.1 server answering every request with `{"ok": true}`.
+
+    Connections are kept alive between requests and counted, so the benchmark
+    shows how many TCP handshakes each way of sending pays.
+
+    Parameters
+    ----------
+    latency : float
+        Seconds each request waits before answering. Default = 0.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.connections = 0
+        self.url = ""
+        self._server: asyncio.Server | None = None
+
+    async def start(self) -> None:
+        """Starts listening on a free port of the loopback interface."""
+        self._server = await asyncio.start_server(
+            self._serve, "127.0.0.1", 0, backlog=4096
+        )
+        port = self._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}{PATH}"
+
+    async def stop(self) -> None:
+        """Stops listening and drops every connection."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.connections += 1
+        try:
+            while head := await reader.readuntil(b"\r\n\r\n"):
+                length = 0
+                for line in head.split(b"\r\n"):
+                    name, _, value = line.partition(b":")
+                    if name.lower() == b"content-length":
+                        length = int(value)
+                await reader.readexactly(length)
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b'Content-Length: 12\r\n\r\n{"ok": true}'
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+
+async def per_call(
+    url: str, transport: httpx.AsyncBaseTransport | None, sends: int, concurrency: int
+) -> None:
+    """Sends like the hooks used to, opening one client per message."""
+    slots = asyncio.Semaphore(concurrency)
+
+    async def send(i: int) -> None:
+        async with slots, httpx.AsyncClient(transport=transport) as client:
+            await client.post(url, json={"chat_id": i, "text": "hola"})
+
+    await asyncio.gather(*(send(i) for i in range(sends)))
+
+
+async def pooled(
+    url: str, transport: httpx.AsyncBaseTransport | None, sends: int, concurrency: int
+) -> None:
+    """Sends through a single shared `OutboundClient`."""
+    outbound = OutboundClient(
+        max_connections=concurrency,
+        max_keepalive_connections=concurrency,
+        transport=transport,
+    )
+    try:
+        await asyncio.gather(
+            *(
+                outbound.client.post(url, json={"chat_id": i, "text": "hola"})
+                for i in range(sends)
+            )
+        )
+    finally:
+        await outbound.aclose()
+
+
+async def run(args: argparse.Namespace, bench, name: str) -> None:
+    """Times a way of sending, against the mock transport or a local server."""
+    server = None
+    transport = None
+    url = f"https://api.telegram.org{PATH}"
+    if args.mock:
+        transport = mock_transport(args.latency)
+    else:
+        server = KeepAliveServer(args.latency)
+        await server.start()
+        url = server.url
+    try:
+        start = time.perf_counter()
+        await bench(url, transport, args.sends, args.concurrency)
+        elapsed = time.perf_counter() - start
+    finally:
+        if server is not None:
+            await server.stop()
+    opened = f", {server.connections} connections" if server is not None else ""
+    print(f"{name}: {args.sends / elapsed:,.0f} sends/s{opened}")
+
+
+def main() -> None:
+    """Throughput of outbound sends against a local keep-alive HTTP server."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--sends", type=int, default=1_000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument(
+        "--mock",
+        action="store_true",
+        help="send to `mock_transport` instead, which opens no connection",
+    )
+    args = parser.parse_args()
+
+    # httpx logs every request at INFO, which would dominate the measurement
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    for name, bench in (("per-call client", per_call), ("pooled client", pooled)):
+        asyncio.run(run(args, bench, name))
+
+
+if __name__ == "__main__":
+    main()
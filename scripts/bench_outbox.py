@@ -0,0 +1,208 @@
+import argparse
+import asyncio
+import json
+import logging
+import math
+import statistics
+import time
+from collections import defaultdict
+
+import httpx
+
+from chatbot_template.utils.enums import SendPriority
+from chatbot_template.utils.outbox import OutboundScheduler, TokenBucket
+
+URL = "https://api.telegram.org/botTOKEN/sendMessage"
+
+
+class LimitedAPI:
+    """
+    Local messaging API enforcing a global and a per-chat rate limit.
+
+    Requests over a limit are answered 429 with a `Retry-After` header and the
+    Telegram error body, like the real APIs, and are not delivered.
+
+    Parameters
+    ----------
+    rate : float
+        Requests per second accepted across every chat.
+    chat_rate : float
+        Requests per second accepted for the same chat.
+    chat_burst : float
+        Requests accepted at once for the same chat.
+    latency : float
+        Seconds each request waits before answering.
+    """
+
+    def __init__(
+        self, rate: float, chat_rate: float, chat_burst: float, latency: float
+    ):
+        self.rate = rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.latency = latency
+        self.bucket = TokenBucket(rate, rate, time.monotonic())
+        self.chats: dict[str, TokenBucket] = {}
+        self.delivered: dict[str, list[tuple[float, str]]] = defaultdict(list)
+        self.requests = 0
+        self.rejected = 0
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        """Answers a `sendMessage` request."""
+        self.requests += 1
+        payload = json.loads(request.content)
+        chat_id = str(payload["chat_id"])
+        now = time.monotonic()
+        chat = self.chats.get(chat_id)
+        if chat is None:
+            chat = self.chats[chat_id] = TokenBucket(
+                self.chat_rate, self.chat_burst, now
+            )
+        wait = max(self.bucket.delay(now), chat.delay(now))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if wait > 0:
+            self.rejected += 1
+            retry_after = math.ceil(wait)
+            body = {
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {retry_after}",
+                "parameters": {"retry_after": retry_after},
+            }
+            headers = {"Retry-After": str(retry_after)}
+            return httpx.Response(429, json=body, headers=headers)
+
+        self.bucket.take(now)
+        chat.take(now)
+        self.delivered[chat_id].append((time.monotonic(), payload["text"]))
+        return httpx.Response(200, json={"ok": True})
+
+    def transport(self) -> httpx.MockTransport:
+        """The transport to plug into an `httpx.AsyncClient`."""
+        return httpx.MockTransport(self.handler)
+
+
+def replies_of(user: int, per_user: int) -> list[tuple[str, SendPriority]]:
+    """The replies sent to a user, every third one being an error."""
+    return [
+        (
+            f"reply {index} to {user}",
+            SendPriority.ERROR if index % 3 == 2 else SendPriority.PROMPT,
+        )
+        for index in range(per_user)
+    ]
+
+
+async def unpaced(
+    api: LimitedAPI, users: int, per_user: int, gap: float
+) -> dict[str, float]:
+    """Sends every reply right away, as the hooks used to, ignoring 429s."""
+    queued: dict[str, float] = {}
+    async with httpx.AsyncClient(transport=api.transport()) as client:
+
+        async def send_all(user: int) -> None:
+            for text, _ in replies_of(user, per_user):
+                queued[text] = time.monotonic()
+                await client.post(URL, json={"chat_id": user, "text": text})
+                await asyncio.sleep(gap)
+
+        await asyncio.gather(*(send_all(user) for user in range(users)))
+    return queued
+
+
+async def scheduled(
+    api: LimitedAPI, users: int, per_user: int, gap: float, coalesce: bool
+) -> dict[str, float]:
+    """Sends every reply through an `OutboundScheduler` tuned to the API limits."""
+    queued: dict[str, float] = {}
+    async with httpx.AsyncClient(transport=api.transport()) as client:
+
+        async def send(chat_id: str, text: str) -> httpx.Response:
+            return await client.post(URL, json={"chat_id": chat_id, "text": text})
+
+        outbox = OutboundScheduler(
+            send,
+            rate=api.rate,
+            burst=api.rate,
+            chat_rate=api.chat_rate,
+            chat_burst=api.chat_burst,
+            max_retries=10,
+            coalesce=coalesce,
+        )
+
+        async def submit_all(user: int) -> None:
+            for text, priority in replies_of(user, per_user):
+                queued[text] = time.monotonic()
+                await outbox.submit(str(user), text, priority)
+                await asyncio.sleep(gap)
+
+        async with outbox.lifespan(None):
+            await asyncio.gather(*(submit_all(user) for user in range(users)))
+            await outbox.join()
+    return queued
+
+
+def report(name: str, api: LimitedAPI, queued: dict[str, float], users: int) -> None:
+    """Prints the delivery metrics of a run."""
+    latencies: list[float] = []
+    delivered = 0
+    in_order = 0
+    for messages in api.delivered.values():
+        texts = [text for _, part in messages for text in part.split("\n\n")]
+        delivered += len(texts)
+        indices = [int(text.split()[1]) for text in texts]
+        in_order += indices == sorted(indices)
+        for at, part in messages:
+            for text in part.split("\n\n"):
+                latencies.append(at - queued[text])
+
+    elapsed = max(at for messages in api.delivered.values() for at, _ in messages)
+    elapsed -= min(queued.values())
+    p50, p99 = (
+        statistics.quantiles(latencies, n=100, method="inclusive")[q - 1]
+        for q in (50, 99)
+    )
+    print(
+        f"{name:>20}: {delivered}/{len(queued)} delivered in {elapsed:.2f} s "
+        f"({delivered / elapsed:,.0f}/s), {api.requests} requests, "
+        f"{api.rejected} throttled, latency p50 {p50 * 1e3:.0f} ms "
+        f"p99 {p99 * 1e3:.0f} ms, {in_order}/{len(api.delivered)} chats in order "
+        f"of {users}"
+    )
+
+
+def main() -> None:
+    """Delivery of replies through a mock API that enforces rate limits."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--replies", type=int, default=5)
+    parser.add_argument(
+        "--gap", type=float, default=0.2, help="Seconds between replies to a user."
+    )
+    parser.add_argument("--rate", type=float, default=200.0)
+    parser.add_argument("--chat-rate", type=float, default=1.0)
+    parser.add_argument("--chat-burst", type=float, default=3.0)
+    parser.add_argument("--latency", type=float, default=0.01)
+    args = parser.parse_args()
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    print(
+        f"{args.users} users x {args.replies} replies {args.gap:g} s apart, "
+        f"API limits {args.rate:g}/s, "
+        f"{args.chat_rate:g}/s per chat in bursts of {args.chat_burst:g}"
+    )
+    users, replies, gap = args.users, args.replies, args.gap
+    runs = {
+        "unpaced": lambda api: unpaced(api, users, replies, gap),
+        "scheduled": lambda api: scheduled(api, users, replies, gap, False),
+        "scheduled+coalesced": lambda api: scheduled(api, users, replies, gap, True),
+    }
+    for name, run in runs.items():
+        api = LimitedAPI(args.rate, args.chat_rate, args.chat_burst, args.latency)
+        queued = asyncio.run(run(api))
+        report(name, api, queued, args.users)
+
+
+if __name__ == "__main__":
+    main()
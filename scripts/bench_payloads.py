@@ -0,0 +1,93 @@
+import argparse
+import json
+import time
+from collections.abc import Callable
+from typing import Any
+
+from chatbot_template.utils.events import telegram_event, whatsapp_events
+
+from scripts.bench_webhooks import EXAMPLE_PAYLOAD, telegram_payload, whatsapp_payload
+
+
+def dict_whatsapp(body: bytes) -> list[dict]:
+    """Parses a notification as the WhatsApp hook used to, into generic dicts."""
+    data = json.loads(body)
+    return [
+        message
+        for entry in data.get("entry", ())
+        for change in entry.get("changes", ())
+        for message in change.get("value", {}).get("messages", ())
+    ]
+
+
+def dict_telegram(body: bytes) -> dict | None:
+    """Parses an update as the Telegram hook used to, rebuilding the entry."""
+    data = json.loads(body)
+    if "message" not in data:
+        return None
+    message = data.get("message", {})
+    if "text" in message:
+        return {"type": "text", "text": {"body": message["text"]}}
+    if "voice" in message:
+        return {
+            "type": "audio",
+            "audio": {
+                "id": message["voice"]["file_id"],
+                "duration": message["voice"]["duration"],
+            },
+        }
+    return {"type": "unsupported"}
+
+
+def measure(parse: Callable[[bytes], Any], body: bytes, repeat: int) -> float:
+    """Mean microseconds per call of `parse(body)`, best of five rounds."""
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            parse(body)
+        best = min(best, time.perf_counter() - start)
+    return best / repeat * 1e6
+
+
+def main() -> None:
+    """Compares the cost of parsing webhook payloads into dicts and into events."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--repeat", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with open(EXAMPLE_PAYLOAD) as file:
+        template = json.load(file)
+    status = json.loads(json.dumps(template))
+    value = status["entry"][0]["changes"][0]["value"]
+    value.pop("messages")
+    value["statuses"] = [
+        {"id": "wamid.1", "status": "read", "timestamp": "1", "recipient_id": "1"}
+    ]
+    bodies = {
+        "whatsapp text": whatsapp_payload(template, 1, 0, "text", "hola"),
+        "whatsapp audio": whatsapp_payload(template, 1, 1, "audio", 25),
+        "whatsapp status": status,
+        "telegram text": telegram_payload(1, 0, "text", "hola"),
+        "telegram voice": telegram_payload(1, 1, "audio", 25),
+    }
+
+    print(f"{'payload':>16} {'bytes':>6} {'dicts':>9} {'events':>9}")
+    baseline: Callable[[bytes], Any]
+    fast: Callable[[bytes], Any]
+    for name, payload in bodies.items():
+        body = json.dumps(payload).encode()
+        if name.startswith("whatsapp"):
+            baseline, fast = dict_whatsapp, whatsapp_events
+        else:
+            baseline, fast = dict_telegram, telegram_event
+        dicts = measure(baseline, body, args.repeat)
+        events = measure(fast, body, args.repeat)
+        print(
+            f"{name:>16} {len(body):>6} {dicts:>7.2f}us {events:>7.2f}us "
+            f"({dicts / events:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
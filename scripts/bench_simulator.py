@@ -0,0 +1,73 @@
+import argparse
+import asyncio
+import logging
+import time
+
+from chatbot_template.utils.simulator import ConversationSimulator
+from chatbot_template.utils.workflow import WorkflowEngine
+
+
+async def simulate(args: argparse.Namespace) -> None:
+    """Generates the conversations, then replays and profiles them."""
+    engine = WorkflowEngine(args.yaml, args.errors)
+    simulator = ConversationSimulator(engine, args.seed, args.invalid)
+
+    start = time.perf_counter()
+    conversations = await simulator.generate_many(args.users)
+    generated = time.perf_counter() - start
+    messages = sum(len(conversation.events) for conversation in conversations)
+    print(
+        f"seed {simulator.seed}: {args.users} conversations, {messages} messages "
+        f"({messages / args.users:.1f} per user), generated in {generated:.2f} s"
+    )
+
+    for concurrency in args.concurrency:
+        reports = [
+            await simulator.replay(conversations, concurrency)
+            for _ in range(args.repeat)
+        ]
+        report = max(reports, key=lambda report: report.engine_messages_per_second)
+        print(
+            f"{concurrency:>6} users at a time: "
+            f"{report.engine_messages_per_second:,.0f} msg/s in the engine "
+            f"({1e6 / report.engine_messages_per_second:.2f} us/message), "
+            f"{report.messages_per_second:,.0f} msg/s with scheduling, "
+            f"{report.diverged} diverged replies"
+        )
+
+    print("messages per phase:", report.phases)
+    print("invalid answers:", report.rejected)
+
+    profile = await simulator.profile(conversations[: args.profile_users], args.top)
+    print(
+        f"allocations over {profile.messages} messages: "
+        f"{profile.retained_bytes:.1f} bytes held per message, peak per phase "
+        + ", ".join(
+            f"{phase} {peak:.0f} B" for phase, peak in profile.peak_bytes.items()
+        )
+    )
+    for site, size, count in profile.sites:
+        print(f"  {size:8.1f} B {count:6.2f} blocks per message  {site}")
+
+
+def main() -> None:
+    """Engine-only throughput and allocations of seeded simulated conversations."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--yaml", default="chatbot_template/config/workflow.yml")
+    parser.add_argument("--errors", default="chatbot_template/config/errors.yml")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--invalid", type=float, default=0.2)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--profile-users", type=int, default=500)
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    # The engine logs every answer at debug level, keep it out of the timing
+    logging.disable(logging.INFO)
+    asyncio.run(simulate(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import gc
+import json
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+from chatbot_template.utils.conversation import ConversationState
+from chatbot_template.utils.enums import Phase
+
+# Where idle users usually wait: in the middle of the forms
+LEGACY_STATE = {"lang": "es", "phase": "formulaires", "step": 2}
+STATE = ConversationState("es", Phase.FORMULAIRES, 2)
+
+
+def measure(build: Callable[[int], Any], users: int) -> float:
+    """
+    Bytes allocated per user to hold `build(i)` for `users` users.
+
+    Parameters
+    ----------
+    build : Callable[[int], Any]
+        Builds the state of the i-th user.
+    users : int
+        Number of users held at once.
+
+    Returns
+    -------
+    float
+        Mean bytes per state, the list holding them excluded.
+    """
+    holder: list[Any] = [None] * users
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(users):
+        holder[i] = build(i)
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del holder
+    return allocated / users
+
+
+def main() -> None:
+    """Compares the memory of idle users held as dicts and as ConversationState."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    legacy_raw = json.dumps(LEGACY_STATE, separators=(",", ":")).encode()
+    raw = STATE.to_bytes()
+    cases: dict[str, Callable[[int], Any]] = {
+        "dict, built": lambda i: {"lang": "es", "phase": "formulaires", "step": 2},
+        "dict, from JSON": lambda i: json.loads(legacy_raw),
+        "ConversationState, built": lambda i: ConversationState(
+            "es", Phase.FORMULAIRES, 2
+        ),
+        "ConversationState, from bytes": lambda i: ConversationState.from_bytes(raw),
+    }
+
+    print(f"{args.users:,} idle users")
+    print(f"{'':>30} {'bytes/user':>10} {'MiB':>8}")
+    for name, build in cases.items():
+        per_user = measure(build, args.users)
+        total = per_user * args.users / 2**20
+        print(f"{name:>30} {per_user:>10.1f} {total:>8.1f}")
+
+    print(f"{'serialized, JSON':>30} {len(legacy_raw):>10}")
+    print(f"{'serialized, binary':>30} {len(raw):>10}")
+
+
+if __name__ == "__main__":
+    main()
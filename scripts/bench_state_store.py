@@ -0,0 +1,103 @@
+import argparse
+import asyncio
+import importlib.util
+import os
+import tempfile
+import time
+
+from chatbot_template.utils.conversation import ConversationState
+from chatbot_template.utils.enums import Phase
+from chatbot_template.utils.state_store import (
+    MemoryStateStore,
+    RedisStateStore,
+    SQLiteStateStore,
+    StateStore,
+)
+
+from scripts.resp_server import RespServer
+
+
+async def bench(store: StateStore, users: int, batch: int) -> dict[str, float]:
+    """
+    Measures single and batched operations per second of a store.
+
+    Parameters
+    ----------
+    store : StateStore
+        The backend to benchmark.
+    users : int
+        Number of distinct users written and read.
+    batch : int
+        Size of the batches used by `get_many`/`put_many`.
+
+    Returns
+    -------
+    dict[str, float]
+        Operations per second for each kind of operation.
+    """
+    user_ids = [str(i) for i in range(users)]
+    state = ConversationState("es", Phase.FORMULAIRES, 2)
+    results: dict[str, float] = {}
+
+    start = time.perf_counter()
+    for user_id in user_ids:
+        await store.put(user_id, state)
+    results["put"] = users / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for user_id in user_ids:
+        await store.get(user_id)
+    results["get"] = users / (time.perf_counter() - start)
+
+    batches = [user_ids[i : i + batch] for i in range(0, users, batch)]
+    start = time.perf_counter()
+    for chunk in batches:
+        await store.put_many(dict.fromkeys(chunk, state))
+    results["put_many"] = users / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for chunk in batches:
+        await store.get_many(chunk)
+    results["get_many"] = users / (time.perf_counter() - start)
+
+    return results
+
+
+async def main(users: int, batch: int, redis_url: str | None) -> None:
+    """Runs the benchmark over every backend."""
+    with tempfile.TemporaryDirectory() as folder:
+        stores: dict[str, StateStore] = {
+            "memory": MemoryStateStore(),
+            "sqlite": SQLiteStateStore(os.path.join(folder, "states.db")),
+        }
+        server = None
+        if importlib.util.find_spec("redis") is None:
+            print("Skipping redis: install the `redis` extra to benchmark it.")
+        else:
+            if redis_url is None:
+                server = RespServer(port=0)
+                await server.start()
+                redis_url = server.url
+            stores["redis"] = RedisStateStore(redis_url)
+
+        for name, store in stores.items():
+            results = await bench(store, users, batch)
+            await store.aclose()
+            print(
+                f"{name:>6}: "
+                + ", ".join(f"{op} {ops:,.0f} ops/s" for op, ops in results.items())
+            )
+
+        if server is not None:
+            await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ops/sec of each StateStore.")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument(
+        "--redis-url", help="Real Redis server, the local stand-in otherwise."
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.batch, args.redis_url))
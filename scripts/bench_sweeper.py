@@ -0,0 +1,116 @@
+import argparse
+import asyncio
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+
+from chatbot_template.utils.conversation import ConversationState
+from chatbot_template.utils.enums import Phase
+from chatbot_template.utils.state_store import (
+    MemoryStateStore,
+    SQLiteStateStore,
+    StateStore,
+)
+from chatbot_template.utils.sweeper import StateSweeper
+
+
+async def fill(store: StateStore, users: int) -> None:
+    """Writes the state of `users` idle users, in batches."""
+    state = ConversationState("es", Phase.FORMULAIRES, 2)
+    chunk = 10_000
+    for start in range(0, users, chunk):
+        await store.put_many(
+            {str(i): state.copy() for i in range(start, min(users, start + chunk))}
+        )
+
+
+async def sweep_all(sweeper: StateSweeper) -> list[float]:
+    """Sweeps until a sweep evicts nothing, returning the seconds of each one."""
+    durations: list[float] = []
+    while True:
+        start = time.perf_counter()
+        evicted = await sweeper.sweep()
+        durations.append(time.perf_counter() - start)
+        if not evicted:
+            return durations
+
+
+async def bench(store: StateStore, users: int, batch: int, ttl: float) -> dict:
+    """
+    Fills a store with idle users and times the sweeps once they expired.
+
+    Parameters
+    ----------
+    store : StateStore
+        The backend to benchmark, with a TTL of `ttl` seconds.
+    users : int
+        Number of idle users written.
+    batch : int
+        Maximum number of states removed per sweep.
+    ttl : float
+        TTL of the store, waited for before sweeping.
+
+    Returns
+    -------
+    dict
+        Sweeps run, mean and worst milliseconds per sweep and the states left.
+    """
+    await fill(store, users)
+    await asyncio.sleep(ttl)
+    durations = await sweep_all(StateSweeper(store, batch=batch))
+    return {
+        "sweeps": len(durations),
+        "mean_ms": sum(durations) / len(durations) * 1e3,
+        "worst_ms": max(durations) * 1e3,
+        "left": await store.count(),
+    }
+
+
+async def memory_reclaimed(users: int, batch: int, ttl: float) -> tuple[float, float]:
+    """MiB held by the in-memory store before and after sweeping idle users."""
+    store = MemoryStateStore(max_entries=users, ttl=ttl)
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    await fill(store, users)
+    held = tracemalloc.get_traced_memory()[0] - base
+    await asyncio.sleep(ttl)
+    await sweep_all(StateSweeper(store, batch=batch))
+    gc.collect()
+    left = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    return held / 2**20, left / 2**20
+
+
+async def main(users: int, batch: int, ttl: float) -> None:
+    """Runs the benchmark over the backends that sweep their own states."""
+    with tempfile.TemporaryDirectory() as folder:
+        stores: dict[str, StateStore] = {
+            "memory": MemoryStateStore(max_entries=users, ttl=ttl),
+            "sqlite": SQLiteStateStore(os.path.join(folder, "states.db"), ttl=ttl),
+        }
+        print(f"{users:,} idle users, up to {batch} evictions per sweep")
+        for name, store in stores.items():
+            result = await bench(store, users, batch, ttl)
+            await store.aclose()
+            print(
+                f"{name:>7}: {result['sweeps']} sweeps, "
+                f"{result['mean_ms']:.2f} ms mean, {result['worst_ms']:.2f} ms worst, "
+                f"{result['left']} left"
+            )
+
+    held, left = await memory_reclaimed(users, batch, ttl)
+    print(f" memory: {held:.1f} MiB held by idle users, {left:.1f} MiB after sweeping")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Cost of sweeping expired states per tick."
+    )
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--ttl", type=float, default=2.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.batch, args.ttl))
@@ -0,0 +1,381 @@
+import argparse
+import asyncio
+import copy
+import importlib
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from contextlib import redirect_stdout
+from types import ModuleType
+from typing import Any
+
+import httpx
+
+EXAMPLE_PAYLOAD = "chatbot_template/utils/whatsapp_api_call_example.json"
+CONFIG_FOLDER = "chatbot_template/config"
+BASELINE_FOLDER = ".benchmarks"
+
+# (type, value) of every message of a synthetic conversation, the first one
+# only opens it. Numbers out of range and short audios exercise the errors.
+CONVERSATION: list[tuple[str, Any]] = [
+    ("text", "hola"),
+    ("text", "ES"),
+    ("text", "2"),
+    ("text", "9"),
+    ("text", "4"),
+    ("text", "1"),
+    ("text", "3"),
+    ("audio", 10),
+    ("audio", 25),
+    ("text", "ciao"),
+]
+
+# Metrics where a higher value is a regression, the others regress downwards.
+HIGHER_IS_WORSE: frozenset[str] = frozenset(
+    [f"{kind}_p{q}_ms" for kind in ("ack", "reply") for q in (50, 95, 99)]
+    + ["memory_per_conversation_kib"]
+)
+
+
+def whatsapp_payload(
+    template: dict, user: int, index: int, kind: str, value: Any
+) -> dict:
+    """
+    Builds a WhatsApp Cloud API notification shaped like `EXAMPLE_PAYLOAD`.
+
+    Parameters
+    ----------
+    template : dict
+        The example notification.
+    user : int
+        Number of the synthetic user.
+    index : int
+        Position of the message in the conversation.
+    kind : str
+        "text" or "audio".
+    value : Any
+        The text body, or the duration in seconds of the audio.
+
+    Returns
+    -------
+    dict
+        The notification posted to the webhook.
+    """
+    payload = copy.deepcopy(template)
+    value_obj = payload["entry"][0]["changes"][0]["value"]
+    phone = f"34600{user:06d}"
+    value_obj["contacts"][0]["wa_id"] = phone
+    message: dict[str, Any] = {
+        "from": phone,
+        "id": f"wamid.{user}.{index}",
+        "timestamp": str(1_700_000_000 + index),
+        "type": kind,
+    }
+    if kind == "text":
+        message["text"] = {"body": value}
+    else:
+        message["audio"] = {"id": f"media-{user}-{index}", "duration": value}
+    value_obj["messages"] = [message]
+    return payload
+
+
+def telegram_payload(user: int, index: int, kind: str, value: Any) -> dict:
+    """
+    Builds a Telegram Bot API update.
+
+    Parameters
+    ----------
+    user : int
+        Number of the synthetic user.
+    index : int
+        Position of the message in the conversation.
+    kind : str
+        "text" or "audio".
+    value : Any
+        The text body, or the duration in seconds of the voice note.
+
+    Returns
+    -------
+    dict
+        The update posted to the webhook.
+    """
+    chat = {"id": 100_000 + user, "type": "private"}
+    message: dict[str, Any] = {
+        "message_id": index,
+        "from": {"id": 100_000 + user, "is_bot": False, "first_name": f"user{user}"},
+        "chat": chat,
+        "date": 1_700_000_000 + index,
+    }
+    if kind == "text":
+        message["text"] = value
+    else:
+        message["voice"] = {"file_id": f"voice-{user}-{index}", "duration": value}
+    return {"update_id": user * len(CONVERSATION) + index, "message": message}
+
+
+def load_hook(name: str, media_folder: str) -> ModuleType:
+    """
+    Imports a hook with its outbound calls mocked and in-memory state.
+
+    Parameters
+    ----------
+    name : str
+        "whatsapp" or "telegram".
+    media_folder : str
+        Where the WhatsApp hook writes the downloaded audios.
+
+    Returns
+    -------
+    ModuleType
+        The hook module, exposing `app`, `lifespan`, `dispatcher` and `outbox`.
+    """
+    # Queued JSON logs above warnings unless asked otherwise, see bench_logging.
+    os.environ.setdefault("LOG_MODE", "prod")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.update(
+        OUTBOUND_MOCK="1",
+        # The hooks are measured, not the pacing of the APIs, see bench_outbox
+        OUTBOX_RATE="0",
+        OUTBOX_CHAT_RATE="0",
+        # The mocked media are not audio files, see bench_audio
+        AUDIO_WORKERS="0",
+        STATE_STORE_URL="memory://",
+        WORKFLOW_YAML_PATH=os.path.join(CONFIG_FOLDER, "workflow.yml"),
+        ERRORS_YAML_PATH=os.path.join(CONFIG_FOLDER, "errors.yml"),
+        WORKFLOW_RELOAD_INTERVAL="0",
+        MEDIA_FOLDER=media_folder,
+    )
+    return importlib.import_module(f"scripts.{name}_hook")
+
+
+def percentile(samples: list[float], q: int) -> float:
+    """The `q`-th percentile of `samples`."""
+    return statistics.quantiles(samples, n=100, method="inclusive")[q - 1]
+
+
+def hook_user_id(payload: dict) -> Any:
+    """The id the hook uses to address the sender of `payload`."""
+    if "entry" in payload:
+        return payload["entry"][0]["changes"][0]["value"]["messages"][0]["from"]
+    return payload["message"]["from"]["id"]
+
+
+async def replay(
+    hook: ModuleType,
+    build: Callable[[int, int, str, Any], dict],
+    users: range,
+    concurrency: int,
+) -> dict[str, Any]:
+    """
+    Posts the conversation of every user to the hook and waits for the replies.
+
+    Like a person chatting, each user waits for the reply to a message before
+    sending the next one, and at most `concurrency` conversations run at once.
+
+    Parameters
+    ----------
+    hook : ModuleType
+        The hook returned by `load_hook`.
+    build : (int, int, str, Any) -> dict
+        Builds the payload of a message from `(user, index, kind, value)`.
+    users : range
+        Numbers of the synthetic users.
+    concurrency : int
+        Maximum number of conversations in flight.
+
+    Returns
+    -------
+    dict[str, Any]
+        Acknowledgement and reply latencies in seconds, and the elapsed time.
+    """
+    acks: list[float] = []
+    replies: list[float] = []
+    waiting: dict[str, asyncio.Future[float]] = {}
+    send_message = hook.outbox.send
+
+    async def record_reply(to: Any, text: str) -> httpx.Response:
+        response = await send_message(to, text)
+        future = waiting.pop(str(to), None)
+        if future is not None:
+            future.set_result(time.perf_counter())
+        return response
+
+    hook.outbox.send = record_reply
+    payloads = {
+        user: [
+            build(user, i, kind, value) for i, (kind, value) in enumerate(CONVERSATION)
+        ]
+        for user in users
+    }
+    user_ids = {user: str(hook_user_id(payloads[user][0])) for user in users}
+    slots = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+
+    transport = httpx.ASGITransport(app=hook.app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+
+        async def converse(user: int) -> None:
+            async with slots:
+                for payload in payloads[user]:
+                    replied = waiting[user_ids[user]] = loop.create_future()
+                    start = time.perf_counter()
+                    response = await client.post("/webhook", json=payload)
+                    acks.append(time.perf_counter() - start)
+                    response.raise_for_status()
+                    replies.append(await replied - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(converse(user) for user in users))
+        await hook.dispatcher.join()
+        await hook.outbox.join()
+        if hasattr(hook, "media"):
+            await hook.media.join()
+        elapsed = time.perf_counter() - start
+
+    hook.outbox.send = send_message
+    return {"acks": acks, "replies": replies, "elapsed": elapsed}
+
+
+async def run(name: str, users: int, concurrency: int, memory_users: int) -> dict:
+    """
+    Load tests a hook in-process and returns its metrics.
+
+    Parameters
+    ----------
+    name : str
+        "whatsapp" or "telegram".
+    users : int
+        Conversations replayed for the latency and throughput figures.
+    concurrency : int
+        Maximum number of conversations in flight.
+    memory_users : int
+        Conversations replayed while tracing memory allocations.
+
+    Returns
+    -------
+    dict
+        The metrics, in the layout of the saved baselines.
+    """
+    # Every mocked outbound request is logged by httpx at INFO level.
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    with open(EXAMPLE_PAYLOAD) as file:
+        template = json.load(file)
+
+    def build(user: int, index: int, kind: str, value: Any) -> dict:
+        if name == "whatsapp":
+            return whatsapp_payload(template, user, index, kind, value)
+        return telegram_payload(user, index, kind, value)
+
+    with tempfile.TemporaryDirectory() as media_folder:
+        # The hooks print every payload, keep them out of the measurement output.
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            hook = load_hook(name, media_folder)
+            async with hook.lifespan(hook.app):
+                timings = await replay(hook, build, range(users), concurrency)
+
+                tracemalloc.start()
+                before = tracemalloc.get_traced_memory()[0]
+                await replay(
+                    hook, build, range(users, users + memory_users), concurrency
+                )
+                retained = tracemalloc.get_traced_memory()[0] - before
+                tracemalloc.stop()
+
+    acks = [seconds * 1000 for seconds in timings["acks"]]
+    replies = [seconds * 1000 for seconds in timings["replies"]]
+    return {
+        "hook": name,
+        "requests": len(acks),
+        "requests_per_second": round(len(acks) / timings["elapsed"], 1),
+        **{f"ack_p{q}_ms": round(percentile(acks, q), 3) for q in (50, 95, 99)},
+        **{f"reply_p{q}_ms": round(percentile(replies, q), 3) for q in (50, 95, 99)},
+        "memory_per_conversation_kib": round(retained / memory_users / 1024, 2),
+    }
+
+
+def compare(metrics: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Lists the metrics that regressed against a baseline.
+
+    Parameters
+    ----------
+    metrics : dict
+        The metrics of this run.
+    baseline : dict
+        The metrics of the saved baseline.
+    tolerance : float
+        Relative slack before a change counts as a regression, e.g. 0.2.
+
+    Returns
+    -------
+    list[str]
+        A description of every regression, empty if there are none.
+    """
+    regressions = []
+    for key, reference in baseline.items():
+        if not isinstance(reference, int | float) or key == "requests":
+            continue
+        value = metrics[key]
+        if key in HIGHER_IS_WORSE:
+            regressed = value > reference * (1 + tolerance)
+        else:
+            regressed = value < reference * (1 - tolerance)
+        if regressed:
+            regressions.append(f"{key}: {value:,} vs baseline {reference:,}")
+    return regressions
+
+
+def main() -> None:
+    """Load tests the webhooks in-process against JSON baselines."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--hook", choices=["whatsapp", "telegram"], default="whatsapp")
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--memory-users", type=int, default=500)
+    parser.add_argument("--baseline", help=f"Default: {BASELINE_FOLDER}/<hook>.json")
+    parser.add_argument("--save", action="store_true", help="Overwrite the baseline.")
+    parser.add_argument(
+        "--require-baseline",
+        action="store_true",
+        help="Fail when no baseline was saved, e.g. in CI.",
+    )
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    metrics = asyncio.run(
+        run(args.hook, args.users, args.concurrency, args.memory_users)
+    )
+    print(json.dumps(metrics, indent=2))
+
+    baseline_path = args.baseline or os.path.join(BASELINE_FOLDER, f"{args.hook}.json")
+    if args.save:
+        os.makedirs(os.path.dirname(baseline_path) or ".", exist_ok=True)
+        with open(baseline_path, "w") as file:
+            json.dump(metrics, file, indent=2)
+        print(f"Baseline saved to {baseline_path}")
+        return
+    if not os.path.exists(baseline_path):
+        print(f"No baseline at {baseline_path}, run with --save to create it")
+        if args.require_baseline:
+            sys.exit(1)
+        return
+
+    with open(baseline_path) as file:
+        regressions = compare(metrics, json.load(file), args.tolerance)
+    if regressions:
+        print("Regressions against " + baseline_path)
+        print("\n".join(f"  {regression}" for regression in regressions))
+        sys.exit(1)
+    print(f"No regressions against {baseline_path} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+import httpx
+
+from scripts.bench_webhooks import (
+    CONFIG_FOLDER,
+    CONVERSATION,
+    EXAMPLE_PAYLOAD,
+    telegram_payload,
+    whatsapp_payload,
+)
+
+
+def free_port() -> int:
+    """A TCP port nobody listens on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(hook: str, workers: int, port: int, folder: str) -> subprocess.Popen:
+    """
+    Serves a hook through `scripts.serve` with mocked outbound calls.
+
+    Parameters
+    ----------
+    hook : str
+        "whatsapp" or "telegram".
+    workers : int
+        Number of worker processes.
+    port : int
+        Port the workers listen on.
+    folder : str
+        Where the SQLite states and the audios are written.
+
+    Returns
+    -------
+    subprocess.Popen
+        The server process.
+    """
+    env = os.environ | {
+        "LOG_MODE": os.environ.get("LOG_MODE", "prod"),
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+        "OUTBOUND_MOCK": "1",
+        "OUTBOX_RATE": "0",
+        "OUTBOX_CHAT_RATE": "0",
+        # The mocked media are not audio files
+        "AUDIO_WORKERS": "0",
+        "STATE_STORE_URL": f"sqlite:///{folder}/user_states.db",
+        "WORKFLOW_YAML_PATH": os.path.join(CONFIG_FOLDER, "workflow.yml"),
+        "ERRORS_YAML_PATH": os.path.join(CONFIG_FOLDER, "errors.yml"),
+        "WORKFLOW_RELOAD_INTERVAL": "0",
+        "MEDIA_FOLDER": folder,
+    }
+    command = [sys.executable, "-m", "scripts.serve", "--hook", hook]
+    command += ["--workers", str(workers), "--host", "127.0.0.1", "--port", str(port)]
+    return subprocess.Popen(command, env=env)
+
+
+async def wait_ready(base_url: str, timeout: float = 60.0) -> None:
+    """Polls `/metrics` until the server answers."""
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while True:
+            try:
+                (await client.get("/metrics")).raise_for_status()
+                return
+            except httpx.TransportError:
+                if time.perf_counter() > deadline:
+                    raise
+                await asyncio.sleep(0.1)
+
+
+async def converse_all(base_url: str, hook: str, users: range, concurrency: int) -> int:
+    """
+    Posts the conversation of every user, each waiting for the acknowledgement.
+
+    Parameters
+    ----------
+    base_url : str
+        URL of the server.
+    hook : str
+        "whatsapp" or "telegram".
+    users : range
+        Numbers of the synthetic users.
+    concurrency : int
+        Maximum number of conversations in flight.
+
+    Returns
+    -------
+    int
+        Number of messages posted.
+    """
+    with open(EXAMPLE_PAYLOAD) as file:
+        template = json.load(file)
+
+    def build(user: int, index: int, kind: str, value: Any) -> dict:
+        if hook == "whatsapp":
+            return whatsapp_payload(template, user, index, kind, value)
+        return telegram_payload(user, index, kind, value)
+
+    slots = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+
+        async def converse(user: int) -> None:
+            async with slots:
+                for index, (kind, value) in enumerate(CONVERSATION):
+                    payload = build(user, index, kind, value)
+                    (await client.post("/webhook", json=payload)).raise_for_status()
+
+        await asyncio.gather(*(converse(user) for user in users))
+    return len(users) * len(CONVERSATION)
+
+
+def client_process(base_url: str, hook: str, users: range, concurrency: int) -> int:
+    """Runs `converse_all` in a load generator process."""
+    return asyncio.run(converse_all(base_url, hook, users, concurrency))
+
+
+def run(hook: str, workers: int, users: int, concurrency: int, clients: int) -> dict:
+    """
+    Loads a server with `workers` processes and returns its throughput.
+
+    Messages are acknowledged before they are handled, so the server is
+    stopped right after the last acknowledgement: it drains its queues before
+    exiting, and the time until it exits covers every reply.
+
+    Parameters
+    ----------
+    hook : str
+        "whatsapp" or "telegram".
+    workers : int
+        Number of worker processes.
+    users : int
+        Conversations posted.
+    concurrency : int
+        Maximum number of conversations in flight, per load generator.
+    clients : int
+        Number of load generator processes.
+
+    Returns
+    -------
+    dict
+        Acknowledged and handled messages per second, and the users whose
+        state was stored.
+    """
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as folder:
+        server = start_server(hook, workers, port, folder)
+        try:
+            asyncio.run(wait_ready(base_url))
+            shards = [range(start, users, clients) for start in range(clients)]
+            start = time.perf_counter()
+            with ProcessPoolExecutor(clients) as pool:
+                messages = sum(
+                    pool.map(
+                        client_process,
+                        [base_url] * clients,
+                        [hook] * clients,
+                        shards,
+                        [concurrency] * clients,
+                    )
+                )
+            acknowledged = time.perf_counter() - start
+            server.send_signal(signal.SIGINT)
+            server.wait(timeout=120)
+            handled = time.perf_counter() - start
+        finally:
+            if server.poll() is None:
+                server.kill()
+
+        with sqlite3.connect(os.path.join(folder, "user_states.db")) as connection:
+            (stored,) = connection.execute(
+                "SELECT COUNT(*) FROM user_states"
+            ).fetchone()
+
+    return {
+        "workers": workers,
+        "messages": messages,
+        "acknowledged_per_second": round(messages / acknowledged, 1),
+        "handled_per_second": round(messages / handled, 1),
+        "users_with_state": stored,
+    }
+
+
+def main() -> None:
+    """Measures how the throughput of the hooks scales with worker processes."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--hook", choices=["whatsapp", "telegram"], default="whatsapp")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=sorted({1, 2, os.cpu_count() or 1}),
+    )
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--clients", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.clients} load generator processes")
+    results = []
+    for workers in args.workers:
+        result = run(args.hook, workers, args.users, args.concurrency, args.clients)
+        print(json.dumps(result))
+        results.append(result)
+
+    single = results[0]["handled_per_second"]
+    for result in results:
+        speedup = result["handled_per_second"] / single
+        print(f"{result['workers']:>3} workers: {speedup:.2f}x the first run")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+import argparse
+import asyncio
+import time
+import timeit
+from typing import Any
+
+from chatbot_template.utils.conversation import ConversationState
+from chatbot_template.utils.enums import WorkflowError
+from chatbot_template.utils.events import MessageEvent
+from chatbot_template.utils.workflow import WorkflowEngine
+
+CONVERSATION: list[MessageEvent] = [
+    MessageEvent("msg", "bench", "text", text="ES"),
+    MessageEvent("msg", "bench", "text", text="2"),
+    MessageEvent("msg", "bench", "text", text="9"),
+    MessageEvent("msg", "bench", "text", text="4"),
+    MessageEvent("msg", "bench", "text", text="1"),
+    MessageEvent("msg", "bench", "text", text="3"),
+    MessageEvent("msg", "bench", "audio", media_id="fake-audio-id", duration=10),
+    MessageEvent("msg", "bench", "audio", media_id="fake-audio-id", duration=25),
+    MessageEvent("msg", "bench", "text", text="ciao"),
+]
+
+
+def legacy_entry(event: MessageEvent) -> dict:
+    """`event` as the raw message dict the if/elif chain read."""
+    if event.type == "text":
+        return {"type": "text", "text": {"body": event.text}}
+    return {
+        "type": event.type,
+        event.type: {"id": event.media_id, "duration": event.duration},
+    }
+
+
+class IfElifChain:
+    """
+    Frozen copy of `process_message` before the workflow was compiled.
+
+    It walks the nested `QUESTIONS` dicts and an if/elif chain over the phase
+    names on every message, and is only kept to measure the gain of the
+    compiled engine. Its audio branch no longer prints the id of the audio.
+
+    Parameters
+    ----------
+    questions : dict
+        The `QUESTIONS` of the workflow.
+    errors : dict
+        The `ERRORS` of the workflow.
+
+    Functions
+    ---------
+    process_message : (str, dict, dict) -> tuple[dict, str]
+        Processes a single message from a user and updates the state accordingly.
+    """
+
+    ORDER = ["presentation", "formulaires", "audio_questions", "conclusion"]
+
+    def __init__(self, questions: dict, errors: dict):
+        self.questions = questions
+        self.errors = errors
+
+    def get_step(self, lang: str, phase: str, step: int) -> str | None:
+        """The prompt of a step, None if it does not exist."""
+        try:
+            section = self.questions[lang][phase]
+            if step < len(section):
+                current = section[step]
+                if "text" in current:
+                    return current["text"]
+                if "question" in current:
+                    return current["question"]
+            return None
+        except KeyError:
+            return None
+
+    def get_error_message(self, lang: str, error_type: WorkflowError) -> str:
+        """The message of an error, looked up in the nested dicts."""
+        return self.errors.get(lang, {}).get(
+            error_type.upper(), WorkflowError.UNKNOWN_STATE
+        )
+
+    async def process_message(
+        self, user_id: str, entry: dict, state: dict[str, Any]
+    ) -> tuple[dict, str]:
+        """The reply to `entry`, updating `state` in place."""
+        lang: str = state.get("lang", "es")
+        phase: str = state.get("phase", "presentation")
+        msg_type = entry["type"]
+        unknown = WorkflowError.UNKNOWN_STATE
+
+        if phase == "presentation":
+            if msg_type == "text":
+                text: str = entry["text"]["body"].strip().upper()
+                if text in ["ES", "CAST", "CASTELLANO", "ESPAÑOL", "ESP"]:
+                    state["lang"] = "es"
+                elif text in ["CAT", "CATALAN", "CATALÀ"]:
+                    state["lang"] = "ca"
+                else:
+                    return state, self.get_error_message(
+                        lang, WorkflowError.LANG_NOT_SUPPORTED
+                    )
+                state["phase"] = "formulaires"
+                state["step"] = 0
+                msg = self.get_step(state["lang"], "formulaires", 0)
+                if msg is not None:
+                    return state, msg
+                return state, self.get_error_message(lang, unknown)
+            return state, self.get_error_message(lang, WorkflowError.LANG_NOT_SUPPORTED)
+
+        elif phase == "formulaires":
+            if msg_type == "text":
+                answer: str = entry["text"]["body"].strip()
+                if answer.isdigit() and 0 <= int(answer) <= 4:
+                    state["step"] += 1
+                    next_msg = self.get_step(lang, "formulaires", state["step"])
+                    if next_msg:
+                        return state, next_msg
+                    state["phase"] = "audio_questions"
+                    state["step"] = 0
+                    next_msg = self.get_step(lang, "audio_questions", 0)
+                    if next_msg is not None:
+                        return state, next_msg
+                    return state, self.get_error_message(lang, unknown)
+                return state, self.get_error_message(lang, WorkflowError.INVALID_NUMBER)
+            return state, self.get_error_message(lang, WorkflowError.INVALID_NUMBER)
+
+        elif phase == "audio_questions":
+            audio_obj = entry.get("audio") or entry.get("voice")
+            if audio_obj:
+                if (audio_obj.get("duration") or 0) < 20:
+                    return state, self.get_error_message(
+                        lang, WorkflowError.AUDIO_TOO_SHORT
+                    )
+                state["step"] += 1
+                next_msg = self.get_step(lang, "audio_questions", state["step"])
+                if next_msg:
+                    return state, next_msg
+                state["phase"] = "conclusion"
+                state["step"] = 0
+                msg = self.get_step(lang, "conclusion", 0)
+                return state, msg or self.get_error_message(lang, unknown)
+            return state, self.get_error_message(lang, WorkflowError.NOT_AUDIO)
+
+        elif phase == "conclusion":
+            msg = self.get_step(lang, "conclusion", 0)
+            state.clear()
+            return state, msg or self.get_error_message(lang, unknown)
+
+        return state, self.get_error_message(lang, unknown)
+
+
+async def run_chain(chain: IfElifChain, conversations: int) -> float:
+    """
+    Replays `CONVERSATION` through the if/elif chain, like `run`.
+
+    Parameters
+    ----------
+    chain : IfElifChain
+        The chain to benchmark.
+    conversations : int
+        How many times the conversation is replayed.
+
+    Returns
+    -------
+    float
+        Mean microseconds spent in `process_message` per message.
+    """
+    entries = [legacy_entry(event) for event in CONVERSATION]
+    start = time.perf_counter()
+    for _ in range(conversations):
+        state: dict[str, Any] = {}
+        for entry in entries:
+            state, _ = await chain.process_message("bench", entry, state)
+    elapsed = time.perf_counter() - start
+    return elapsed / (conversations * len(entries)) * 1e6
+
+
+async def run(engine: WorkflowEngine, conversations: int) -> float:
+    """
+    Replays `CONVERSATION` and returns the mean cost per message.
+
+    Parameters
+    ----------
+    engine : WorkflowEngine
+        The engine to benchmark.
+    conversations : int
+        How many times the conversation is replayed.
+
+    Returns
+    -------
+    float
+        Mean microseconds spent in `process_message` per message.
+    """
+    start = time.perf_counter()
+    for _ in range(conversations):
+        state = ConversationState()
+        for entry in CONVERSATION:
+            state, _ = await engine.process_message("bench", entry, state)
+    elapsed = time.perf_counter() - start
+    return elapsed / (conversations * len(CONVERSATION)) * 1e6
+
+
+def error_lookups(engine: WorkflowEngine, repeat: int) -> tuple[float, float]:
+    """
+    Nanoseconds per error message lookup, in nested dicts and in the catalog.
+
+    Parameters
+    ----------
+    engine : WorkflowEngine
+        The engine whose messages are looked up.
+    repeat : int
+        How many times each lookup is timed, the best is kept.
+
+    Returns
+    -------
+    tuple[float, float]
+        (Nested dicts keyed by the upper case name, `MessageCatalog.error`)
+    """
+    errors = engine.errors
+    catalog = engine.catalog
+    # Every error, and one of a language without translations
+    lookups = [("es", error) for error in WorkflowError]
+    lookups.append(("ca", WorkflowError.NOT_AUDIO))
+
+    def nested() -> None:
+        for lang, error in lookups:
+            errors.get(lang, {}).get(error.upper(), WorkflowError.UNKNOWN_STATE)
+
+    def flat() -> None:
+        for lang, error in lookups:
+            catalog.error(lang, error)
+
+    number = 20_000
+    per_lookup = number * len(lookups) / 1e9
+    return (
+        min(timeit.repeat(nested, number=number, repeat=repeat)) / per_lookup,
+        min(timeit.repeat(flat, number=number, repeat=repeat)) / per_lookup,
+    )
+
+
+async def replay_batch(
+    engine: WorkflowEngine,
+) -> list[tuple[ConversationState, MessageEvent]]:
+    """Every message of `CONVERSATION` with the state of the user when it came."""
+    state, batch = ConversationState(), []
+    for entry in CONVERSATION:
+        batch.append((state.copy(), entry))
+        state, _ = await engine.process_message("bench", entry, state)
+    return batch
+
+
+def validations(engine: WorkflowEngine, repeat: int) -> float:
+    """
+    Nanoseconds per answer checked through `WorkflowEngine.validate_many`.
+
+    Parameters
+    ----------
+    engine : WorkflowEngine
+        The engine whose validators are used.
+    repeat : int
+        How many times the batch is timed, the best is kept.
+
+    Returns
+    -------
+    float
+        Mean nanoseconds per answer of a batch of 1000 conversations.
+    """
+    batch = asyncio.run(replay_batch(engine)) * 1000
+    best = min(
+        timeit.repeat(lambda: engine.validate_many(batch), number=10, repeat=repeat)
+    )
+    return best / (10 * len(batch)) * 1e9
+
+
+def main() -> None:
+    """Microbenchmark of `WorkflowEngine.process_message` dispatch."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--yaml", default="chatbot_template/config/workflow.yml")
+    parser.add_argument("--errors", default="chatbot_template/config/errors.yml")
+    parser.add_argument("--conversations", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = WorkflowEngine(args.yaml, args.errors)
+    chain = IfElifChain(engine.questions, engine.errors)
+    per_message = min(
+        asyncio.run(run(engine, args.conversations)) for _ in range(args.repeat)
+    )
+    per_chain = min(
+        asyncio.run(run_chain(chain, args.conversations)) for _ in range(args.repeat)
+    )
+    print(
+        f"process_message: {per_message:.3f} us/message compiled, "
+        f"{per_chain:.3f} us/message in the if/elif chain "
+        f"({per_chain / per_message:.2f}x, best of {args.repeat})"
+    )
+    nested, flat = error_lookups(engine, args.repeat)
+    print(
+        f"error lookup: {nested:.1f} ns in nested dicts, {flat:.1f} ns in the catalog"
+    )
+    print(f"validate_many: {validations(engine, args.repeat):.1f} ns/answer")
+
+
+if __name__ == "__main__":
+    main()
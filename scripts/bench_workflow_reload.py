@@ -0,0 +1,115 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+import yaml
+
+from chatbot_template.utils.workflow import PHASE_ORDER, WorkflowEngine
+
+from scripts.bench_workflow import CONVERSATION, run
+
+
+def write_config(folder: str, languages: int, steps: int) -> tuple[str, str]:
+    """
+    Writes a synthetic workflow and errors YAML with many languages and steps.
+
+    Parameters
+    ----------
+    folder : str
+        Where the `.yml` files are written.
+    languages : int
+        Number of languages besides `es` and `ca`.
+    steps : int
+        Number of steps of every phase.
+
+    Returns
+    -------
+    tuple[str, str]
+        Paths of the workflow and errors files.
+    """
+    langs = ["es", "ca"] + [f"l{i}" for i in range(languages)]
+    questions = {
+        lang: {
+            phase: [{"question": f"{lang} {phase} {step}?"} for step in range(steps)]
+            for phase in PHASE_ORDER
+        }
+        for lang in langs
+    }
+    errors = {lang: {"INVALID_NUMBER": f"{lang}: 0-4"} for lang in langs}
+
+    workflow_path = os.path.join(folder, "workflow.yml")
+    errors_path = os.path.join(folder, "errors.yml")
+    with open(workflow_path, "w") as file:
+        yaml.safe_dump({"QUESTIONS": questions}, file, allow_unicode=True)
+    with open(errors_path, "w") as file:
+        yaml.safe_dump({"ERRORS": errors}, file, allow_unicode=True)
+    return workflow_path, errors_path
+
+
+def edit_prompt(path: str, version: int) -> None:
+    """Rewrites the first `es` conclusion prompt, a one-phase change."""
+    with open(path) as file:
+        text = file.read()
+    old = text[text.index("es conclusion 0") :].split("?", 1)[0]
+    with open(path, "w") as file:
+        file.write(text.replace(old, f"es conclusion 0 v{version}", 1))
+
+
+def main() -> None:
+    """Measures reload latency and `process_message` cost during reloads."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--languages", type=int, default=50)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--reloads", type=int, default=20)
+    parser.add_argument("--conversations", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        workflow_path, errors_path = write_config(folder, args.languages, args.steps)
+        engine = WorkflowEngine(workflow_path, errors_path)
+
+        full, incremental = [], []
+        for version in range(args.reloads):
+            start = time.perf_counter()
+            engine.reload(force=True)
+            full.append(time.perf_counter() - start)
+
+            edit_prompt(workflow_path, version)
+            start = time.perf_counter()
+            recompiled = engine.reload()
+            incremental.append(time.perf_counter() - start)
+        print(f"phases compiled: {len(engine.questions) * len(PHASE_ORDER):,}")
+        print(f"   full reload: {min(full) * 1000:,.2f} ms")
+        print(f"   edit reload: {min(incremental) * 1000:,.2f} ms ({recompiled})")
+
+        idle = asyncio.run(run(engine, args.conversations))
+
+        swaps = 0
+        stop = threading.Event()
+
+        def reloader() -> None:
+            nonlocal swaps
+            while not stop.is_set():
+                edit_prompt(workflow_path, swaps)
+                engine.reload()
+                swaps += 1
+
+        thread = threading.Thread(target=reloader)
+        thread.start()
+        busy = asyncio.run(run(engine, args.conversations))
+        stop.set()
+        thread.join()
+
+    messages = args.conversations * len(CONVERSATION)
+    print(f"process_message idle: {idle:.3f} us/message")
+    print(
+        f"process_message while reloading: {busy:.3f} us/message "
+        f"({swaps} swaps over {messages:,} messages)"
+    )
+
+
+if __name__ == "__main__":
+    main()
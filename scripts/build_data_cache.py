@@ -0,0 +1,34 @@
+import argparse
+import time
+from typing import Any
+
+from chatbot_template.utils.data_analysis import RANDOM_FACTS_DTYPES, USER_DTYPES
+from chatbot_template.utils.data_cache import build_cache, load_table
+
+
+def main() -> None:
+    """Builds the columnar caches of the `DataAnalysis` tables before serving."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--info", help="Table of actions per day and moment.")
+    parser.add_argument("--users", help="Table of users.")
+    parser.add_argument("--random-facts", help="Table of random facts.")
+    parser.add_argument("--cache-dir", help="Default: `.cache` next to each table.")
+    args = parser.parse_args()
+
+    tables: list[tuple[str | None, dict[str, Any]]] = [
+        (args.info, {"dtype": "string", "index_col": 0}),
+        (args.users, {"dtype": USER_DTYPES}),
+        (args.random_facts, {"dtype": RANDOM_FACTS_DTYPES}),
+    ]
+    for path, options in tables:
+        if path is None:
+            continue
+        folder = build_cache(path, args.cache_dir, **options)
+        start = time.perf_counter()
+        table = load_table(path, args.cache_dir, **options)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{path} -> {folder}: {len(table):,} rows, mmap load {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
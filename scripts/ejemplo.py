@@ -1,9 +1,11 @@
-from chatbot_template.utils.workflow import WorkflowEngine
-import pandas as pd
 from typing import Any
 
+import pandas as pd
+
+from chatbot_template.utils.data_cache import load_table
+
 # EJEMPLO CARGAR BBDD INFO
-database_info = pd.read_csv("chatbot_template/data/bd_iabd.csv")
+database_info = load_table("chatbot_template/data/bd_iabd.csv")
 
 # ejemplo bbdd users
 template_users: dict[str, Any] = {
@@ -12,9 +14,8 @@ template_users: dict[str, Any] = {
     "user_name": "",
     "password": "",
     "favourite_animal": "",
-    "loves_maths":"",
+    "loves_maths": "",
 }
 
 # EJEMPLO INICIALIZAR LA BBDD
 dataframe_users: pd.DataFrame = pd.DataFrame(template_users)
-
@@ -0,0 +1,140 @@
+import argparse
+import asyncio
+import time
+
+from chatbot_template.utils.state_store import _REDIS_PUT_IF_UNCHANGED
+
+# Minimal stand-in for a Redis server, enough for `RedisStateStore` tests and
+# benchmarks: PING, GET, SET [PX ms], MGET, DEL and EXISTS over RESP2, and
+# EVAL of the compare-and-set script of `put_if_unchanged`, run natively as
+# the stand-in has no Lua interpreter.
+
+CRLF = b"\r\n"
+
+
+class RespServer:
+    """
+    In-memory server speaking the subset of the Redis protocol used by the bot.
+
+    Parameters
+    ----------
+    host : str
+        Interface to listen on. Default = "127.0.0.1".
+    port : int
+        Port to listen on, 0 picks a free one. Default = 6390.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 6390):
+        self.host = host
+        self.port = port
+        self._data: dict[bytes, tuple[float, bytes]] = {}
+        self._server: asyncio.Server | None = None
+
+    @property
+    def url(self) -> str:
+        """The `redis://` URL to reach the server, pinned to RESP2."""
+        return f"redis://{self.host}:{self.port}/0?protocol=2"
+
+    async def start(self) -> None:
+        """Starts listening in the running event loop."""
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        """Stops listening and drops every connection."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while args := await _read_command(reader):
+                writer.write(self._execute(args))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    def _get(self, key: bytes) -> bytes | None:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[0] < time.monotonic():
+            del self._data[key]
+            return None
+        return item[1]
+
+    def _put_if_unchanged(
+        self, key: bytes, expected: bytes, value: bytes, px: bytes
+    ) -> bytes:
+        """`_REDIS_PUT_IF_UNCHANGED`, atomic as commands run one at a time."""
+        if (self._get(key) or b"") != expected:
+            return b":0" + CRLF
+        expires_at = time.monotonic() + int(px) / 1000 if px else float("inf")
+        self._data[key] = (expires_at, value)
+        return b":1" + CRLF
+
+    def _execute(self, args: list[bytes]) -> bytes:
+        command = args[0].upper()
+        if command == b"PING":
+            return b"+PONG" + CRLF
+        if command == b"GET":
+            return _bulk(self._get(args[1]))
+        if command == b"MGET":
+            values = [_bulk(self._get(key)) for key in args[1:]]
+            return b"*%d" % len(values) + CRLF + b"".join(values)
+        if command == b"SET":
+            expires_at = float("inf")
+            if len(args) >= 5 and args[3].upper() == b"PX":
+                expires_at = time.monotonic() + int(args[4]) / 1000
+            self._data[args[1]] = (expires_at, args[2])
+            return b"+OK" + CRLF
+        if command in (b"DEL", b"EXISTS"):
+            keys = [key for key in args[1:] if self._get(key) is not None]
+            if command == b"DEL":
+                for key in keys:
+                    del self._data[key]
+            return b":%d" % len(keys) + CRLF
+        if command == b"EVAL":
+            if args[1].decode() != _REDIS_PUT_IF_UNCHANGED or args[2] != b"1":
+                return b"-ERR only the put_if_unchanged script is supported" + CRLF
+            return self._put_if_unchanged(*args[3:7])
+        return b"-ERR unknown command '" + args[0] + b"'" + CRLF
+
+
+async def _read_command(reader: asyncio.StreamReader) -> list[bytes]:
+    """Reads one RESP2 array of bulk strings, empty on EOF."""
+    header = await reader.readline()
+    if not header:
+        return []
+    args = []
+    for _ in range(int(header[1:])):
+        length = int((await reader.readline())[1:])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+def _bulk(value: bytes | None) -> bytes:
+    """Encodes a RESP2 bulk string, `$-1` for None."""
+    if value is None:
+        return b"$-1" + CRLF
+    return b"$%d" % len(value) + CRLF + value + CRLF
+
+
+async def serve(host: str, port: int) -> None:
+    """Runs the server until cancelled."""
+    server = RespServer(host, port)
+    await server.start()
+    print(f"Listening on {server.url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=RespServer.__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port))
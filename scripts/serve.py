@@ -0,0 +1,78 @@
+import argparse
+import logging
+import os
+from urllib.parse import urlparse
+
+import uvicorn
+
+from chatbot_template.utils.env import get_env
+
+pylogger = logging.getLogger(__name__)
+
+# Shared by every worker of the node when STATE_STORE_URL is not set.
+DEFAULT_STATE_STORE_URL = "sqlite:///.state/user_states.db"
+
+
+def shared_state_store_url(workers: int) -> str:
+    """
+    Returns the state store the workers share, exporting it to the workers.
+
+    Parameters
+    ----------
+    workers : int
+        Number of worker processes.
+
+    Returns
+    -------
+    str
+        `STATE_STORE_URL`, or a SQLite database in `.state/` if it is not set.
+
+    Raises
+    ------
+    ValueError
+        If several workers would each keep their own in-memory states.
+    """
+    url = get_env("STATE_STORE_URL", DEFAULT_STATE_STORE_URL)
+    scheme = urlparse(url).scheme
+    if scheme == "memory" and workers > 1:
+        message = (
+            f"STATE_STORE_URL={url} keeps the states inside each worker, "
+            "use sqlite:/// or redis:// with more than one worker"
+        )
+        pylogger.error(message)
+        raise ValueError(message)
+    if scheme == "sqlite":
+        folder = os.path.dirname(url.removeprefix("sqlite:///"))
+        os.makedirs(folder or ".", exist_ok=True)
+
+    os.environ["STATE_STORE_URL"] = url
+    return url
+
+
+def main() -> None:
+    """Serves a hook with several worker processes sharing the user states."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--hook", choices=["whatsapp", "telegram"], default="whatsapp")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(get_env("WEB_CONCURRENCY", str(os.cpu_count() or 1))),
+    )
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    url = shared_state_store_url(args.workers)
+    pylogger.info(f"Serving {args.hook} with {args.workers} workers on {url}")
+    uvicorn.run(
+        f"scripts.{args.hook}_hook:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        # Keep the JSON or Rich logging set up by the package in every worker
+        log_config=None,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,72 +1,170 @@
+import logging
 import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 
 import httpx
+import msgspec
 from fastapi import FastAPI, Request
-
+from fastapi.responses import PlainTextResponse
+
+from chatbot_template.utils.conversation import ConversationState
+from chatbot_template.utils.dedup import DedupCache
+from chatbot_template.utils.dispatcher import UserDispatcher
+from chatbot_template.utils.enums import SendPriority
+from chatbot_template.utils.env import get_env
+from chatbot_template.utils.events import MessageEvent, telegram_event
+from chatbot_template.utils.http_client import outbound
+from chatbot_template.utils.logs import PayloadLogger
+from chatbot_template.utils.metrics import (
+    CONTENT_TYPE,
+    duplicate_messages,
+    registry,
+    stage_seconds,
+    state_conflicts,
+)
+from chatbot_template.utils.outbox import OutboundScheduler
+from chatbot_template.utils.profiler import SamplingProfiler
+from chatbot_template.utils.state_store import state_store_from_env
+from chatbot_template.utils.sweeper import StateSweeper
 from chatbot_template.utils.workflow import WorkflowEngine
 
-app = FastAPI()
-engine = WorkflowEngine("mh_chatbot_dialogue/config/workflow.yml")
+WORKFLOW_YAML_PATH = get_env(
+    "WORKFLOW_YAML_PATH", "chatbot_template/config/workflow.yml"
+)
+# The error messages live next to the workflow unless told otherwise
+ERRORS_YAML_PATH = get_env(
+    "ERRORS_YAML_PATH", os.path.join(os.path.dirname(WORKFLOW_YAML_PATH), "errors.yml")
+)
+
+engine = WorkflowEngine(
+    WORKFLOW_YAML_PATH,
+    ERRORS_YAML_PATH,
+    reload_interval=float(get_env("WORKFLOW_RELOAD_INTERVAL", "0")) or None,
+)
+
+TELEGRAM_BOT_TOKEN = get_env("TELEGRAM_BOT_TOKEN", "")
+pylogger = logging.getLogger(__name__)
+payloads = PayloadLogger.from_env(pylogger)
+state_store = state_store_from_env()
+sweeper = StateSweeper.from_env(state_store)
+
+
+async def handle_message(user_id: str, event: MessageEvent):
+    """Runs a message of a user through the workflow and sends the reply."""
+    while True:
+        # Checked again after a conflict, another worker may have processed it
+        if await dedup.seen_many([event.id]):
+            duplicate_messages.inc()
+            return
+        with stage_seconds.time("state_get"):
+            stored = await state_store.get(user_id)
+        if stored is None:
+            state = ConversationState()
+            if not await state_store.put_if_unchanged(user_id, None, state):
+                state_conflicts.inc()
+                continue
+            await dedup.mark([event.id])
+            text = engine.get_step("es", "presentation", 0) or ""
+            await outbox.submit(user_id, text)
+            return
+
+        # The engine updates the state in place, the stored one is left intact
+        state = stored.copy()
+        with stage_seconds.time("process"):
+            new_state, response = await engine.process_message(user_id, event, state)
+        with stage_seconds.time("state_put"):
+            written = await state_store.put_if_unchanged(user_id, stored, new_state)
+        if written:
+            break
+        # Another worker answered this user meanwhile, redo it on the new state
+        state_conflicts.inc()
+    # Only once committed, a crash before leaves it to its redelivery
+    await dedup.mark([event.id])
+
+    if engine.is_error(response):
+        await outbox.submit(user_id, response, SendPriority.ERROR)
+    else:
+        await outbox.submit(user_id, response)
 
-TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-user_states = {}
-fake_db: list[dict] = []  # For testing purposes
 
+# Messages are handled in order per user and concurrently across users
+dispatcher = UserDispatcher(handle_message)
 
-@app.post("/webhook")
-async def telegram_webhook(request: Request):
-    """Webhook to receive messages from Telegram."""
-    data = await request.json()
-    print("Received Payload: ", data)
+# Ids of the messages processed, redeliveries are acknowledged and dropped
+dedup = DedupCache.from_env(state_store)
 
-    if "message" not in data:
-        return {"status": "ok"}
+# Opt-in sampling of the event loop, enabled by PROFILING_ENABLED
+profiler = SamplingProfiler.from_env()
 
-    message = data.get("message", {})
-    text = message.get("text", "")
-    user_id = message["from"]["id"]
-    # msg_type = "text" if text else "audio" if "voice" in message else None
-
-    if "text" in message:
-        entry = {"type": "text", "text": {"body": message["text"]}}
-    elif "voice" in message:
-        entry = {
-            "type": "audio",
-            "audio": {
-                "id": message["voice"]["file_id"],
-                "duration": message["voice"]["duration"],
-            },
-        }
-    else:
-        entry = {"type": "unsupported"}
 
-    if user_id not in user_states:
-        user_states[user_id] = {"lang": "es", "phase": "presentation", "step": 0}
-        text = engine.get_step("es", "presentation", 0) or ""
-        await send_message(user_id, text)
-        return {"status": "ok"}
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Opens the outbound client and drains the queues with the app."""
+    async with (
+        profiler.lifespan(app),
+        engine.lifespan(app),
+        outbound.lifespan(app),
+        outbox.lifespan(app),
+        dispatcher.lifespan(app),
+        sweeper.lifespan(app),
+    ):
+        yield
+    await state_store.aclose()
 
-    state = user_states[user_id]
-    # entry = (
-    #     {"type": msg_type, "text": {"body": text}}
-    #     if text
-    #     else {"type": "audio", "audio": {"id": message["voice"]["file_id"]}}
-    # )
 
-    new_state, response = await engine.process_message(user_id, entry, state)
-    user_states[user_id] = new_state
+app = FastAPI(lifespan=lifespan)
 
-    if isinstance(response, tuple) and response[0] == "AUDIO":
-        await send_message(user_id, "🎙️ Audio recibido")
-    else:
-        await send_message(user_id, response)
 
+@app.get("/metrics")
+async def metrics():
+    """Stage latencies and workflow counters in the Prometheus text format."""
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+
+
+async def profile():
+    """Stacks sampled by the profiler in the folded format."""
+    return PlainTextResponse(profiler.render())
+
+
+# Unauthenticated, only served when PROFILING_ENABLED=1
+if profiler.enabled:
+    app.get("/debug/profile")(profile)
+
+
+@app.post("/webhook")
+async def telegram_webhook(request: Request):
+    """Webhook to receive messages from Telegram."""
+    with stage_seconds.time("parse"):
+        body = await request.body()
+        try:
+            event = telegram_event(body)
+        except msgspec.DecodeError as error:
+            # Acknowledged anyway, a redelivery would not decode either
+            pylogger.warning(f"Malformed Telegram update: {error}")
+            return {"status": "ok"}
+    payloads.log("Received payload", body)
+
+    if event is None:
+        return {"status": "ok"}
+    # Redeliveries of an update this process processed skip the queue
+    if dedup.recent(event.id):
+        duplicate_messages.inc()
+        return {"status": "ok"}
+
+    # Acknowledge right away, the reply is sent by the dispatcher
+    with stage_seconds.time("submit"):
+        await dispatcher.submit(event.user_id, event)
     return {"status": "ok"}
 
 
-async def send_message(chat_id: int, text: str):
+async def send_message(chat_id: int | str, text: str) -> httpx.Response:
     """Send a message to a Telegram user."""
     url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
     payload = {"chat_id": chat_id, "text": text}
-    async with httpx.AsyncClient() as client:
-        await client.post(url, json=payload)
+    with stage_seconds.time("send"):
+        return await outbound.client.post(url, json=payload)
+
+
+# Replies are paced to the Bot API limits: 30 messages/s, about 1/s per chat
+outbox = OutboundScheduler.from_env(send_message, rate=30, chat_rate=1, chat_burst=3)
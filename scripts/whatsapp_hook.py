@@ -1,32 +1,83 @@
+import asyncio
+import logging
 import os
+import re
 import uuid
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 
-import aiofiles
 import httpx
-from dotenv import load_dotenv
+import msgspec
 from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 
+from chatbot_template.utils.audio import AudioJob, AudioPipeline, audio_duration
+from chatbot_template.utils.conversation import ConversationState
+from chatbot_template.utils.dedup import DedupCache
+from chatbot_template.utils.dispatcher import UserDispatcher
+from chatbot_template.utils.enums import Phase, SendPriority, WorkflowError
+from chatbot_template.utils.env import get_env
+from chatbot_template.utils.events import MessageEvent, whatsapp_events
+from chatbot_template.utils.http_client import outbound
+from chatbot_template.utils.logs import PayloadLogger
+from chatbot_template.utils.media import MediaDownloader, MediaFile
+from chatbot_template.utils.metrics import (
+    CONTENT_TYPE,
+    duplicate_messages,
+    registry,
+    stage_seconds,
+    state_conflicts,
+)
+from chatbot_template.utils.outbox import OutboundScheduler
+from chatbot_template.utils.profiler import SamplingProfiler
+from chatbot_template.utils.state_store import state_store_from_env
+from chatbot_template.utils.sweeper import StateSweeper
+from chatbot_template.utils.validators import AudioValidator
 from chatbot_template.utils.workflow import WorkflowEngine
 
-load_dotenv()
+pylogger = logging.getLogger(__name__)
+payloads = PayloadLogger.from_env(pylogger)
 
-WHATSAPP_TOKEN = os.getenv("WHATSAPP_TOKEN")
-COSMOS_URL = os.getenv("COSMOS_URL")
-COSMOS_KEY = os.getenv("COSMOS_KEY")
-DATABASE_NAME = os.getenv("DATAA¡BASE_NAME")
-CONTAINER_NAME = os.getenv("CONTAINER_NAME")
-WORKFLOW_YAML_PATH = "/mh_chatbot_dialogue/config/workflow.yaml"
+WHATSAPP_TOKEN = get_env("WHATSAPP_TOKEN", "")
+COSMOS_URL = get_env("COSMOS_URL", "")
+COSMOS_KEY = get_env("COSMOS_KEY", "")
+DATABASE_NAME = get_env("DATAA¡BASE_NAME", "")
+CONTAINER_NAME = get_env("CONTAINER_NAME", "")
+WORKFLOW_YAML_PATH = get_env(
+    "WORKFLOW_YAML_PATH", "chatbot_template/config/workflow.yml"
+)
+# The error messages live next to the workflow unless told otherwise
+ERRORS_YAML_PATH = get_env(
+    "ERRORS_YAML_PATH", os.path.join(os.path.dirname(WORKFLOW_YAML_PATH), "errors.yml")
+)
+WORKFLOW_RELOAD_INTERVAL = float(get_env("WORKFLOW_RELOAD_INTERVAL", "0"))
 
-# Engine used
-engine = WorkflowEngine(WORKFLOW_YAML_PATH)
+# The `messages` key, not the `"field": "messages"` every notification has
+MESSAGES_KEY = re.compile(rb'"messages"\s*:')
 
-# Memory Status
-user_states = {}
+# Engine used, reloaded when its YAML files change if an interval is set
+engine = WorkflowEngine(
+    WORKFLOW_YAML_PATH,
+    ERRORS_YAML_PATH,
+    reload_interval=WORKFLOW_RELOAD_INTERVAL or None,
+)
+
+# Conversation Status
+state_store = state_store_from_env()
+sweeper = StateSweeper.from_env(state_store)
 
 # TEST PURPOSES
-MEDIA_FOLDER = "/audios"
+MEDIA_FOLDER = get_env("MEDIA_FOLDER", "/audios")
 os.makedirs(MEDIA_FOLDER, exist_ok=True)
-fake_db: list[dict] = []
+
+# Audios are streamed to disk in the background
+media = MediaDownloader(
+    max_concurrent=int(get_env("MEDIA_MAX_CONCURRENT", "8")),
+    max_bytes=int(get_env("MEDIA_MAX_BYTES", str(16 * 1024 * 1024))),
+)
+
+# Downloaded audios are decoded and measured in worker processes
+audio_pipeline = AudioPipeline.from_env()
 
 
 # cosmos_client = CosmosClient(COSMOS_URL, credential=COSMOS_KEY)
@@ -36,48 +87,159 @@ fake_db: list[dict] = []
 #     partition_key="/user_id"
 # )
 
-app = FastAPI()
 
+async def handle_messages(user_id: str, events: list[MessageEvent]):
+    """Runs the messages of a user through the workflow and sends the replies."""
+    while True:
+        # Checked again after a conflict, another worker may have processed them
+        seen = await dedup.seen_many(event.id for event in events)
+        if seen:
+            duplicate_messages.inc(amount=len(seen))
+            events = [event for event in events if event.id not in seen]
+            if not events:
+                return
+        with stage_seconds.time("state_get"):
+            stored = await state_store.get(user_id)
+        replies: list[str] = []
+        audios: list[tuple[MessageEvent, int]] = []
+        if stored is None:
+            # The first message only opens the conversation
+            state = ConversationState()
+            replies.append(engine.get_step("es", "presentation", 0) or "")
+            pending = events[1:]
+        else:
+            # The engine updates the state in place, the stored one is left intact
+            state = stored.copy()
+            pending = events
 
-@app.post("/webhook")
-async def whatsapp_webhook(request: Request):
-    """Webhook to receive messages from WhatsApp."""
-    data = await request.json()
-    print("Received Payload: ", data)
+        for event in pending:
+            position = (state.phase, state.step)
+            with stage_seconds.time("process"):
+                state, response = await engine.process_message(user_id, event, state)
+            replies.append(response)
+            # An accepted audio answer moves the user forward
+            if position[0] is Phase.AUDIO_QUESTIONS and event.media_id is not None:
+                if (state.phase, state.step) != position:
+                    audios.append((event, position[1]))
 
-    entry = data["entry"][0]["changes"][0]["value"]["messages"][0]
-    user_id = entry["from"]
-    # msg_type = entry["type"]
+        with stage_seconds.time("state_put"):
+            written = await state_store.put_if_unchanged(user_id, stored, state)
+        if written:
+            break
+        # Another worker answered this user meanwhile, redo it on the new state
+        state_conflicts.inc()
+    # Only once committed, a crash before leaves them to their redelivery
+    await dedup.mark(event.id for event in events)
 
-    if user_id not in user_states:
-        user_states[user_id] = {"lang": "es", "phase": "presentation", "step": 0}
-        text = engine.get_step("es", "presentation", 0) or ""
-        await send_message(user_id, text)
-        return {"status": "ok"}
+    # Audios are fetched off the reply path
+    for event, step in audios:
+        audio_path = os.path.join(MEDIA_FOLDER, f"{uuid.uuid4()}.ogg")
+        media.spawn(fetch_audio(event, step, audio_path))
 
-    state = user_states[user_id]
-    new_state, response = await engine.process_message(user_id, entry, state)
+    # In order, the replies of a user answer each other
+    for response in replies:
+        if engine.is_error(response):
+            await outbox.submit(user_id, response, SendPriority.ERROR)
+        else:
+            await outbox.submit(user_id, response)
 
-    user_states[user_id] = new_state
 
-    if isinstance(response, tuple) and response[0] == "AUDIO":
-        audio_id = response[1]
-        audio_url = await get_media_url(audio_id)
-        audio_path = os.path.join(MEDIA_FOLDER, f"{uuid.uuid4()}.ogg")
-        await download_file(audio_url, audio_path)
+def group_messages(events: list[MessageEvent]) -> dict[str, list[MessageEvent]]:
+    """
+    Groups the new messages of a notification by sender, in arrival order.
+
+    WhatsApp may batch several entries, changes and messages in a single
+    notification. A message repeated within the notification is kept once, and
+    redeliveries of a message this process already processed are dropped before
+    being queued; the others are dropped by `handle_messages`.
+
+    Parameters
+    ----------
+    events : list[MessageEvent]
+        The messages of the notification.
+
+    Returns
+    -------
+    dict[str, list[MessageEvent]]
+        The messages of each sender.
+    """
+    batches: dict[str, list[MessageEvent]] = {}
+    ids: set[str] = set()
+    for event in events:
+        if event.id in ids or dedup.recent(event.id):
+            duplicate_messages.inc()
+            continue
+        ids.add(event.id)
+        batches.setdefault(event.user_id, []).append(event)
+    return batches
+
+
+# Messages are handled in order per user and concurrently across users
+dispatcher = UserDispatcher(handle_messages)
+
+# Ids of the messages processed, redeliveries are acknowledged and dropped
+dedup = DedupCache.from_env(state_store)
+
+# Opt-in sampling of the event loop, enabled by PROFILING_ENABLED
+profiler = SamplingProfiler.from_env()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Opens the outbound client and drains the queues with the app."""
+    async with (
+        profiler.lifespan(app),
+        engine.lifespan(app),
+        outbound.lifespan(app),
+        outbox.lifespan(app),
+        audio_pipeline.lifespan(app),
+        media.lifespan(app),
+        dispatcher.lifespan(app),
+        sweeper.lifespan(app),
+    ):
+        yield
+    await state_store.aclose()
 
-        state["step"] += 1
-        next_msg = engine.get_step(state["lang"], state["phase"], state["step"])
-        if next_msg:
-            await send_message(user_id, next_msg)
-        else:
-            state["phase"] = "conclusion"
-            msg = engine.get_step(state["lang"], "conclusion", 0)
-            await send_message(user_id, msg)
 
-    else:
-        await send_message(user_id, response)
+app = FastAPI(lifespan=lifespan)
 
+
+@app.get("/metrics")
+async def metrics():
+    """Stage latencies and workflow counters in the Prometheus text format."""
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+
+
+async def profile():
+    """Stacks sampled by the profiler in the folded format."""
+    return PlainTextResponse(profiler.render())
+
+
+# Unauthenticated, only served when PROFILING_ENABLED=1
+if profiler.enabled:
+    app.get("/debug/profile")(profile)
+
+
+@app.post("/webhook")
+async def whatsapp_webhook(request: Request):
+    """Webhook to receive messages from WhatsApp."""
+    with stage_seconds.time("parse"):
+        body = await request.body()
+        # Sent, delivered and read statuses carry no messages, skip them unparsed
+        if MESSAGES_KEY.search(body) is None:
+            return {"status": "ok"}
+        try:
+            events = whatsapp_events(body)
+        except msgspec.DecodeError as error:
+            # Acknowledged anyway, a redelivery would not decode either
+            pylogger.warning(f"Malformed WhatsApp notification: {error}")
+            return {"status": "ok"}
+    payloads.log("Received payload", body)
+
+    # Acknowledge right away, the replies are sent by the dispatcher
+    with stage_seconds.time("submit"):
+        for user_id, batch in group_messages(events).items():
+            await dispatcher.submit(user_id, batch)
     return {"status": "ok"}
 
 
@@ -85,37 +247,114 @@ async def get_media_url(media_id: str):
     """Gets the direct URL of a media file from WhatsApp."""
     url = f"https://graph.facebook.com/v20.0/{media_id}"
     headers = {"Authorization": f"Bearer {WHATSAPP_TOKEN}"}
-    async with httpx.AsyncClient() as client:
-        r = await client.get(url, headers=headers)
-        return r.json()["url"]
+    r = await outbound.client.get(url, headers=headers)
+    return r.json()["url"]
 
 
-async def download_file(url: str, dest_path: str):
-    """Downloads a file from a URL to a local path."""
+async def download_file(url: str, dest_path: str) -> MediaFile:
+    """Streams a file from a URL to a local path."""
     headers = {"Authorization": f"Bearer {WHATSAPP_TOKEN}"}
-    async with httpx.AsyncClient() as client:
-        r = await client.get(url, headers=headers)
-        if r.status_code == 200:
-            async with aiofiles.open(dest_path, "wb") as f:
-                await f.write(r.content)
+    return await media.download(url, dest_path, headers=headers)
+
+
+async def fetch_audio(event: MessageEvent, step: int, dest_path: str) -> MediaFile:
+    """Streams the audio answer of a step to a local path, checks and queues it."""
+    media_id = event.media_id or ""
+    audio_url = await get_media_url(media_id)
+    audio = await download_file(audio_url, dest_path)
+    pylogger.info(
+        "AUDIO:%s -> %s (%d bytes, %s)", media_id, audio.path, audio.size, audio.sha256
+    )
+    if event.duration is None:
+        # Not declared by WhatsApp, read from the headers of the file instead
+        try:
+            duration = await asyncio.to_thread(audio_duration, audio.path)
+        except ValueError:
+            pass  # Logged as unsupported, its duration stays unchecked
+        else:
+            await reask_short_audio(event.user_id, media_id, step, duration)
+    await audio_pipeline.submit(
+        AudioJob(
+            event.user_id,
+            media_id,
+            audio.path,
+            Phase.AUDIO_QUESTIONS.label,
+            step,
+            declared_duration=event.duration,
+        )
+    )
+    return audio
+
 
+async def reask_short_audio(
+    user_id: str, media_id: str, step: int, duration: float
+) -> None:
+    """
+    Asks an audio question again when its answer turns out too short.
 
-async def send_message(to: str, text: str):
+    WhatsApp does not declare the duration of an audio, so the workflow
+    accepts it and the duration is only known once measured from the file.
+    An answer shorter than the question allows takes the user back to that
+    question, unless the conversation already ended.
+    """
+    while True:
+        stored = await state_store.get(user_id)
+        if stored is None or stored.phase not in (
+            Phase.AUDIO_QUESTIONS,
+            Phase.CONCLUSION,
+        ):
+            return
+        asked = ConversationState(stored.lang, Phase.AUDIO_QUESTIONS, step)
+        validator = engine.validator(asked)
+        if (
+            not isinstance(validator, AudioValidator)
+            or duration >= validator.min_duration
+        ):
+            return
+        if await state_store.put_if_unchanged(user_id, stored, asked):
+            break
+        state_conflicts.inc()
+
+    pylogger.info(
+        "AUDIO:%s too short (%.1f s), asking step %d again", media_id, duration, step
+    )
+    await outbox.submit(
+        user_id,
+        engine.catalog.error(asked.lang, WorkflowError.AUDIO_TOO_SHORT),
+        SendPriority.ERROR,
+    )
+    prompt = engine.get_step(asked.lang, Phase.AUDIO_QUESTIONS.label, step)
+    if prompt:
+        await outbox.submit(user_id, prompt)
+
+
+async def send_message(to: str, text: str) -> httpx.Response:
     """Sends a text message to a Whatsapp user."""
     url = "https://graph.facebook.com/v20.0/me/messages"
     headers = {"Authorization": f"Bearer {WHATSAPP_TOKEN}"}
     payload = {"messaging_product": "whatsapp", "to": to, "text": {"body": text}}
-    async with httpx.AsyncClient() as client:
-        await client.post(url, headers=headers, json=payload)
+    with stage_seconds.time("send"):
+        return await outbound.client.post(url, headers=headers, json=payload)
+
+
+# Replies are paced to the Cloud API limits: 80 messages/s, and bursts of up to 45
+# then one message every 6 s to the same user
+outbox = OutboundScheduler.from_env(
+    send_message, rate=80, chat_rate=1 / 6, chat_burst=45
+)
 
 
 @app.get("/webhook")
 async def verify_webhook(request: Request):
     """Verification endpoint required by WhatsApp Cloud API."""
     params = request.query_params
-    if params.get("hub.mode") == "subscribe" and params.get(
-        "hub.verify_token"
-    ) == os.getenv("VERIFY_TOKEN"):
+    # An unset token verifies nothing, not even an empty one
+    verify_token = get_env("VERIFY_TOKEN", "")
+    if (
+        verify_token
+        and params.get("hub.mode") == "subscribe"
+        and params.get("hub.verify_token") == verify_token
+    ):
         challenge = params.get("hub.challenge")
         if challenge is not None:
             return int(challenge)
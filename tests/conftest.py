@@ -0,0 +1,15 @@
+from pathlib import Path
+
+import pytest
+
+from chatbot_template.utils.workflow import WorkflowEngine
+
+CONFIG_FOLDER = Path(__file__).parents[1] / "chatbot_template" / "config"
+
+
+@pytest.fixture(scope="session")
+def engine() -> WorkflowEngine:
+    """The engine of the workflow shipped with the template."""
+    return WorkflowEngine(
+        str(CONFIG_FOLDER / "workflow.yml"), str(CONFIG_FOLDER / "errors.yml")
+    )
@@ -0,0 +1,63 @@
+from chatbot_template.utils.catalog import MessageCatalog
+from chatbot_template.utils.enums import Phase, WorkflowError
+
+QUESTIONS = {
+    "es": {
+        "presentation": [{"text": "Hola"}],
+        "formulaires": [{"question": "¿Nombre?"}, {"question": "¿Edad?"}],
+    },
+    "ca": {"formulaires": [{"question": "Nom?"}]},
+}
+ERRORS = {
+    "es": {"INVALID_NUMBER": "Número no válido", "UNKNOWN_STATE": "Estado raro"},
+    "ca": {"INVALID_NUMBER": "Número no vàlid"},
+}
+
+
+def catalog() -> MessageCatalog:
+    """A catalog with a partial Catalan translation and an extra language."""
+    return MessageCatalog.build(QUESTIONS, ERRORS, ("en",))
+
+
+def test_own_messages():
+    """Translated messages are served as written."""
+    messages = catalog()
+    assert messages.error("ca", WorkflowError.INVALID_NUMBER) == "Número no vàlid"
+    assert messages.prompt("ca", Phase.FORMULAIRES, 0) == "Nom?"
+    assert messages.prompt("es", Phase.PRESENTATION, 0) == "Hola"
+
+
+def test_missing_translations_fall_back_to_spanish():
+    """Missing prompts and errors are filled in with the Spanish ones."""
+    messages = catalog()
+    assert messages.prompt("ca", Phase.PRESENTATION, 0) == "Hola"
+    assert messages.prompt("ca", Phase.FORMULAIRES, 1) == "¿Edad?"
+    assert messages.steps("ca", Phase.FORMULAIRES) == ("Nom?", "¿Edad?")
+    assert messages.error("en", WorkflowError.INVALID_NUMBER) == "Número no válido"
+    assert "ca.presentation.0" in messages.missing
+    assert "ca.formulaires.1" in messages.missing
+    assert "ca.INVALID_NUMBER" not in messages.missing
+
+
+def test_untranslated_errors_fall_back_to_unknown_state():
+    """Errors missing in every language get the `UNKNOWN_STATE` message."""
+    messages = catalog()
+    assert messages.error("es", WorkflowError.NOT_AUDIO) == "Estado raro"
+    assert messages.error("ca", WorkflowError.NOT_AUDIO) == "Estado raro"
+
+
+def test_unknown_language_and_steps():
+    """Unknown languages get the Spanish messages, unknown steps nothing."""
+    messages = catalog()
+    assert messages.prompt("fr", Phase.FORMULAIRES, 0) == "¿Nombre?"
+    assert messages.error("fr", WorkflowError.INVALID_NUMBER) == "Número no válido"
+    assert messages.prompt("es", Phase.FORMULAIRES, 2) is None
+    assert messages.prompt("es", Phase.FORMULAIRES, -1) is None
+    assert messages.steps("es", Phase.CONCLUSION) == ()
+
+
+def test_engine_catalog(engine):
+    """The shipped workflow resolves every error of every language."""
+    for lang in engine.catalog.languages:
+        for error in WorkflowError:
+            assert engine.catalog.error(lang, error)
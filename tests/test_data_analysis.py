@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from chatbot_template.utils.data_analysis import DataAnalysis
+
+
+@pytest.fixture
+def paths(tmp_path):
+    """Small `.csv` files of actions, users and random facts."""
+    info = tmp_path / "info.csv"
+    pd.DataFrame(
+        {"Morning": ["Run", None], "Night": ["Sleep", "Read"]},
+        index=pd.Index(["Monday", "Tuesday"], name="day"),
+    ).to_csv(info)
+    users = tmp_path / "users.csv"
+    pd.DataFrame(
+        {
+            "user_id": ["ana", "bob", "eve"],
+            "user_name": ["Ana", "Bob", "Eve"],
+            "password": ["a", "b", "e"],
+            "favourite_animal": ["cat", "cat", "owl"],
+            "loves_maths": [1, 2, 1],
+        }
+    ).to_csv(users, index=False)
+    facts = tmp_path / "facts.csv"
+    pd.DataFrame(
+        {
+            "animal": ["cat", "cat", "cat", "dog"],
+            "maths_level": [1, 1, 3, 1],
+            "fact": ["purr", "nap", "jump", "bark"],
+        }
+    ).to_csv(facts, index=False)
+    return str(info), str(users), str(facts)
+
+
+@pytest.fixture(params=[False, True], ids=["csv", "cache"])
+def data(paths, tmp_path, request):
+    """The analysis of the small files, parsed or memory-mapped from a cache."""
+    cache_dir = str(tmp_path / "cache") if request.param else None
+    return DataAnalysis(*paths, cache_dir=cache_dir, rng=np.random.default_rng(0))
+
+
+def test_actions_are_melted(data):
+    """The table holds one row per day and moment with an action."""
+    assert list(data.bb_dd_info.columns) == ["day", "moment", "action"]
+    assert len(data.bb_dd_info) == 3
+    assert data.get_what_am_i_doing("Monday", "Morning") == "Run"
+    assert data.get_what_am_i_doing("Tuesday", "Night") == "Read"
+
+
+@pytest.mark.parametrize(
+    ("day", "moment"),
+    [("Tuesday", "Morning"), ("Sunday", "Night"), ("Monday", "Noon")],
+)
+def test_missing_actions_raise(data, day, moment):
+    """Empty cells are unknown, like days and moments not in the table."""
+    with pytest.raises(KeyError):
+        data.get_what_am_i_doing(day, moment)
+
+
+def test_facts_of_the_animal_and_level(data):
+    """Facts come from the pool of the animal and maths level of the user."""
+    facts = {data.get_animal_random_fact("ana") for _ in range(50)}
+    assert facts == {"purr", "nap"}
+
+
+def test_fallback_pools(data):
+    """Without facts for its level a user gets any of its animal, else None."""
+    facts = {data.get_animal_random_fact("bob") for _ in range(50)}
+    assert facts == {"purr", "nap", "jump"}
+    assert data.get_animal_random_fact("eve") is None
+    assert data.get_animal_random_facts(["eve", "ana"])[0] is None
+
+
+def test_no_fact_when_not_wanted(data):
+    """A user not wanting a fact gets None and draws nothing."""
+    state = data.rng.bit_generator.state
+    assert data.get_animal_random_fact("ana", wants_random_fact=False) is None
+    assert data.rng.bit_generator.state == state
+
+
+def test_seeded_facts_are_reproducible(paths):
+    """Two analyses seeded alike draw the same facts."""
+    draws = []
+    for _ in range(2):
+        data = DataAnalysis(*paths, rng=np.random.default_rng(7))
+        draws.append(
+            [data.get_animal_random_fact("bob") for _ in range(10)]
+            + data.get_animal_random_facts(["ana", "bob", "eve"] * 5)
+        )
+    assert draws[0] == draws[1]
@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+
+from chatbot_template.utils.data_cache import load_table
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    """A table of actions per day, indexed by its first column."""
+    path = tmp_path / "info.csv"
+    pd.DataFrame(
+        {"Mañana": ["correr", "leer"], "Noche": ["dormir", "cenar"]},
+        index=pd.Index(["Monday", "Tuesday"], name="day"),
+    ).to_csv(path)
+    return path
+
+
+def test_cache_matches_the_csv(csv_path, tmp_path):
+    """A cached table holds the values of the `.csv`."""
+    table = load_table(csv_path, tmp_path / "cache", dtype="string", index_col=0)
+    assert table.index.name == "day"
+    assert list(table.index) == ["Monday", "Tuesday"]
+    assert table.loc["Tuesday", "Noche"] == "cenar"
+
+
+def test_layouts_get_their_own_cache(csv_path, tmp_path):
+    """The same file loaded with other read options is not served a wrong cache."""
+    cache_dir = tmp_path / "cache"
+    plain = load_table(csv_path, cache_dir)
+    indexed = load_table(csv_path, cache_dir, dtype="string", index_col=0)
+
+    assert list(plain.columns) == ["day", "Mañana", "Noche"]
+    assert indexed.index.name == "day"
+    assert list(indexed.columns) == ["Mañana", "Noche"]
+    # Both stay cached side by side
+    assert list(load_table(csv_path, cache_dir).columns) == list(plain.columns)
+    assert indexed.reset_index().melt(id_vars="day").shape == (4, 3)
+
+
+def test_rebuilt_when_the_csv_changes(csv_path, tmp_path):
+    """Changed contents are picked up on the next load."""
+    cache_dir = tmp_path / "cache"
+    load_table(csv_path, cache_dir, index_col=0)
+    with open(csv_path, "a", encoding="utf-8") as file:
+        file.write("Friday,nadar,soñar\n")
+    table = load_table(csv_path, cache_dir, index_col=0)
+    assert table.loc["Friday", "Noche"] == "soñar"
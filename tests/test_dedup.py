@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+from chatbot_template.utils.dedup import DedupCache
+from chatbot_template.utils.state_store import MemoryStateStore, SQLiteStateStore
+
+
+def test_ids_are_seen_once_marked():
+    """Ids only count as seen after `mark`, until their TTL runs out."""
+
+    async def run() -> None:
+        dedup = DedupCache(MemoryStateStore(), ttl=0.05)
+        assert await dedup.seen_many(["a", "b"]) == set()
+        await dedup.mark(["a"])
+        assert await dedup.seen_many(["a", "b"]) == {"a"}
+        time.sleep(0.06)
+        assert await dedup.seen_many(["a"]) == set()
+
+    asyncio.run(run())
+
+
+def test_memory_store_bounds_the_ids():
+    """The in-memory store forgets the oldest ids above `max_seen`."""
+
+    async def run() -> None:
+        store = MemoryStateStore(max_seen=2)
+        dedup = DedupCache(store, max_recent=0)
+        await dedup.mark(["a", "b", "c"])
+        assert await dedup.seen_many("abc") == {"b", "c"}
+
+    asyncio.run(run())
+
+
+def test_recent_ids_skip_the_store():
+    """Ids marked by the process are recognized without the store, up to a bound."""
+
+    async def run() -> None:
+        store = MemoryStateStore()
+        dedup = DedupCache(store, max_recent=2)
+        assert not dedup.recent("a")
+        await dedup.mark(["a", "b", "c"])
+        assert [dedup.recent(i) for i in "abc"] == [False, True, True]
+        # Forgotten by the store, still known to the process
+        store._seen.clear()
+        assert await dedup.seen_many("abc") == {"b", "c"}
+
+    asyncio.run(run())
+
+
+def test_ids_are_shared_between_workers(tmp_path):
+    """Workers opening the same SQLite store see the ids of each other."""
+    path = str(tmp_path / "states.db")
+
+    async def run() -> None:
+        first = DedupCache(SQLiteStateStore(path))
+        second = DedupCache(SQLiteStateStore(path))
+        await first.mark(["wamid.1"])
+        assert await second.seen_many(["wamid.1", "wamid.2"]) == {"wamid.1"}
+        await first.store.aclose()
+        await second.store.aclose()
+
+    asyncio.run(run())
+
+
+def test_sweep_deletes_expired_ids(tmp_path):
+    """Expired ids are removed from SQLite along with the expired states."""
+
+    async def run() -> None:
+        store = SQLiteStateStore(str(tmp_path / "states.db"))
+        await DedupCache(store, ttl=0.01).mark(["old"])
+        await DedupCache(store).mark(["new"])
+        time.sleep(0.02)
+        await store.sweep()
+        (count,) = store._connection.execute(
+            "SELECT COUNT(*) FROM seen_messages"
+        ).fetchone()
+        assert count == 1
+        await store.aclose()
+
+    asyncio.run(run())
@@ -0,0 +1,108 @@
+import asyncio
+import random
+
+from chatbot_template.utils.dispatcher import UserDispatcher
+
+
+def test_messages_of_a_user_keep_their_order():
+    """Every user gets its messages handled one at a time, in order."""
+    handled: dict[str, list[int]] = {}
+    running: set[str] = set()
+    rng = random.Random(0)
+
+    async def handler(user_id: str, message: int) -> None:
+        assert user_id not in running
+        running.add(user_id)
+        await asyncio.sleep(rng.random() / 1000)
+        handled.setdefault(user_id, []).append(message)
+        running.discard(user_id)
+
+    async def run() -> None:
+        dispatcher = UserDispatcher(handler, max_pending_per_user=4, max_pending=10)
+        for message in range(50):
+            for user in range(5):
+                await dispatcher.submit(f"user{user}", message)
+        await dispatcher.join()
+        assert dispatcher.active_users == 0
+
+    asyncio.run(run())
+    assert handled == {f"user{user}": list(range(50)) for user in range(5)}
+
+
+def test_bounds_hold_while_submissions_wait():
+    """Held back messages are not queued, so the queues never exceed the bounds."""
+    peaks = {"pending": 0, "user": 0}
+
+    async def run() -> None:
+        release = asyncio.Event()
+
+        async def handler(user_id: str, message: int) -> None:
+            await release.wait()
+
+        dispatcher = UserDispatcher(handler, max_pending_per_user=3, max_pending=5)
+        submissions = [
+            asyncio.create_task(dispatcher.submit(f"user{i % 2}", i)) for i in range(20)
+        ]
+        await asyncio.sleep(0.01)
+        # The first message of each lane is being handled, the rest queued
+        assert sum(task.done() for task in submissions) == 5
+        assert dispatcher._pending == 5
+
+        def record() -> None:
+            peaks["pending"] = max(peaks["pending"], dispatcher._pending)
+            lanes = dispatcher._lanes.values()
+            peaks["user"] = max([peaks["user"], *(len(lane.queue) for lane in lanes)])
+
+        release.set()
+        while not all(task.done() for task in submissions):
+            record()
+            await asyncio.sleep(0)
+        await dispatcher.join()
+
+    asyncio.run(run())
+    assert peaks["pending"] <= 5
+    assert peaks["user"] <= 3
+
+
+def test_failing_message_does_not_stop_the_lane():
+    """A handler error is logged and the next messages are still handled."""
+    handled: list[int] = []
+
+    async def handler(user_id: str, message: int) -> None:
+        if message == 1:
+            raise RuntimeError("boom")
+        handled.append(message)
+
+    async def run() -> None:
+        dispatcher = UserDispatcher(handler)
+        for message in range(3):
+            await dispatcher.submit("user", message)
+        await dispatcher.join()
+
+    asyncio.run(run())
+    assert handled == [0, 2]
+
+
+def test_cancelled_submission_lets_the_next_one_through():
+    """A submission cancelled while waiting does not block those behind it."""
+    handled: list[int] = []
+
+    async def run() -> None:
+        release = asyncio.Event()
+
+        async def handler(user_id: str, message: int) -> None:
+            await release.wait()
+            handled.append(message)
+
+        dispatcher = UserDispatcher(handler, max_pending_per_user=1, max_pending=1)
+        await dispatcher.submit("user", 0)
+        cancelled = asyncio.create_task(dispatcher.submit("user", 1))
+        waiting = asyncio.create_task(dispatcher.submit("user", 2))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        release.set()
+        await waiting
+        await dispatcher.join()
+
+    asyncio.run(run())
+    assert handled == [0, 2]
@@ -0,0 +1,25 @@
+from chatbot_template.utils import env
+
+
+def test_first_get_env_keeps_exported_variables(tmp_path, monkeypatch):
+    """The `.env` file loaded by `get_env` only fills the missing variables."""
+    (tmp_path / ".env").write_text("CHATBOT_EXPORTED=file\nCHATBOT_MISSING=file\n")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(env, "_envs_loaded", False)
+    monkeypatch.setenv("CHATBOT_EXPORTED", "deployment")
+    # Recorded by monkeypatch, so the value loaded from the file is undone
+    monkeypatch.setenv("CHATBOT_MISSING", "")
+    monkeypatch.delenv("CHATBOT_MISSING")
+
+    assert env.get_env("CHATBOT_EXPORTED") == "deployment"
+    assert env.get_env("CHATBOT_MISSING") == "file"
+
+
+def test_load_envs_overrides(tmp_path, monkeypatch):
+    """An explicit `load_envs` lets the file win, as it always did."""
+    path = tmp_path / ".env"
+    path.write_text("CHATBOT_EXPORTED=file\n")
+    monkeypatch.setenv("CHATBOT_EXPORTED", "deployment")
+
+    env.load_envs(str(path))
+    assert env.get_env("CHATBOT_EXPORTED") == "file"
@@ -0,0 +1,143 @@
+import importlib
+import json
+
+import msgspec
+import pytest
+from fastapi.testclient import TestClient
+
+from chatbot_template.utils.events import (
+    MessageEvent,
+    telegram_event,
+    whatsapp_events,
+)
+
+
+def notification(*entries: list[dict]) -> bytes:
+    """A WhatsApp notification with an entry per list of `value`s."""
+    return json.dumps(
+        {
+            "object": "whatsapp_business_account",
+            "entry": [
+                {
+                    "id": "account",
+                    "changes": [
+                        {"field": "messages", "value": value} for value in values
+                    ],
+                }
+                for values in entries
+            ],
+        }
+    ).encode()
+
+
+def test_whatsapp_statuses_only():
+    """A notification of sent, delivered or read statuses has no message."""
+    body = notification(
+        [{"statuses": [{"id": "wamid.1", "status": "read", "recipient_id": "34600"}]}]
+    )
+    assert whatsapp_events(body) == []
+
+
+def test_whatsapp_messages_in_order():
+    """Every message of every entry and change is decoded, in order."""
+    body = notification(
+        [
+            {
+                "contacts": [{"wa_id": "34600"}],
+                "messages": [
+                    {
+                        "id": "wamid.1",
+                        "from": "34600",
+                        "type": "text",
+                        "text": {"body": "ES"},
+                    },
+                    {
+                        "id": "wamid.2",
+                        "from": "34611",
+                        "type": "text",
+                        "text": {"body": "2"},
+                    },
+                ],
+            }
+        ],
+        [{"messages": [{"id": "wamid.3", "from": "34600", "type": "sticker"}]}],
+    )
+    assert whatsapp_events(body) == [
+        MessageEvent("wamid.1", "34600", "text", text="ES"),
+        MessageEvent("wamid.2", "34611", "text", text="2"),
+        MessageEvent("wamid.3", "34600", "sticker"),
+    ]
+
+
+def test_whatsapp_voice_note():
+    """Voice notes are audios, WhatsApp declares no duration."""
+    body = notification(
+        [
+            {
+                "messages": [
+                    {
+                        "id": "wamid.1",
+                        "from": "34600",
+                        "type": "audio",
+                        "audio": {
+                            "id": "media",
+                            "mime_type": "audio/ogg",
+                            "voice": True,
+                        },
+                    }
+                ]
+            }
+        ]
+    )
+    assert whatsapp_events(body) == [
+        MessageEvent("wamid.1", "34600", "audio", media_id="media")
+    ]
+
+
+def test_telegram_messages():
+    """Texts and voice notes of a user are decoded, keyed by the update id."""
+    text = {"update_id": 7, "message": {"from": {"id": 42}, "text": "hola"}}
+    assert telegram_event(json.dumps(text).encode()) == MessageEvent(
+        "7", "42", "text", text="hola"
+    )
+    voice = {
+        "update_id": 8,
+        "message": {"from": {"id": 42}, "voice": {"file_id": "f", "duration": 12}},
+    }
+    assert telegram_event(json.dumps(voice).encode()) == MessageEvent(
+        "8", "42", "audio", media_id="f", duration=12
+    )
+
+
+def test_telegram_update_without_message():
+    """Edits, callbacks and other updates are not messages."""
+    body = {"update_id": 9, "edited_message": {"from": {"id": 42}, "text": "hola"}}
+    assert telegram_event(json.dumps(body).encode()) is None
+
+
+@pytest.mark.parametrize(
+    ("decode", "body"),
+    [
+        (whatsapp_events, b"{not json"),
+        (whatsapp_events, b'{"entry": {"changes": []}}'),
+        (telegram_event, b"{not json"),
+        (telegram_event, b'{"update_id": "x"}'),
+    ],
+)
+def test_malformed_bodies_are_rejected(decode, body):
+    """Bodies that are not JSON or lack the expected layout fail to decode."""
+    with pytest.raises(msgspec.DecodeError):
+        decode(body)
+
+
+@pytest.mark.parametrize("hook", ["whatsapp", "telegram"])
+def test_malformed_bodies_are_acknowledged(hook, monkeypatch, tmp_path):
+    """A body that does not decode is acknowledged, not answered with a 500."""
+    monkeypatch.setenv("MEDIA_FOLDER", str(tmp_path / "media"))
+    monkeypatch.setenv("AUDIO_WORKERS", "0")
+    monkeypatch.setenv("STATE_STORE_URL", "memory://")
+    module = importlib.import_module(f"scripts.{hook}_hook")
+    client = TestClient(module.app)
+    response = client.post("/webhook", content=b'{"messages": [')
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
@@ -0,0 +1,44 @@
+import asyncio
+
+from chatbot_template.utils.http_client import OutboundClient, mock_transport
+
+
+def test_lifespan_opens_and_closes_the_client():
+    """The app lifespan opens a single client and closes it at shutdown."""
+
+    async def run() -> None:
+        outbound = OutboundClient(transport=mock_transport())
+        async with outbound.lifespan(None):
+            client = outbound.client
+            assert not client.is_closed
+            response = await client.post("https://mock.local/send", json={})
+            assert response.json() == {"ok": True}
+            assert outbound.client is client
+        assert client.is_closed
+
+    asyncio.run(run())
+
+
+def test_client_reopens_after_close():
+    """Closing twice is harmless and the next use opens a new client."""
+
+    async def run() -> None:
+        outbound = OutboundClient(transport=mock_transport())
+        first = outbound.client
+        await outbound.aclose()
+        await outbound.aclose()
+        assert first.is_closed
+        second = outbound.client
+        assert second is not first and not second.is_closed
+        await outbound.aclose()
+
+    asyncio.run(run())
+
+
+def test_from_env(monkeypatch):
+    """The pool is tuned by the OUTBOUND_* variables."""
+    monkeypatch.setenv("OUTBOUND_MAX_CONNECTIONS", "7")
+    monkeypatch.setenv("OUTBOUND_MOCK", "1")
+    outbound = OutboundClient.from_env()
+    assert outbound.limits.max_connections == 7
+    assert outbound.transport is not None
@@ -0,0 +1,73 @@
+import asyncio
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from chatbot_template.utils.local_saver import ResponseJournal, save_response
+
+
+def journal_records(folder: str, worker: int, count: int, max_file_bytes: int) -> int:
+    """Journals `count` records of `worker` in small batches, returns its pid."""
+
+    async def run() -> None:
+        journal = ResponseJournal(
+            folder, batch_size=8, flush_interval=0.001, max_file_bytes=max_file_bytes
+        )
+        journal.start()
+        for i in range(count):
+            journal.write(save_response(f"worker{worker}", "formulaires", i, str(i)))
+            if i % 8 == 0:
+                await asyncio.sleep(0)
+        await journal.aclose()
+
+    asyncio.run(run())
+    return os.getpid()
+
+
+def read_lines(path: Path) -> list[dict]:
+    """The records of a journal file."""
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_files_rotate_past_their_size(tmp_path):
+    """Records go on in the next file once one reaches `max_file_bytes`."""
+    pid = journal_records(str(tmp_path), 0, 200, max_file_bytes=2000)
+
+    paths = sorted(tmp_path.glob("responses-*.jsonl"))
+    assert len(paths) > 1
+    assert all(f"-{pid}-" in path.name for path in paths)
+    # A file is only rotated once full, and by at most one batch more
+    sizes = [path.stat().st_size for path in paths]
+    assert all(2000 <= size < 3000 for size in sizes[:-1])
+    assert sizes[-1] < 3000
+    records = [record for path in paths for record in read_lines(path)]
+    assert [record["step"] for record in records] == list(range(200))
+
+
+def test_reopened_journal_appends_to_the_last_file(tmp_path):
+    """A new journal of the same process goes on with the file that has room."""
+    journal_records(str(tmp_path), 0, 10, max_file_bytes=10_000)
+    journal_records(str(tmp_path), 0, 10, max_file_bytes=10_000)
+
+    (path,) = tmp_path.glob("responses-*.jsonl")
+    assert len(read_lines(path)) == 20
+
+
+def test_workers_write_their_own_files(tmp_path):
+    """Processes sharing the folder never interleave records in one file."""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(2, mp_context=context) as pool:
+        runs = [
+            pool.submit(journal_records, str(tmp_path), worker, 300, 4000)
+            for worker in range(2)
+        ]
+        pids = [run.result() for run in runs]
+
+    for worker, pid in enumerate(pids):
+        paths = sorted(tmp_path.glob(f"responses-*-{pid}-*.jsonl"))
+        records = [record for path in paths for record in read_lines(path)]
+        assert {record["user_id"] for record in records} == {f"worker{worker}"}
+        assert [record["step"] for record in records] == list(range(300))
+        assert all(path.stat().st_size < 4000 + 1000 for path in paths)
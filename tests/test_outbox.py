@@ -0,0 +1,150 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from chatbot_template.utils import outbox
+from chatbot_template.utils.enums import SendPriority
+from chatbot_template.utils.outbox import OutboundScheduler
+
+
+class Api:
+    """Records the requests and answers them with the given statuses, then 200."""
+
+    def __init__(self, *statuses: int, headers: dict | None = None):
+        self.statuses = list(statuses)
+        self.headers = headers or {}
+        self.calls: list[tuple[float, str, str]] = []
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def send(self, chat_id: str, text: str) -> httpx.Response:
+        """Answers once `release` is set."""
+        self.calls.append((time.monotonic(), chat_id, text))
+        await self.release.wait()
+        status = self.statuses.pop(0) if self.statuses else 200
+        return httpx.Response(status, headers=self.headers)
+
+
+def scheduler(api: Api, **kwargs) -> OutboundScheduler:
+    """A scheduler without rate limits, sending through `api`."""
+    return OutboundScheduler(api.send, rate=0, chat_rate=0, **kwargs)
+
+
+def test_replies_queued_meanwhile_are_coalesced():
+    """Replies queued while a request is in flight go out as one message."""
+    api = Api()
+
+    async def run() -> None:
+        outbound = scheduler(api)
+        api.release.clear()
+        await outbound.submit("chat", "first")
+        await asyncio.sleep(0)
+        for text in ("second", "third"):
+            await outbound.submit("chat", text)
+        await outbound.submit("other", "hello")
+        api.release.set()
+        await outbound.aclose()
+
+    asyncio.run(run())
+    texts = [(chat_id, text) for _, chat_id, text in api.calls]
+    assert texts == [
+        ("chat", "first"),
+        ("other", "hello"),
+        ("chat", "second\n\nthird"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "coalesce, expected",
+    [
+        (True, ["a" * 5, "b" * 5 + "\n\n" + "c" * 5, "d" * 5]),
+        (False, ["a" * 5, "b" * 5, "c" * 5, "d" * 5]),
+    ],
+)
+def test_coalescing_limits(coalesce, expected):
+    """Coalesced messages stay under `max_chars`, and coalescing can be off."""
+    api = Api()
+
+    async def run() -> None:
+        outbound = scheduler(api, coalesce=coalesce, max_chars=12)
+        api.release.clear()
+        for text in ("a" * 5, "b" * 5, "c" * 5, "d" * 5):
+            await outbound.submit("chat", text)
+            await asyncio.sleep(0)
+        api.release.set()
+        await outbound.aclose()
+
+    asyncio.run(run())
+    assert [text for _, _, text in api.calls] == expected
+
+
+def test_errors_are_sent_before_prompts():
+    """Chats with an error reply waiting are served first."""
+    api = Api()
+
+    async def run() -> None:
+        outbound = scheduler(api)
+        await outbound.submit("prompt", "question")
+        await outbound.submit("error", "invalid", SendPriority.ERROR)
+        await outbound.aclose()
+
+    asyncio.run(run())
+    assert [chat_id for _, chat_id, _ in api.calls] == ["error", "prompt"]
+
+
+def test_server_errors_back_off_exponentially(monkeypatch):
+    """Each retry after a 5xx waits twice as long as the previous one."""
+    monkeypatch.setattr(outbox, "BACKOFF_BASE", 0.05)
+    monkeypatch.setattr(outbox.random, "uniform", lambda low, high: high)
+    api = Api(500, 503)
+
+    async def run() -> None:
+        outbound = scheduler(api)
+        await outbound.submit("chat", "hello")
+        await asyncio.sleep(0.01)
+        # Coalesced with the reply being retried
+        await outbound.submit("chat", "again")
+        await outbound.aclose()
+        assert outbound.pending == 0
+
+    asyncio.run(run())
+    times = [at for at, _, _ in api.calls]
+    gaps = [later - earlier for earlier, later in zip(times, times[1:], strict=False)]
+    assert gaps[0] >= 0.05 * 0.9
+    assert gaps[1] >= 0.1 * 0.9
+    assert [text for _, _, text in api.calls] == [
+        "hello",
+        "hello\n\nagain",
+        "hello\n\nagain",
+    ]
+
+
+def test_throttled_requests_wait_for_retry_after():
+    """A 429 is retried after its `Retry-After`, not the backoff."""
+    api = Api(429, headers={"Retry-After": "0.1"})
+
+    async def run() -> None:
+        outbound = scheduler(api)
+        await outbound.submit("chat", "hello")
+        await outbound.aclose()
+
+    asyncio.run(run())
+    (first, _, _), (second, _, _) = api.calls
+    assert second - first >= 0.1 * 0.9
+
+
+def test_replies_are_dropped_after_max_retries(monkeypatch):
+    """A request failing every retry is dropped and the queue drains."""
+    monkeypatch.setattr(outbox, "BACKOFF_BASE", 0.001)
+    api = Api(*[500] * 10)
+
+    async def run() -> None:
+        outbound = scheduler(api, max_retries=2)
+        await outbound.submit("chat", "hello")
+        await outbound.aclose(timeout=5)
+        assert outbound.pending == 0
+
+    asyncio.run(run())
+    assert len(api.calls) == 3
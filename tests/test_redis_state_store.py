@@ -0,0 +1,94 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+
+import pytest
+
+from chatbot_template.utils.conversation import ConversationState
+from chatbot_template.utils.enums import Phase
+from chatbot_template.utils.state_store import RedisStateStore
+
+from scripts.resp_server import RespServer
+
+pytest.importorskip("redis")
+
+
+def with_store(
+    test: Callable[[RedisStateStore], Awaitable[None]], ttl: float | None = None
+) -> None:
+    """Runs `test` against a store on the local stand-in of a Redis server."""
+
+    async def run() -> None:
+        server = RespServer(port=0)
+        await server.start()
+        store = RedisStateStore(server.url, ttl=ttl)
+        try:
+            await test(store)
+        finally:
+            await store.aclose()
+            await server.stop()
+
+    asyncio.run(run())
+
+
+def test_put_if_unchanged_conflicts():
+    """A write only succeeds on the state it was computed from."""
+    first = ConversationState()
+    second = ConversationState("ca", Phase.FORMULAIRES, 0)
+    third = ConversationState("ca", Phase.FORMULAIRES, 1)
+
+    async def test(store: RedisStateStore) -> None:
+        assert await store.put_if_unchanged("user", None, first)
+        assert not await store.put_if_unchanged("user", None, second)
+        assert await store.put_if_unchanged("user", first, second)
+        assert not await store.put_if_unchanged("user", first, third)
+        assert await store.get("user") == second
+
+    with_store(test)
+
+
+def test_put_if_unchanged_over_an_expired_state():
+    """An expired key counts as missing."""
+
+    async def test(store: RedisStateStore) -> None:
+        await store.put("user", ConversationState("ca"))
+        await asyncio.sleep(0.08)
+        assert await store.get("user") is None
+        assert await store.put_if_unchanged("user", None, ConversationState())
+        assert await store.get("user") == ConversationState()
+
+    with_store(test, ttl=0.05)
+
+
+def test_concurrent_writers_lose_no_update():
+    """Writers retrying on conflict apply every increment exactly once."""
+    conflicts = 0
+
+    async def test(store: RedisStateStore) -> None:
+        async def advance() -> None:
+            nonlocal conflicts
+            while True:
+                stored = await store.get("user")
+                state = stored.copy() if stored is not None else ConversationState()
+                state.step += 1
+                if await store.put_if_unchanged("user", stored, state):
+                    return
+                conflicts += 1
+
+        await asyncio.gather(*(advance() for _ in range(20)))
+        stored = await store.get("user")
+        assert stored is not None and stored.step == 20
+
+    with_store(test)
+    assert conflicts > 0
+
+
+def test_seen_message_ids():
+    """Seen ids are shared through the server until they expire."""
+
+    async def test(store: RedisStateStore) -> None:
+        await store.mark_seen(["a", "b"], 0.05)
+        assert await store.seen_many(["a", "c"]) == {"a"}
+        await asyncio.sleep(0.08)
+        assert await store.seen_many(["a", "b"]) == set()
+
+    with_store(test)
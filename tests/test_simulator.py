@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from chatbot_template.utils.enums import Phase
+from chatbot_template.utils.simulator import ConversationSimulator
+from chatbot_template.utils.workflow import WorkflowEngine
+
+
+def generate(engine: WorkflowEngine, seed: int, users: int = 20) -> list:
+    """The conversations of `users` users simulated with `seed`."""
+    simulator = ConversationSimulator(engine, seed, invalid_rate=0.3)
+    return asyncio.run(simulator.generate_many(users))
+
+
+def test_same_seed_same_conversations(engine):
+    """A seed always gives the same messages and replies."""
+    assert generate(engine, 42) == generate(engine, 42)
+
+
+def test_other_seed_other_conversations(engine):
+    """Different seeds give different conversations."""
+    first = [conversation.events for conversation in generate(engine, 42)]
+    second = [conversation.events for conversation in generate(engine, 43)]
+    assert first != second
+
+
+def test_conversations_go_through_every_phase(engine):
+    """Every conversation ends with a goodbye and visits every phase."""
+    for conversation in generate(engine, 7):
+        assert set(conversation.phases) == set(Phase)
+        assert conversation.phases[-1] is Phase.CONCLUSION
+        assert len(conversation.events) == len(conversation.replies)
+
+
+def test_invalid_answers_are_rejected(engine):
+    """Invalid answers are recorded with their error and get its message."""
+    rejected = [
+        (reply, error)
+        for conversation in generate(engine, 7)
+        for reply, error in zip(
+            conversation.replies, conversation.rejected, strict=True
+        )
+        if error is not None
+    ]
+    assert rejected
+    for reply, _ in rejected:
+        assert engine.is_error(reply)
+
+
+def test_replay_matches_generation(engine):
+    """Replaying concurrently gives the replies recorded at generation."""
+    simulator = ConversationSimulator(engine, 3)
+    conversations = asyncio.run(simulator.generate_many(30))
+    report = asyncio.run(simulator.replay(conversations, concurrency=10))
+
+    assert report.diverged == 0
+    assert report.users == 30
+    assert report.messages == sum(len(c.events) for c in conversations)
+    assert sum(report.phases.values()) == report.messages
+
+
+def test_invalid_rate_out_of_range(engine):
+    """Rates outside [0, 1) are refused."""
+    with pytest.raises(ValueError, match="invalid_rate"):
+        ConversationSimulator(engine, 1, invalid_rate=1.0)
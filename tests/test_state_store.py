@@ -0,0 +1,134 @@
+import asyncio
+import time
+
+import pytest
+
+from chatbot_template.utils import state_store
+from chatbot_template.utils.conversation import ConversationState
+from chatbot_template.utils.enums import Phase
+from chatbot_template.utils.state_store import (
+    MemoryStateStore,
+    SQLiteStateStore,
+    StateStore,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    """Builds stores of each local backend, closing them after the test."""
+    stores: list[StateStore] = []
+
+    def make(ttl: float | None = None) -> StateStore:
+        if request.param == "memory":
+            store: StateStore = MemoryStateStore(ttl=ttl)
+        else:
+            store = SQLiteStateStore(str(tmp_path / "states.db"), ttl=ttl)
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        asyncio.run(store.aclose())
+
+
+def test_put_if_unchanged(make_store):
+    """A write only succeeds on the state it was computed from."""
+    store = make_store()
+    first = ConversationState()
+    second = ConversationState("ca", Phase.FORMULAIRES, 0)
+    third = ConversationState("ca", Phase.FORMULAIRES, 1)
+
+    async def run() -> None:
+        assert await store.put_if_unchanged("user", None, first)
+        # Someone else created the state meanwhile
+        assert not await store.put_if_unchanged("user", None, second)
+        assert await store.put_if_unchanged("user", first, second)
+        # Computed from a state that is no longer stored
+        assert not await store.put_if_unchanged("user", first, third)
+        assert await store.get("user") == second
+        assert await store.put_if_unchanged("user", second, third)
+        assert await store.get("user") == third
+
+    asyncio.run(run())
+
+
+def test_put_if_unchanged_over_an_expired_state(make_store):
+    """An expired state counts as missing."""
+    store = make_store(ttl=0.01)
+
+    async def run() -> None:
+        await store.put("user", ConversationState("ca"))
+        time.sleep(0.02)
+        assert await store.get("user") is None
+        assert await store.put_if_unchanged("user", None, ConversationState())
+        assert await store.get("user") == ConversationState()
+
+    asyncio.run(run())
+
+
+def test_concurrent_writers_lose_no_update(make_store):
+    """Writers retrying on conflict apply every increment exactly once."""
+    store = make_store()
+
+    async def advance() -> None:
+        while True:
+            stored = await store.get("user")
+            state = stored.copy() if stored is not None else ConversationState()
+            state.step += 1
+            await asyncio.sleep(0)
+            if await store.put_if_unchanged("user", stored, state):
+                return
+
+    async def run() -> None:
+        await asyncio.gather(*(advance() for _ in range(20)))
+        stored = await store.get("user")
+        assert stored is not None and stored.step == 20
+
+    asyncio.run(run())
+
+
+def test_sweep_reports_expired_states(make_store):
+    """Expired states are removed and reported once, live ones kept."""
+    store = make_store(ttl=0.05)
+
+    async def run() -> None:
+        await store.put_many({f"old{i}": ConversationState() for i in range(3)})
+        time.sleep(0.06)
+        await store.put("live", ConversationState())
+        evictions = await store.sweep(limit=2) + await store.sweep()
+        assert sorted(e.user_id for e in evictions) == ["old0", "old1", "old2"]
+        assert {e.reason for e in evictions} == {"ttl"}
+        assert await store.count() == 1
+
+    asyncio.run(run())
+
+
+def test_memory_reads_keep_expiry_order():
+    """Reading a state does not hide it from the sweep once expired."""
+    store = MemoryStateStore(ttl=0.05)
+
+    async def run() -> None:
+        await store.put("read", ConversationState())
+        time.sleep(0.03)
+        await store.put("written", ConversationState())
+        assert await store.get("read") is not None
+        time.sleep(0.03)
+        assert [e.user_id for e in await store.sweep()] == ["read"]
+
+    asyncio.run(run())
+
+
+def test_sqlite_sweep_without_returning(tmp_path, monkeypatch):
+    """SQLite before 3.35 sweeps by selecting then deleting the rows."""
+    monkeypatch.setattr(state_store, "_SQLITE_RETURNING", False)
+    store = SQLiteStateStore(str(tmp_path / "states.db"), ttl=0.01)
+
+    async def run() -> None:
+        await store.put_many({f"user{i}": ConversationState() for i in range(3)})
+        time.sleep(0.02)
+        assert len(await store.sweep(limit=2)) == 2
+        assert len(await store.sweep()) == 1
+        assert await store.count() == 0
+        await store.aclose()
+
+    asyncio.run(run())
@@ -0,0 +1,143 @@
+import pytest
+
+from chatbot_template.utils.enums import Phase, WorkflowError
+from chatbot_template.utils.events import MessageEvent
+from chatbot_template.utils.validators import (
+    DEFAULT_VALIDATORS,
+    AudioValidator,
+    IntegerValidator,
+    Validator,
+    compile_validator,
+)
+
+
+def text(value: str) -> MessageEvent:
+    """A text message."""
+    return MessageEvent("id", "user", "text", text=value)
+
+
+def audio(duration: float | None) -> MessageEvent:
+    """An audio message, with its duration if declared."""
+    return MessageEvent("id", "user", "audio", media_id="media", duration=duration)
+
+
+def test_validator_is_abstract():
+    """The base class cannot check anything by itself."""
+    with pytest.raises(TypeError):
+        Validator((None, WorkflowError.UNKNOWN_STATE))  # type: ignore[abstract]
+
+
+def test_default_validators():
+    """Questions without `answer` keep the checks of their phase."""
+    presentation = compile_validator(None, Phase.PRESENTATION)
+    assert presentation is DEFAULT_VALIDATORS[Phase.PRESENTATION]
+    assert presentation.validate(text(" cat ")) == ("ca", None)
+    assert presentation.validate(text("fr")) == (
+        None,
+        WorkflowError.LANG_NOT_SUPPORTED,
+    )
+
+    formulaires = compile_validator(None, Phase.FORMULAIRES)
+    assert formulaires.validate(text("4")) == ("4", None)
+    assert formulaires.validate(text("5")) == (None, WorkflowError.INVALID_NUMBER)
+
+
+def test_choice_aliases():
+    """Choices are matched in any case, through their aliases."""
+    validator = compile_validator(
+        {"type": "choice", "choices": {"gato": ["cat", "mix"], "perro": None}},
+        Phase.FORMULAIRES,
+    )
+    assert validator.validate(text("Mix")) == ("gato", None)
+    assert validator.validate(text("PERRO")) == ("perro", None)
+    assert validator.validate(text("pulpo")) == (
+        None,
+        WorkflowError.ANSWER_NON_EXITENT,
+    )
+    assert validator.validate(audio(30)) == (None, WorkflowError.ANSWER_NON_EXITENT)
+
+
+@pytest.mark.parametrize("high", [10, 1_000_000])
+def test_integer_range(high):
+    """Integers are checked from a table or parsed for large ranges."""
+    validator = compile_validator(
+        {"type": "integer", "min": 1, "max": high, "error": "LOGIN_ERROR"},
+        Phase.FORMULAIRES,
+    )
+    assert isinstance(validator, IntegerValidator)
+    assert (validator.verdicts is None) == (high > 1000)
+    assert validator.validate(text(f" {high} ")) == (str(high), None)
+    for answer in ("0", str(high + 1), "3.5", "uno"):
+        assert validator.validate(text(answer)) == (None, WorkflowError.LOGIN_ERROR)
+
+
+def test_integer_spellings():
+    """Answers missing from the table, like leading zeros, are parsed."""
+    formulaires = DEFAULT_VALIDATORS[Phase.FORMULAIRES]
+    assert formulaires.validate(text("03")) == ("3", None)
+    assert formulaires.validate(text("00")) == ("0", None)
+    assert formulaires.validate(text("٣")) == ("3", None)
+    assert formulaires.validate(text("05")) == (None, WorkflowError.INVALID_NUMBER)
+    for answer in ("1_0", "+4", " ４ ", "-1", "-0"):
+        assert formulaires.validate(text(answer)) == (
+            None,
+            WorkflowError.INVALID_NUMBER,
+        )
+
+
+def test_negative_integers():
+    """A minus sign is only read when the range goes below zero."""
+    validator = compile_validator(
+        {"type": "integer", "min": -10_000, "max": 10_000}, Phase.FORMULAIRES
+    )
+    assert validator.validate(text("-42")) == ("-42", None)
+    assert validator.validate(text("--4")) == (None, WorkflowError.INVALID_NUMBER)
+
+
+def test_yes_no_and_text():
+    """Yes/no answers are normalized, texts must not be blank."""
+    yes_no = compile_validator({"type": "yes_no"}, Phase.FORMULAIRES)
+    assert yes_no.validate(text("Sí")) == ("yes", None)
+    assert yes_no.validate(text("n")) == ("no", None)
+
+    free = compile_validator({"type": "text"}, Phase.FORMULAIRES)
+    assert free.validate(text("  hola ")) == ("hola", None)
+    assert free.validate(text("   ")) == (None, WorkflowError.ANSWER_NON_EXITENT)
+
+
+def test_audio_duration():
+    """Declared durations are checked, undeclared ones are left to the hook."""
+    validator = compile_validator(
+        {"type": "audio", "min_duration": 5}, Phase.AUDIO_QUESTIONS
+    )
+    assert isinstance(validator, AudioValidator)
+    assert validator.validate(audio(5)) == ("media", None)
+    assert validator.validate(audio(4.9)) == (None, WorkflowError.AUDIO_TOO_SHORT)
+    assert validator.validate(audio(None)) == ("media", None)
+    assert validator.validate(text("hola")) == (None, WorkflowError.NOT_AUDIO)
+
+
+def test_validate_many_keeps_order():
+    """A batch gets the verdict of every answer, in order."""
+    validator = compile_validator({"type": "integer", "max": 3}, Phase.FORMULAIRES)
+    verdicts = validator.validate_many([text("1"), text("9"), text("3")])
+    assert verdicts == [("1", None), (None, WorkflowError.INVALID_NUMBER), ("3", None)]
+
+
+@pytest.mark.parametrize(
+    ("spec", "reason"),
+    [
+        ("integer", "expected a mapping"),
+        ({"type": "date"}, "unknown type"),
+        ({"type": "text", "error": "NOPE"}, "unknown error"),
+        ({"type": "choice", "choices": []}, "choices"),
+        ({"type": "integer", "min": 5, "max": 1}, "min and max"),
+        ({"type": "integer", "max": "10"}, "min and max"),
+        ({"type": "integer", "min": False, "max": True}, "min and max"),
+        ({"type": "audio", "min_duration": -1}, "non-negative"),
+    ],
+)
+def test_invalid_specs(spec, reason):
+    """Malformed `answer` settings are refused when the workflow loads."""
+    with pytest.raises(ValueError, match=reason):
+        compile_validator(spec, Phase.FORMULAIRES)
@@ -0,0 +1,111 @@
+import asyncio
+import importlib
+import struct
+
+import numpy as np
+import pytest
+
+from chatbot_template.utils.audio import audio_duration, ogg_info, resample, write_wav
+from chatbot_template.utils.conversation import ConversationState
+from chatbot_template.utils.enums import Phase, SendPriority, WorkflowError
+from chatbot_template.utils.events import MessageEvent
+from chatbot_template.utils.media import MediaFile
+from chatbot_template.utils.state_store import MemoryStateStore
+
+
+def ogg_opus(seconds: float) -> bytes:
+    """A header page and a final page of an Ogg Opus stream, no audio inside."""
+    page = struct.Struct("<4sBBqIIIB")
+    head = b"OpusHead" + struct.pack("<BBHIhB", 1, 1, 312, 48_000, 0, 0)
+    first = page.pack(b"OggS", 0, 2, 0, 1, 0, 0, 1) + bytes([len(head)]) + head
+    granule = 312 + round(seconds * 48_000)
+    return first + page.pack(b"OggS", 0, 4, granule, 1, 1, 0, 0)
+
+
+def test_duration_from_the_headers(tmp_path):
+    """WAV and Ogg durations are read without decoding the audio."""
+    wav = tmp_path / "answer.wav"
+    write_wav(str(wav), np.zeros(8000 * 3), 8000)
+    ogg = tmp_path / "answer.ogg"
+    ogg.write_bytes(ogg_opus(12.5))
+    text = tmp_path / "answer.txt"
+    text.write_text("not an audio")
+
+    assert audio_duration(str(wav)) == 3
+    assert audio_duration(str(ogg)) == 12.5
+    with pytest.raises(ValueError):
+        audio_duration(str(text))
+
+
+def test_truncated_ogg_header():
+    """A cut identification header is an unsupported file, not a crash."""
+    page = struct.Struct("<4sBBqIIIB")
+    head = b"OpusHead\x01\x01"
+    data = page.pack(b"OggS", 0, 2, 0, 1, 0, 0, 1) + bytes([len(head)]) + head
+    with pytest.raises(ValueError):
+        ogg_info(data)
+
+
+@pytest.mark.parametrize("length", [10, 61, 63, 480])
+def test_resample_keeps_the_duration(length):
+    """Clips shorter than the low-pass filter are resampled to the right length."""
+    samples = np.ones(length, dtype=np.float32)
+    assert len(resample(samples, 48_000, 16_000)) == round(length / 3)
+
+
+class Outbox:
+    """Records the replies instead of sending them."""
+
+    def __init__(self):
+        self.sent: list[tuple[str, str, SendPriority]] = []
+
+    async def submit(
+        self, chat_id: str, text: str, priority: SendPriority = SendPriority.PROMPT
+    ) -> None:
+        """Records a reply."""
+        self.sent.append((chat_id, text, priority))
+
+
+@pytest.fixture
+def hook(tmp_path, monkeypatch):
+    """The WhatsApp hook without audio workers, downloads and replies faked."""
+    monkeypatch.setenv("MEDIA_FOLDER", str(tmp_path / "media"))
+    monkeypatch.setenv("AUDIO_WORKERS", "0")
+    monkeypatch.setenv("STATE_STORE_URL", "memory://")
+    module = importlib.import_module("scripts.whatsapp_hook")
+
+    async def get_media_url(media_id: str) -> str:
+        return f"https://mock.local/{media_id}"
+
+    async def download_file(url: str, dest_path: str) -> MediaFile:
+        with open(dest_path, "wb") as file:
+            file.write(ogg_opus(float(url.rsplit("/", 1)[1])))
+        return MediaFile(dest_path, 0, "")
+
+    monkeypatch.setattr(module, "get_media_url", get_media_url)
+    monkeypatch.setattr(module, "download_file", download_file)
+    monkeypatch.setattr(module, "state_store", MemoryStateStore())
+    monkeypatch.setattr(module, "outbox", Outbox())
+    assert module.audio_pipeline.workers == 0
+    return module
+
+
+@pytest.mark.parametrize("seconds", [5, 25])
+def test_short_audios_are_asked_again(hook, tmp_path, seconds):
+    """An undeclared duration is checked on the downloaded file itself."""
+    answered = ConversationState("es", Phase.CONCLUSION, 0)
+    event = MessageEvent("id", "user", "audio", media_id=str(seconds))
+
+    async def run() -> ConversationState | None:
+        await hook.state_store.put("user", answered)
+        await hook.fetch_audio(event, 0, str(tmp_path / "answer.ogg"))
+        return await hook.state_store.get("user")
+
+    state = asyncio.run(run())
+    if seconds < 20:
+        assert state == ConversationState("es", Phase.AUDIO_QUESTIONS, 0)
+        too_short = hook.engine.catalog.error("es", WorkflowError.AUDIO_TOO_SHORT)
+        assert hook.outbox.sent[0] == ("user", too_short, SendPriority.ERROR)
+    else:
+        assert state == answered
+        assert hook.outbox.sent == []
@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+import yaml
+
+from chatbot_template.utils.conversation import ConversationState
+from chatbot_template.utils.enums import Phase
+from chatbot_template.utils.events import MessageEvent
+from chatbot_template.utils.workflow import WorkflowEngine
+
+WORKFLOW = {
+    "QUESTIONS": {
+        "es": {
+            "presentation": [{"text": "Hola, ¿ES o CAT?"}],
+            "formulaires": [
+                {"question": "¿Edad?", "answer": {"type": "integer", "max": 120}},
+                {"question": "¿Nombre?", "answer": {"type": "text"}},
+            ],
+            "audio_questions": [{"question": "Graba un audio"}],
+            "conclusion": [{"text": "Adiós"}],
+        },
+        "ca": {"formulaires": [{"question": "Edat?"}]},
+    },
+    "ERRORS": {
+        "es": {
+            "INVALID_NUMBER": "Número no válido",
+            "NOT_AUDIO": "Manda un audio",
+            "UNKNOWN_STATE": "Estado desconocido",
+        },
+    },
+}
+
+
+def text(value: str) -> MessageEvent:
+    """A text message."""
+    return MessageEvent("id", "user", "text", text=value)
+
+
+def audio(duration: float) -> MessageEvent:
+    """An audio message lasting `duration` seconds."""
+    return MessageEvent("id", "user", "audio", media_id="media", duration=duration)
+
+
+@pytest.fixture
+def workflow_path(tmp_path):
+    """A small workflow with a partial Catalan translation."""
+    path = tmp_path / "workflow.yml"
+    path.write_text(yaml.safe_dump(WORKFLOW, allow_unicode=True), encoding="utf-8")
+    return path
+
+
+def replay(
+    engine: WorkflowEngine, events: list[MessageEvent], state: ConversationState
+) -> list[str]:
+    """The replies to `events`, moving `state` along."""
+
+    async def run() -> list[str]:
+        replies = []
+        for event in events:
+            _, reply = await engine.process_message("user", event, state)
+            replies.append(reply)
+        return replies
+
+    return asyncio.run(run())
+
+
+def test_conversation_goes_through_every_phase(workflow_path):
+    """Valid answers move to the next step, then to the next phase."""
+    engine = WorkflowEngine(str(workflow_path))
+    state = ConversationState()
+    replies = replay(
+        engine, [text(" es "), text("33"), text("Ana"), audio(25), text("ciao")], state
+    )
+    assert replies == ["¿Edad?", "¿Nombre?", "Graba un audio", "Adiós", "Adiós"]
+    assert state == ConversationState()
+
+
+def test_invalid_answers_keep_the_step(workflow_path):
+    """An invalid answer is replied with its error and the user stays put."""
+    engine = WorkflowEngine(str(workflow_path))
+    state = ConversationState("es", Phase.FORMULAIRES, 0)
+    assert replay(engine, [text("200"), audio(30)], state) == [
+        "Número no válido",
+        "Número no válido",
+    ]
+    assert state == ConversationState("es", Phase.FORMULAIRES, 0)
+
+    state = ConversationState("es", Phase.AUDIO_QUESTIONS, 0)
+    assert replay(engine, [text("hola")], state) == ["Manda un audio"]
+    assert state.step == 0
+
+
+def test_missing_translations_fall_back_to_spanish(workflow_path):
+    """Catalan users get the Spanish steps and checks that were not translated."""
+    engine = WorkflowEngine(str(workflow_path))
+    state = ConversationState()
+    assert replay(engine, [text("CAT"), text("7")], state) == ["Edat?", "¿Nombre?"]
+    assert state == ConversationState("ca", Phase.FORMULAIRES, 1)
+    assert engine.validator(state) == engine.validator(
+        ConversationState("es", Phase.FORMULAIRES, 1)
+    )
+
+
+def test_unknown_states(workflow_path):
+    """Users outside the workflow or past its steps are told to start again."""
+    engine = WorkflowEngine(str(workflow_path))
+    finished = ConversationState("es", None)
+    assert replay(engine, [text("hola")], finished) == ["Estado desconocido"]
+    assert engine.validator(finished) is None
+
+    # A step removed from the YAML skips to the next phase
+    state = ConversationState("es", Phase.FORMULAIRES, 5)
+    assert replay(engine, [text("3")], state) == ["Graba un audio"]
+    assert state == ConversationState("es", Phase.AUDIO_QUESTIONS, 0)
+
+
+def test_reload_only_recompiles_what_changed(workflow_path):
+    """Unchanged phases keep their nodes, changed ones are swapped in whole."""
+    engine = WorkflowEngine(str(workflow_path))
+    before = engine._compiled
+    changed = yaml.safe_load(workflow_path.read_text(encoding="utf-8"))
+    changed["QUESTIONS"]["es"]["conclusion"] = [{"text": "Hasta luego"}]
+    workflow_path.write_text(
+        yaml.safe_dump(changed, allow_unicode=True), encoding="utf-8"
+    )
+
+    assert engine.changed()
+    recompiled = engine.reload()
+    # The Catalan conclusion falls back to the Spanish one, so it changed too
+    assert sorted(recompiled) == [("ca", "conclusion"), ("es", "conclusion")]
+    after = engine._compiled
+    key = ("es", Phase.FORMULAIRES, 0)
+    assert after.nodes[key] is before.nodes[key]
+    state = ConversationState("es", Phase.CONCLUSION, 0)
+    assert replay(engine, [text("ciao")], state) == ["Hasta luego"]
+
+
+def test_shipped_errors_are_translated(engine):
+    """The shipped errors have a message of their own in every language."""
+    assert not [key for key in engine.catalog.missing if key.split(".")[1].isupper()]